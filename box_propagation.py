@@ -0,0 +1,120 @@
+"""
+Box propagation between detector keyframes
+Moves keyframe detections to later frames with sparse optical flow
+"""
+
+import cv2
+import numpy as np
+
+from config import PROPAGATION_MAX_CORNERS, PROPAGATION_MIN_POINTS
+
+
+class BoxPropagator:
+    """
+    Tracks feature points inside each box with pyramidal Lucas-Kanade flow
+
+    Each box is shifted by the median point motion and scaled by the median
+    change in point spread, so a keyframe's detections follow objects until
+    the next keyframe.
+    """
+
+    def __init__(self, max_corners=PROPAGATION_MAX_CORNERS, min_points=PROPAGATION_MIN_POINTS):
+        """
+        Args:
+            max_corners: Feature points tracked per box
+            min_points: Points that must survive for a box to be propagated
+        """
+        self.max_corners = max_corners
+        self.min_points = min_points
+        self.prev_gray = None
+        self.detections = []
+
+    def reset(self, frame, detections):
+        """
+        Start propagating from a keyframe
+
+        Args:
+            frame: BGR keyframe (numpy array)
+            detections: Detector output for the keyframe
+        """
+        self.prev_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self.detections = detections
+
+    def _box_points(self, box):
+        h, w = self.prev_gray.shape
+        x1, y1, x2, y2 = (int(round(v)) for v in box[:4])
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(w, x2), min(h, y2)
+        if x2 - x1 < 2 or y2 - y1 < 2:
+            return None
+
+        mask = np.zeros_like(self.prev_gray)
+        mask[y1:y2, x1:x2] = 255
+        return cv2.goodFeaturesToTrack(
+            self.prev_gray, self.max_corners, qualityLevel=0.01, minDistance=3, mask=mask
+        )
+
+    def propagate(self, frame):
+        """
+        Move the current detections onto a new frame
+
+        Args:
+            frame: BGR frame following the last keyframe or propagated frame
+
+        Returns:
+            list: Propagated detections in the detector's format, or None if
+            any box lost too many points and the frame needs a real detection
+        """
+        if self.prev_gray is None:
+            return None
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if gray.shape != self.prev_gray.shape:
+            return None
+
+        if not self.detections:
+            self.prev_gray = gray
+            return []
+
+        propagated = []
+        for det in self.detections:
+            points = self._box_points(det["box"])
+            if points is None or len(points) < self.min_points:
+                return None
+
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, points, None)
+            ok = status.reshape(-1) == 1
+            if ok.sum() < self.min_points:
+                return None
+
+            old_pts = points.reshape(-1, 2)[ok]
+            new_pts = moved.reshape(-1, 2)[ok]
+            dx, dy = np.median(new_pts - old_pts, axis=0)
+
+            old_spread = np.median(np.linalg.norm(old_pts - old_pts.mean(axis=0), axis=1))
+            new_spread = np.median(np.linalg.norm(new_pts - new_pts.mean(axis=0), axis=1))
+            scale = new_spread / old_spread if old_spread > 1e-3 else 1.0
+
+            x1, y1, x2, y2 = det["box"][:4]
+            cx, cy = (x1 + x2) / 2 + dx, (y1 + y2) / 2 + dy
+            half_w, half_h = (x2 - x1) * scale / 2, (y2 - y1) * scale / 2
+
+            h, w = gray.shape
+            box = [
+                float(np.clip(cx - half_w, 0, w)),
+                float(np.clip(cy - half_h, 0, h)),
+                float(np.clip(cx + half_w, 0, w)),
+                float(np.clip(cy + half_h, 0, h))
+            ]
+            if box[2] - box[0] < 2 or box[3] - box[1] < 2:
+                # Object left the frame
+                continue
+
+            new_det = dict(det)
+            new_det["box"] = box
+            new_det["propagated"] = True
+            propagated.append(new_det)
+
+        self.prev_gray = gray
+        self.detections = propagated
+        return propagated
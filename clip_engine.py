@@ -6,98 +6,355 @@ Multimodal search using OpenAI's CLIP model
 import torch
 import numpy as np
 from PIL import Image
-from transformers import CLIPProcessor, CLIPModel
 import os
+import threading
+
+from config import (
+    CLIP_INDEX_TYPE, CLIP_STORAGE, CLIP_PQ_M, CLIP_RERANK_CANDIDATES, CLIP_EXACT_VECTORS_FILE,
+    CLIP_BATCH_SIZE, CLIP_TEXT_CACHE_SIZE, CLIP_DEDUP_ENABLED, CLIP_DEDUP_THRESHOLD, INDEX_FOLDER
+)
+from lazy_model import LazyModel, FAILED, add_warmup_hook
+from embedding_cache import EmbeddingCache, normalize_text
+from color_detector import COLOR_RANGES
+from detector import get_labels
+from vector_index import VectorIndex, EmbeddingMatrix
+from sharded_index import ShardedIndex
 
 # Determine device
 device = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"🎯 CLIP Engine using: {device.upper()}")
 
-# Initialize CLIP model
-try:
+def _load_clip():
+    """Load the CLIP model and processor"""
+    from transformers import CLIPProcessor, CLIPModel
+    
+    print(f"🎯 CLIP Engine using: {device.upper()}")
     model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(device)
     processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
     print("✅ CLIP model loaded successfully")
-except Exception as e:
-    print(f"⚠️  CLIP model loading failed: {e}")
-    model = None
-    processor = None
+    return model, processor
+
+# Loaded on first use or during server warmup; search falls back to text-only without it
+clip_model = LazyModel(
+    "clip", _load_clip, model_id="openai/clip-vit-base-patch32", device=device, required=False
+)
+
+def _new_shard_index(folder):
+    """Empty CLIP index for one video's shard"""
+    # Flat search runs on one contiguous matrix, optionally compressed with exact
+    # re-ranking from vectors kept in the shard folder; ANN types go through FAISS
+    if CLIP_INDEX_TYPE != "flat":
+        return VectorIndex(embedding_dim, CLIP_INDEX_TYPE, metric="ip")
+    rerank = CLIP_RERANK_CANDIDATES if folder else 0
+    return EmbeddingMatrix(
+        embedding_dim,
+        storage=CLIP_STORAGE,
+        pq_m=CLIP_PQ_M,
+        rerank=rerank,
+        exact_path=os.path.join(folder, CLIP_EXACT_VECTORS_FILE) if rerank else None
+    )
+
+# Normalized image embeddings (inner product = cosine similarity), one shard
+# per video under IDs unique across videos
+embedding_dim = 512
+image_index = ShardedIndex("clip", embedding_dim, _new_shard_index, metric="ip", root=INDEX_FOLDER)
+
+# Guards the index against concurrent ingestion jobs and queries
+_lock = threading.RLock()
+
+# Query embeddings: a fixed bank of label/color prompts built at warmup, then an LRU cache
+_text_cache = EmbeddingCache(CLIP_TEXT_CACHE_SIZE)
+_prompt_bank = {}  # normalized prompt -> (512,) embedding
+_bank_hits = 0
+
+def _to_pil(image):
+    """Convert an image path or BGR numpy frame to an RGB PIL image"""
+    if isinstance(image, str):
+        return Image.open(image).convert('RGB')
+    return Image.fromarray(np.ascontiguousarray(image[:, :, ::-1]))
+
+def encode_images(images):
+    """
+    Encode a batch of images with CLIP in one forward pass
+    
+    Args:
+        images: List of image paths or decoded BGR frames / crops (numpy arrays)
+    
+    Returns:
+        numpy.ndarray: (N, 512) normalized float32 embeddings, or None if CLIP is unavailable
+    """
+    loaded = clip_model.get()
+    if loaded is None:
+        return None
+    model, processor = loaded
+    
+    inputs = processor(images=[_to_pil(image) for image in images], return_tensors="pt").to(device)
+    with torch.no_grad():
+        image_features = model.get_image_features(**inputs)
+    
+    # Normalize features
+    image_features = image_features / image_features.norm(p=2, dim=-1, keepdim=True)
+    return image_features.cpu().numpy().astype(np.float32)
+
+def _encode_texts(texts):
+    """Run the CLIP text encoder on a batch of texts, raising if CLIP is unavailable"""
+    loaded = clip_model.get()
+    if loaded is None:
+        raise RuntimeError(f"CLIP model unavailable: {clip_model.error}")
+    model, processor = loaded
+    
+    inputs = processor(text=list(texts), return_tensors="pt", padding=True).to(device)
+    with torch.no_grad():
+        text_features = model.get_text_features(**inputs)
+    
+    # Normalize features
+    text_features = text_features / text_features.norm(p=2, dim=-1, keepdim=True)
+    return text_features.cpu().numpy().astype(np.float32)
 
-# Storage for embeddings
-image_embeddings = []
-image_metadata = []
+def encode_texts(texts):
+    """
+    Embed query texts, skipping the text encoder for banked prompts and cached queries
+    
+    Args:
+        texts: List of query strings
+    
+    Returns:
+        numpy.ndarray: (N, 512) normalized float32 embeddings
+    """
+    global _bank_hits
+    bank = _prompt_bank
+    keys = [normalize_text(text) for text in texts]
+    missing = [key for key in keys if key not in bank]
+    cached = dict(zip(missing, _text_cache.get_many(missing, _encode_texts))) if missing else {}
+    _bank_hits += len(keys) - len(missing)
+    return np.stack([bank[key] if key in bank else cached[key] for key in keys])
+
+def build_prompt_bank(labels=None, colors=None, batch_size=256):
+    """
+    Precompute CLIP embeddings for every detector label and color + label prompt
+    
+    Args:
+        labels: Object labels (defaults to the detector's classes)
+        colors: Color names (defaults to the color detector's colors)
+        batch_size: Prompts encoded per forward pass
+    
+    Returns:
+        int: Number of prompts in the bank
+    """
+    global _prompt_bank
+    labels = get_labels() if labels is None else labels
+    colors = list(COLOR_RANGES) if colors is None else colors
+    prompts = list(dict.fromkeys(
+        normalize_text(prompt)
+        for label in labels
+        for prompt in [label] + [f"{color} {label}" for color in colors]
+    ))
+    if not prompts or clip_model.get() is None:
+        return 0
+    
+    vectors = np.concatenate([_encode_texts(prompts[i:i + batch_size])
+                              for i in range(0, len(prompts), batch_size)])
+    _prompt_bank = dict(zip(prompts, vectors))
+    print(f"✅ CLIP prompt bank ready ({len(prompts)} prompts)")
+    return len(prompts)
+
+# Built in the background once CLIP and the detector have loaded
+add_warmup_hook(build_prompt_bank)
 
-def add_image_embedding(image_path, meta):
+def get_text_cache_stats():
+    """Return prompt bank size and query cache hit-rate statistics"""
+    return {
+        "prompt_bank": len(_prompt_bank),
+        "prompt_bank_hits": _bank_hits,
+        "cache": _text_cache.stats()
+    }
+
+def add_image_embedding(image, meta, embedding=None):
     """
     Add image embedding to CLIP index
     
     Args:
-        image_path: Path to image file
+        image: Path to image file, or a decoded BGR frame (numpy array)
         meta: Metadata dictionary
-    """
-    if model is None or processor is None:
-        return
+        embedding: Precomputed normalized embedding to reuse instead of encoding image
     
+    Returns:
+        numpy.ndarray: The stored (1, 512) embedding, or None if nothing was added
+    """
     try:
-        if not os.path.exists(image_path):
-            return
+        if embedding is None:
+            if isinstance(image, str) and not os.path.exists(image):
+                return None
+            
+            embedding = encode_images([image])
+            if embedding is None:
+                return None
         
-        # Load and process image
-        image = Image.open(image_path).convert('RGB')
-        inputs = processor(images=image, return_tensors="pt").to(device)
+        add_image_embeddings(embedding, [meta])
+        return embedding
         
-        # Get image features
-        with torch.no_grad():
-            image_features = model.get_image_features(**inputs)
+    except Exception as e:
+        print(f"Error adding image embedding: {e}")
+        return None
+
+def add_image_embeddings(embeddings, metas):
+    """
+    Add a batch of precomputed image embeddings to the CLIP index
+    
+    Args:
+        embeddings: (N, 512) normalized float32 array
+        metas: Metadata dictionary per embedding
+    
+    Returns:
+        list: The IDs assigned to the embeddings
+    """
+    with _lock:
+        return image_index.add(embeddings, metas)
+
+def update_image_metadata(image_id, meta):
+    """
+    Replace the metadata of an indexed image (e.g. after its time range grew)
+    
+    Args:
+        image_id: ID returned by add_image_embeddings
+        meta: New metadata dictionary
+    """
+    with _lock:
+        image_index.update(image_id, meta)
+
+class ClipBatcher:
+    """
+    Micro-batching accumulator for CLIP image embeddings during ingestion
+    
+    Frames are buffered and encoded in one forward pass per batch, which is
+    several times faster on CPU than encoding them one by one. Frames marked
+    as reusing the previous embedding (static scenes) are indexed under the
+    previous frame's embedding without being encoded.
+    
+    With deduplication, a frame whose embedding is within dedup_threshold
+    (cosine) of the current entry of the same video, and whose detected
+    objects are the same, is merged into that entry instead of being added:
+    the entry's time_range is extended to cover it. Comparing against the
+    entry rather than the previous frame keeps slow drift from chaining a
+    whole scene into one entry.
+    """
+    
+    def __init__(self, batch_size=CLIP_BATCH_SIZE,
+                 dedup_threshold=CLIP_DEDUP_THRESHOLD if CLIP_DEDUP_ENABLED else None):
+        """
+        Args:
+            batch_size: Frames encoded per forward pass
+            dedup_threshold: Cosine similarity at which frames are merged (None disables)
+        """
+        self.batch_size = batch_size
+        self.dedup_threshold = dedup_threshold
+        self._pending = []  # (frame or None to reuse the previous embedding, meta)
+        self._last = None
+        self._entry = None  # [embedding, ID once added, metadata] of the entry duplicates merge into
+        self.merged = 0
+    
+    def add(self, frame, meta, reuse=False):
+        """
+        Queue a frame for indexing, encoding the batch once it is full
         
-        # Normalize features
-        image_features = image_features / image_features.norm(p=2, dim=-1, keepdim=True)
+        Args:
+            frame: Decoded BGR frame (numpy array)
+            meta: Metadata dictionary
+            reuse: Index the frame under the previous frame's embedding
+        """
+        if reuse and (self._pending or self._last is not None):
+            frame = None
+        self._pending.append((frame, meta))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+    
+    def _is_duplicate(self, embedding, meta):
+        if self.dedup_threshold is None or self._entry is None:
+            return False
+        entry_embedding, _, entry_meta = self._entry
+        return (entry_meta.get("video_filename") == meta.get("video_filename")
+                and entry_meta.get("objects") == meta.get("objects")
+                and float(embedding @ entry_embedding) >= self.dedup_threshold)
+    
+    def flush(self):
+        """
+        Encode and index every queued frame
         
-        # Store
-        image_embeddings.append(image_features.cpu().numpy())
-        image_metadata.append(meta)
+        Returns:
+            int: Number of frames indexed (added or merged into an entry)
+        """
+        pending, self._pending = self._pending, []
+        if not pending:
+            return 0
         
-    except Exception as e:
-        print(f"Error adding image embedding: {e}")
+        try:
+            frames = [frame for frame, _ in pending if frame is not None]
+            encoded = encode_images(frames) if frames else []
+            if encoded is None:
+                return 0
+            
+            new_embeddings, new_metas = [], []
+            extended = None  # Entry added by an earlier flush whose time range grew
+            encoded = iter(encoded)
+            for frame, meta in pending:
+                if frame is not None:
+                    self._last = next(encoded)
+                
+                if self._is_duplicate(self._last, meta):
+                    self._entry[2]["time_range"]["end"] = meta.get("timestamp")
+                    if self._entry[1] is not None:
+                        extended = self._entry
+                    self.merged += 1
+                    continue
+                
+                if self.dedup_threshold is not None:
+                    timestamp = meta.get("timestamp")
+                    meta = dict(meta, time_range={"start": timestamp, "end": timestamp})
+                    self._entry = [self._last, None, meta]
+                new_embeddings.append(self._last)
+                new_metas.append(meta)
+            
+            if extended is not None:
+                update_image_metadata(extended[1], extended[2])
+            if new_metas:
+                ids = add_image_embeddings(np.stack(new_embeddings), new_metas)
+                if self._entry is not None and self._entry[1] is None:
+                    self._entry[1] = ids[-1]
+            return len(pending)
+            
+        except Exception as e:
+            print(f"Error adding image embeddings: {e}")
+            return 0
 
-def search_clip(query, top_k=5):
+def search_clip(query, top_k=5, video_filename=None):
     """
     Search images using CLIP text-to-image matching
     
     Args:
         query: Text query
         top_k: Number of results to return
+        video_filename: Only search frames from this video
     
     Returns:
         List of metadata dictionaries for matching images
     """
-    if model is None or processor is None or len(image_embeddings) == 0:
+    with _lock:
+        if not len(image_index):
+            return []
+    
+    if clip_model.get() is None:
         return []
     
     try:
-        # Process text query
-        inputs = processor(text=[query], return_tensors="pt").to(device)
-        
-        # Get text features
-        with torch.no_grad():
-            text_features = model.get_text_features(**inputs)
-        
-        # Normalize features
-        text_features = text_features / text_features.norm(p=2, dim=-1, keepdim=True)
-        text_features = text_features.cpu().numpy()
-        
-        # Calculate similarities
-        similarities = []
-        for i, img_emb in enumerate(image_embeddings):
-            sim = np.dot(text_features, img_emb.T)[0][0]
-            similarities.append((float(sim), image_metadata[i]))
+        # Banked prompts and repeated queries skip the text encoder
+        text_features = encode_texts([query])
         
-        # Sort by similarity
-        similarities.sort(reverse=True, key=lambda x: x[0])
+        # Nearest images by cosine similarity
+        with _lock:
+            matches = image_index.search(text_features, top_k, video_filename=video_filename)[0]
         
         # Return top-k results with scores
         results = []
-        for score, meta in similarities[:top_k]:
+        for score, meta in matches:
             result = meta.copy()
             result['clip_score'] = score
             results.append(result)
@@ -110,17 +367,28 @@ def search_clip(query, top_k=5):
 
 def get_clip_status():
     """Return CLIP engine status"""
+    with _lock:
+        index_stats = image_index.stats()
     return {
-        "available": model is not None,
+        "available": clip_model.state != FAILED,
+        "loaded": clip_model.ready,
         "device": device,
-        "indexed_images": len(image_embeddings)
+        "indexed_images": index_stats["vectors"],
+        "bytes_per_frame": index_stats["bytes_per_vector"],
+        # Shards still stored uncompressed until enough frames arrive to train on (pq storage, IVF)
+        "untrained_shards": index_stats["shards"] - index_stats["trained_shards"],
+        "index": index_stats
     }
 
+def set_search_params(nprobe=None, ef_search=None):
+    """Tune ANN recall/latency (IVF nprobe, HNSW efSearch) of the CLIP index"""
+    with _lock:
+        image_index.set_search_params(nprobe=nprobe, ef_search=ef_search)
+
 def clear_clip_index():
     """Clear all CLIP embeddings"""
-    global image_embeddings, image_metadata
-    image_embeddings = []
-    image_metadata = []
+    with _lock:
+        image_index.clear()
 
 def remove_video_clip_embeddings(video_filename):
     """
@@ -129,16 +397,28 @@ def remove_video_clip_embeddings(video_filename):
     Args:
         video_filename: Name of the video file to remove
     """
-    global image_embeddings, image_metadata
+    with _lock:
+        image_index.remove_video(video_filename)
+
+def load_index(folder=INDEX_FOLDER):
+    """
+    Load the persisted CLIP index shards and keep them saved from now on
     
-    # Filter out embeddings for this video
-    new_embeddings = []
-    new_metadata = []
+    Args:
+        folder: Directory holding the shard folders
     
-    for i, meta in enumerate(image_metadata):
-        if meta.get("video_filename") != video_filename:
-            new_embeddings.append(image_embeddings[i])
-            new_metadata.append(meta)
+    Returns:
+        int: Number of images loaded
+    """
+    with _lock:
+        return image_index.load(folder)
+
+def save_index(video_filename=None):
+    """
+    Snapshot CLIP index shards and compact their logs
     
-    image_embeddings = new_embeddings
-    image_metadata = new_metadata
+    Args:
+        video_filename: Only save this video's shard (default: every shard with new images)
+    """
+    with _lock:
+        image_index.save(video_filename)
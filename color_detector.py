@@ -5,7 +5,8 @@ Extracts dominant colors from bounding box regions
 
 import cv2
 import numpy as np
-from collections import Counter
+
+from config import COLOR_MAP_WIDTH
 
 # Improved color name mapping (HSV ranges) - more accurate ranges
 COLOR_RANGES = {
@@ -38,6 +39,140 @@ COLOR_RANGES = {
     'brown': [[(10, 40, 20), (25, 200, 150)]]
 }
 
+def _build_lookup_tables():
+    """
+    Precompute HSV lookup tables for single-pass color classification
+    
+    Each channel value is mapped to a segment between consecutive range
+    boundaries, so every (H, S, V) segment combination belongs to a fixed
+    set of colors. Pixels are binned by segment combination with one
+    bincount, and a membership matrix turns bin counts into per-color counts.
+    Colors may overlap (e.g. brown and orange), exactly as with cv2.inRange.
+    """
+    color_names = list(COLOR_RANGES)
+    
+    axis_luts = []
+    axis_starts = []
+    for channel in range(3):
+        boundaries = {0, 256}
+        for ranges in COLOR_RANGES.values():
+            for lower, upper in ranges:
+                boundaries.add(lower[channel])
+                boundaries.add(min(upper[channel] + 1, 256))
+        starts = sorted(boundaries)[:-1]
+        lut = np.searchsorted(starts, np.arange(256), side="right").astype(np.intp) - 1
+        axis_luts.append(lut)
+        axis_starts.append(starts)
+    
+    # Membership of each (H, S, V) segment combination in each color
+    h_starts, s_starts, v_starts = (np.array(starts) for starts in axis_starts)
+    hh, ss, vv = np.meshgrid(h_starts, s_starts, v_starts, indexing="ij")
+    membership = np.zeros((hh.size, len(color_names)), dtype=np.float64)
+    for c, name in enumerate(color_names):
+        inside = np.zeros(hh.shape, dtype=bool)
+        for lower, upper in COLOR_RANGES[name]:
+            inside |= ((lower[0] <= hh) & (hh <= upper[0]) &
+                       (lower[1] <= ss) & (ss <= upper[1]) &
+                       (lower[2] <= vv) & (vv <= upper[2]))
+        membership[:, c] = inside.ravel()
+    
+    # Fold the segment strides into the per-channel tables: bin = H_LUT[h] + S_LUT[s] + V_LUT[v]
+    n_s, n_v = len(s_starts), len(v_starts)
+    h_lut = axis_luts[0] * (n_s * n_v)
+    s_lut = axis_luts[1] * n_v
+    v_lut = axis_luts[2]
+    return color_names, h_lut, s_lut, v_lut, membership
+
+_COLOR_NAMES, _H_LUT, _S_LUT, _V_LUT, _MEMBERSHIP = _build_lookup_tables()
+_MEMBERSHIP_MASKS = _MEMBERSHIP.astype(np.uint8)
+
+def _color_bins(hsv):
+    """Map every HSV pixel to its segment-combination bin"""
+    return _H_LUT[hsv[..., 0]] + _S_LUT[hsv[..., 1]] + _V_LUT[hsv[..., 2]]
+
+def _fractions_from_bin_counts(bin_counts, total_pixels):
+    """Convert bin counts into the fraction of pixels matching each color"""
+    return (bin_counts @ _MEMBERSHIP) / total_pixels
+
+def color_fractions(hsv):
+    """
+    Fraction of pixels in each color range, in one pass over the image
+    
+    Args:
+        hsv: HSV image (uint8)
+    
+    Returns:
+        numpy.ndarray: Fraction per color, in COLOR_RANGES order
+    """
+    bin_counts = np.bincount(_color_bins(hsv).ravel(), minlength=_MEMBERSHIP.shape[0])
+    return _fractions_from_bin_counts(bin_counts, hsv.shape[0] * hsv.shape[1])
+
+def _prepare_roi(image, box):
+    """Crop, downscale, convert to HSV and blur a bounding box region"""
+    x1, y1, x2, y2 = map(int, box[:4])
+    
+    # Ensure coordinates are within image bounds
+    h, w = image.shape[:2]
+    x1, y1 = max(0, x1), max(0, y1)
+    x2, y2 = min(w, x2), min(h, y2)
+    
+    if x2 <= x1 or y2 <= y1:
+        return None
+    
+    # Extract region of interest
+    roi = image[y1:y2, x1:x2]
+    
+    if roi.size == 0:
+        return None
+    
+    # Resize for faster processing (but not too small)
+    roi_h, roi_w = roi.shape[:2]
+    if roi_h > 100 or roi_w > 100:
+        scale = min(100 / roi_h, 100 / roi_w)
+        new_h, new_w = int(roi_h * scale), int(roi_w * scale)
+        roi = cv2.resize(roi, (new_w, new_h))
+    
+    # Convert to HSV for better color detection
+    hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
+    
+    # Apply Gaussian blur to reduce noise
+    return cv2.GaussianBlur(hsv, (5, 5), 0)
+
+def _classify(fractions, top_n):
+    """Pick the dominant color and top-N significant colors from color fractions"""
+    # Sort by percentage (stable, so ties keep COLOR_RANGES order)
+    sorted_colors = sorted(zip(_COLOR_NAMES, fractions.tolist()), key=lambda x: x[1], reverse=True)
+    
+    dominant = "unknown"
+    if sorted_colors and sorted_colors[0][1] > 0:
+        # Only return if it's significant (>15% of pixels)
+        if sorted_colors[0][1] > 0.15:
+            dominant = sorted_colors[0][0]
+        # Check if it's a mix of colors
+        elif len(sorted_colors) > 1 and sorted_colors[1][1] > 0.10:
+            dominant = "mixed"
+    
+    # Include colors covering >8% of pixels
+    colors = [name for name, fraction in sorted_colors if fraction > 0.08][:top_n]
+    return dominant, colors
+
+def analyze_colors(image, box, top_n=3):
+    """
+    Get the dominant color and the top-N colors of a box in one pass
+    
+    Args:
+        image: OpenCV image (BGR)
+        box: Bounding box [x1, y1, x2, y2]
+        top_n: Number of top colors to return
+    
+    Returns:
+        tuple: (dominant color name, list of significant colors)
+    """
+    hsv = _prepare_roi(image, box)
+    if hsv is None:
+        return "unknown", []
+    return _classify(color_fractions(hsv), top_n)
+
 def get_dominant_color(image, box):
     """
     Extract dominant color from bounding box region using improved algorithm
@@ -50,79 +185,7 @@ def get_dominant_color(image, box):
         Color name (string)
     """
     try:
-        x1, y1, x2, y2 = map(int, box[:4])
-        
-        # Ensure coordinates are within image bounds
-        h, w = image.shape[:2]
-        x1, y1 = max(0, x1), max(0, y1)
-        x2, y2 = min(w, x2), min(h, y2)
-        
-        if x2 <= x1 or y2 <= y1:
-            return "unknown"
-        
-        # Extract region of interest
-        roi = image[y1:y2, x1:x2]
-        
-        if roi.size == 0:
-            return "unknown"
-        
-        # Resize for faster processing (but not too small)
-        roi_h, roi_w = roi.shape[:2]
-        if roi_h > 100 or roi_w > 100:
-            scale = min(100 / roi_h, 100 / roi_w)
-            new_h, new_w = int(roi_h * scale), int(roi_w * scale)
-            roi = cv2.resize(roi, (new_w, new_h))
-        
-        # Convert to HSV for better color detection
-        hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-        
-        # Apply Gaussian blur to reduce noise
-        hsv = cv2.GaussianBlur(hsv, (5, 5), 0)
-        
-        # Detect colors with improved scoring
-        color_scores = {}
-        total_pixels = hsv.shape[0] * hsv.shape[1]
-        
-        for color_name, ranges in COLOR_RANGES.items():
-            mask = None
-            
-            # Combine multiple ranges for the same color
-            for color_range in ranges:
-                lower, upper = np.array(color_range[0]), np.array(color_range[1])
-                temp_mask = cv2.inRange(hsv, lower, upper)
-                
-                if mask is None:
-                    mask = temp_mask
-                else:
-                    mask = cv2.bitwise_or(mask, temp_mask)
-            
-            # Count pixels in this color range
-            pixel_count = cv2.countNonZero(mask)
-            percentage = pixel_count / total_pixels
-            
-            # Store score
-            color_scores[color_name] = percentage
-        
-        # Get dominant color (highest percentage)
-        if not color_scores or max(color_scores.values()) == 0:
-            return "unknown"
-        
-        # Sort by percentage
-        sorted_colors = sorted(color_scores.items(), key=lambda x: x[1], reverse=True)
-        
-        # Get top color
-        dominant_color, dominant_percentage = sorted_colors[0]
-        
-        # Only return if it's significant (>15% of pixels)
-        if dominant_percentage > 0.15:
-            return dominant_color
-        
-        # Check if it's a mix of colors
-        if len(sorted_colors) > 1 and sorted_colors[1][1] > 0.10:
-            return "mixed"
-        
-        return "unknown"
-        
+        return analyze_colors(image, box)[0]
     except Exception as e:
         print(f"Error detecting color: {e}")
         return "unknown"
@@ -140,93 +203,96 @@ def get_color_histogram(image, box, top_n=3):
         List of dominant colors
     """
     try:
-        x1, y1, x2, y2 = map(int, box[:4])
-        
-        # Ensure coordinates are within image bounds
-        h, w = image.shape[:2]
-        x1, y1 = max(0, x1), max(0, y1)
-        x2, y2 = min(w, x2), min(h, y2)
-        
-        if x2 <= x1 or y2 <= y1:
-            return []
-        
-        # Extract region of interest
-        roi = image[y1:y2, x1:x2]
-        
-        if roi.size == 0:
-            return []
-        
-        # Resize for faster processing
-        roi_h, roi_w = roi.shape[:2]
-        if roi_h > 100 or roi_w > 100:
-            scale = min(100 / roi_h, 100 / roi_w)
-            new_h, new_w = int(roi_h * scale), int(roi_w * scale)
-            roi = cv2.resize(roi, (new_w, new_h))
-        
-        # Convert to HSV
-        hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
+        return analyze_colors(image, box, top_n=top_n)[1]
+    except Exception as e:
+        print(f"Error in color histogram: {e}")
+        return []
+
+class FrameColorMap:
+    """
+    Per-frame color map answering box color queries in constant time
+    
+    The frame is downscaled, converted to HSV and classified once. Each
+    color gets an integral image (summed-area table), so the color
+    distribution of any box costs a few lookups regardless of how many
+    boxes there are or how much they overlap.
+    """
+    
+    def __init__(self, frame, width=COLOR_MAP_WIDTH):
+        """
+        Args:
+            frame: OpenCV image (BGR)
+            width: Width the frame is downscaled to before classification
+        """
+        h, w = frame.shape[:2]
+        self.scale = min(1.0, width / w)
+        if self.scale < 1.0:
+            frame = cv2.resize(frame, (int(round(w * self.scale)), max(1, int(round(h * self.scale)))),
+                               interpolation=cv2.INTER_AREA)
+        self.height, self.width = frame.shape[:2]
         
-        # Apply Gaussian blur
-        hsv = cv2.GaussianBlur(hsv, (5, 5), 0)
+        hsv = cv2.GaussianBlur(cv2.cvtColor(frame, cv2.COLOR_BGR2HSV), (5, 5), 0)
+        masks = _MEMBERSHIP_MASKS[_color_bins(hsv)]  # H x W x colors, 1 where the pixel matches
         
-        # Detect all present colors
-        detected_colors = []
-        total_pixels = hsv.shape[0] * hsv.shape[1]
+        # One integral image per color (with a leading zero row/column)
+        self.integral = cv2.integral(masks)
+    
+    def fractions(self, box):
+        """
+        Fraction of pixels in each color range inside a box
         
-        for color_name, ranges in COLOR_RANGES.items():
-            mask = None
-            
-            for color_range in ranges:
-                lower, upper = np.array(color_range[0]), np.array(color_range[1])
-                temp_mask = cv2.inRange(hsv, lower, upper)
-                
-                if mask is None:
-                    mask = temp_mask
-                else:
-                    mask = cv2.bitwise_or(mask, temp_mask)
-            
-            pixel_count = cv2.countNonZero(mask)
-            percentage = pixel_count / total_pixels
-            
-            # Include if >8% of pixels
-            if percentage > 0.08:
-                detected_colors.append((color_name, percentage))
+        Args:
+            box: Bounding box [x1, y1, x2, y2] in original frame coordinates
         
-        # Sort by percentage
-        detected_colors.sort(key=lambda x: x[1], reverse=True)
+        Returns:
+            numpy.ndarray: Fraction per color, or None if the box is empty
+        """
+        x1, y1, x2, y2 = (v * self.scale for v in box[:4])
+        x1, y1 = max(0, int(np.floor(x1))), max(0, int(np.floor(y1)))
+        x2, y2 = min(self.width, int(np.ceil(x2))), min(self.height, int(np.ceil(y2)))
+        if x2 <= x1 or y2 <= y1:
+            return None
         
-        # Return top N colors
-        return [color[0] for color in detected_colors[:top_n]]
+        s = self.integral
+        counts = s[y2, x2] - s[y1, x2] - s[y2, x1] + s[y1, x1]
+        return counts / ((x2 - x1) * (y2 - y1))
+    
+    def analyze(self, box, top_n=3):
+        """
+        Get the dominant color and the top-N colors of a box
         
-    except Exception as e:
-        print(f"Error in color histogram: {e}")
-        return []
+        Returns:
+            tuple: (dominant color name, list of significant colors)
+        """
+        fractions = self.fractions(box)
+        if fractions is None:
+            return "unknown", []
+        return _classify(fractions, top_n)
 
-def add_colors_to_detections(image_path, detections):
+def add_colors_to_detections(image, detections):
     """
     Add color information to detection metadata
     
     Args:
-        image_path: Path to image file
+        image: Path to image file, or a decoded BGR frame (numpy array)
         detections: List of detection dicts with 'box' key
     
     Returns:
         Updated detections with 'color' and 'colors' keys
     """
     try:
-        image = cv2.imread(image_path)
+        if isinstance(image, str):
+            image = cv2.imread(image)
         if image is None:
             return detections
         
+        # Classify the frame once and read every box from the shared color map
+        color_map = FrameColorMap(image)
         for det in detections:
             box = det.get("box", [])
             if len(box) >= 4:
-                # Get dominant color
-                dominant = get_dominant_color(image, box)
+                dominant, colors = color_map.analyze(box, top_n=3)
                 det["color"] = dominant
-                
-                # Get all significant colors
-                colors = get_color_histogram(image, box, top_n=3)
                 det["colors"] = colors if colors else [dominant]
         
         return detections
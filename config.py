@@ -5,6 +5,44 @@ Configuration file for CCTV AI System
 # Video Processing
 FRAME_EXTRACTION_RATE = 1  # Extract 1 frame per second
 CONFIDENCE_THRESHOLD = 0.5  # Minimum confidence for object detection
+DETECT_BATCH_SIZE = 8  # Frames per batched YOLO call during ingestion
+DETECT_BATCH_MAX_WAIT = 0.05  # Seconds to wait for a batch to fill before running it
+SEEK_MIN_GAP_SECONDS = 2.0  # Seek instead of grab() when the next sample is further away
+INGEST_QUEUE_SIZE = 8  # Max frames buffered between ingestion pipeline stages
+FRAME_WRITER_THREADS = 2  # Background threads writing sampled frames to disk
+FRAME_WRITE_QUEUE_SIZE = 32  # Max frames held in memory waiting to be written
+INGEST_WORKERS = 1  # Videos processed concurrently in the background job pool
+
+# Motion Gating (static frames reuse the last processed frame's results)
+MOTION_GATE_ENABLED = True
+MOTION_GATE_WIDTH = 64  # Frames are compared at this width in grayscale
+MOTION_PIXEL_DELTA = 25  # Grayscale difference for a pixel to count as changed
+MOTION_CHANGED_FRACTION = 0.01  # Process the frame if more than 1% of pixels changed
+
+# Color Detection (each frame is classified once into a downscaled color map)
+COLOR_MAP_WIDTH = 320  # Width of the per-frame color map used for all boxes
+
+# Tracking (per-video Kalman + IoU tracker attaching track IDs to detections)
+TRACK_IOU_THRESHOLD = 0.3  # Minimum IoU between a predicted track and a detection
+TRACK_MAX_AGE = 3  # Processed frames a track survives without a match
+TRACK_INTERVAL_GAP_SECONDS = 10.0  # Longer absences start a new appearance in a track's timeline
+
+# Person Re-Identification (appearance gallery of people who left the view)
+REID_ENABLED = True  # Runs CLIP on person crops when tracks start (see REID_REFRESH_SECONDS)
+REID_INDEX_TYPE = "hnsw"  # "hnsw" (sublinear lookups) or "flat" (exact)
+REID_HNSW_M = 32  # HNSW graph degree of the gallery index
+REID_EF_SEARCH = 64  # HNSW candidates per gallery lookup (higher = better recall, slower)
+REID_SIMILARITY_THRESHOLD = 0.85  # Minimum CLIP cosine similarity to give back an old ID
+REID_MAX_IDENTITIES = 5000  # Lost identities remembered per video before the oldest are evicted
+REID_MAX_AGE_SECONDS = 3600  # Video time after which a lost identity is forgotten
+REID_MIN_CROP_SIZE = 16  # Person crops smaller than this (pixels) are not embedded
+REID_REFRESH_SECONDS = 30.0  # Video time between re-embedding a tracked person (0 = only when a track starts)
+
+# Keyframe Detection (boxes are propagated with optical flow between keyframes)
+KEYFRAME_INTERVAL = 1  # Run YOLO on every Nth processed frame (1 = every frame)
+                       # Raise together with the sample rate for dense, cheap coverage
+PROPAGATION_MAX_CORNERS = 20  # Feature points tracked per box
+PROPAGATION_MIN_POINTS = 3  # Re-detect when a box keeps fewer tracked points
 
 # Person Tracking
 SIMILARITY_THRESHOLD = 0.85  # Threshold for person re-identification
@@ -30,4 +68,36 @@ ALLOWED_VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv']
 
 # Model Settings
 YOLO_MODEL = "yolov8n.pt"  # Options: yolov8n, yolov8s, yolov8m, yolov8l, yolov8x
+DETECTOR_BACKEND = "ultralytics"  # Options: ultralytics (PyTorch), onnxruntime, openvino
+DETECTOR_EXPORTED_MODEL = "yolov8n.onnx"  # ONNX/OpenVINO model for the CPU backends
+                                          # (e.g. yolov8n-int8.onnx from scripts/quantize_detector.py)
+DETECTOR_IMG_SIZE = 640  # Network input size for exported models
+DETECTOR_NMS_IOU = 0.7  # NMS IoU threshold for exported models (ultralytics default)
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # Sentence transformer model
+TEXT_EMBEDDING_CACHE_SIZE = 4096  # Distinct label strings / queries kept in the LRU embedding cache
+CLIP_BATCH_SIZE = 32  # Frames per batched CLIP forward pass during ingestion
+CLIP_DEDUP_ENABLED = True  # Merge near-identical consecutive frames into one CLIP entry with a time range
+CLIP_DEDUP_THRESHOLD = 0.98  # Cosine similarity (with the same detected objects) at which frames merge
+CLIP_TEXT_CACHE_SIZE = 1024  # Distinct CLIP queries kept in the LRU embedding cache
+                             # (label and "color label" prompts are precomputed at warmup)
+
+# Vector Indexes (text and CLIP search)
+EMBEDDING_INDEX_TYPE = "flat"  # Options: flat (exact), ivf_flat, ivf_pq, hnsw
+CLIP_INDEX_TYPE = "flat"  # Same options; use ivf_pq or hnsw for millions of frames
+CLIP_STORAGE = "float32"  # Flat CLIP rows: float32 (2 KB/frame), float16, int8 (~0.5 KB) or pq (CLIP_PQ_M bytes;
+                          # a video trains half-size codes from 624 frames, full-size from ~10k)
+CLIP_PQ_M = 64  # PQ sub-quantizers (bytes per frame) for pq storage (must divide 512)
+CLIP_RERANK_CANDIDATES = 0  # Re-score this many top candidates with exact vectors kept on disk (0 = off)
+CLIP_EXACT_VECTORS_FILE = "clip_exact.f32"  # Original vectors used for re-ranking, kept in each video's index folder
+ANN_NLIST = 1024  # Max IVF coarse clusters per index (each video's shard uses about sqrt(its vectors))
+ANN_NPROBE = 16  # IVF clusters visited per query (higher = better recall, slower)
+ANN_PQ_M = 16  # PQ sub-quantizers for ivf_pq (must divide 384 and 512)
+ANN_HNSW_M = 32  # HNSW graph degree
+ANN_EF_SEARCH = 64  # HNSW candidates per query (higher = better recall, slower)
+ANN_TRAIN_POINTS_PER_LIST = 39  # IVF indexes stay exact until this many vectors per cluster arrive
+                               # (sqrt(N) clusters, so from 39 x 39 = 1521 vectors; ~10k for ivf_pq)
+ANN_RETRAIN_GROWTH = 4  # Retrain IVF centroids when the index has grown this many times over
+
+# Persistence (indexes survive restarts; loaded at server startup)
+PERSIST_INDEXES = True
+INDEX_FOLDER = "storage/index"  # One folder per video: snapshots, metadata logs and vector logs
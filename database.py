@@ -1,8 +1,54 @@
-frames = []
+import os
+import threading
+
+from index_store import JsonlLog, read_jsonl, shard_folder, list_shard_folders, remove_empty_folder
+from config import INDEX_FOLDER
+
+# Frame entries partitioned by video, so a video is listed or dropped without scanning the others
+frames_by_video = {}  # video_filename -> list of frame entries
+
+# Guards the frames against concurrent ingestion jobs and queries
+_lock = threading.RLock()
+
+# Per-video frame logs under this folder, set by load_frames() at server startup
+_persist_root = None
+_frame_logs = {}  # video_filename -> JsonlLog
+
+def _frame_log(video_filename):
+    log = _frame_logs.get(video_filename)
+    if log is None:
+        path = os.path.join(shard_folder(_persist_root, video_filename), "frames.jsonl")
+        log = _frame_logs[video_filename] = JsonlLog(path)
+    return log
 
 def add_frame(data):
     """Add a frame entry to the database"""
-    frames.append(data)
+    video_filename = data.get("video_filename")
+    with _lock:
+        frames_by_video.setdefault(video_filename, []).append(data)
+        if _persist_root is not None:
+            _frame_log(video_filename).append([data])
+
+def load_frames(folder=INDEX_FOLDER):
+    """
+    Load persisted frames and keep saving new ones
+    
+    Args:
+        folder: Directory holding the per-video folders
+    
+    Returns:
+        int: Number of frames loaded
+    """
+    global frames_by_video, _persist_root
+    with _lock:
+        _persist_root = folder
+        _frame_logs.clear()
+        frames_by_video = {}
+        for video_filename, path in list_shard_folders(folder):
+            frames = list(read_jsonl(os.path.join(path, "frames.jsonl")))
+            if frames:
+                frames_by_video[video_filename] = frames
+        return get_frame_count()
 
 def filter_time(start, end):
     """
@@ -15,11 +61,12 @@ def filter_time(start, end):
     Returns:
         list: Filtered frame entries
     """
-    return [f for f in frames if start <= f.get("timestamp", 0) <= end]
+    return [f for f in get_all_frames() if start <= f.get("timestamp", 0) <= end]
 
 def get_all_frames():
     """Return all stored frames"""
-    return frames
+    with _lock:
+        return [f for frames in frames_by_video.values() for f in frames]
 
 def get_frames_by_video(video_filename):
     """
@@ -31,7 +78,8 @@ def get_frames_by_video(video_filename):
     Returns:
         list: Frames from that video
     """
-    return [f for f in frames if f.get("video_filename") == video_filename]
+    with _lock:
+        return list(frames_by_video.get(video_filename, []))
 
 def get_frames_with_object(object_name):
     """
@@ -43,16 +91,18 @@ def get_frames_with_object(object_name):
     Returns:
         list: Frames containing the object
     """
-    return [f for f in frames if object_name in f.get("objects", [])]
+    return [f for f in get_all_frames() if object_name in f.get("objects", [])]
 
 def get_frame_count():
     """Return the total number of frames"""
-    return len(frames)
+    with _lock:
+        return sum(len(frames) for frames in frames_by_video.values())
 
 def clear_database():
     """Clear all stored frames"""
-    global frames
-    frames = []
+    with _lock:
+        for video_filename in list(frames_by_video):
+            remove_video_frames(video_filename)
 
 def remove_video_frames(video_filename):
     """
@@ -61,6 +111,10 @@ def remove_video_frames(video_filename):
     Args:
         video_filename: Name of the video file to remove
     """
-    global frames
-    frames = [f for f in frames if f.get("video_filename") != video_filename]
-
+    with _lock:
+        frames_by_video.pop(video_filename, None)
+        if _persist_root is not None:
+            log = _frame_log(video_filename)
+            log.clear()
+            _frame_logs.pop(video_filename, None)
+            remove_empty_folder(os.path.dirname(log.path))
@@ -1,66 +1,126 @@
-from ultralytics import YOLO
 import os
+import cv2
 import torch
 from color_detector import add_colors_to_detections
+from config import (
+    DETECT_BATCH_SIZE, DETECTOR_BACKEND, YOLO_MODEL, DETECTOR_EXPORTED_MODEL,
+    DETECTOR_IMG_SIZE, DETECTOR_NMS_IOU
+)
+from detector_backends import load_backend
+from lazy_model import LazyModel
 
-# Check for GPU availability
+# Check for GPU availability (only used by the PyTorch backend)
 device = 'cuda' if torch.cuda.is_available() else 'cpu'
-print(f"🎯 YOLOv8 using device: {device.upper()}")
 
-# Initialize model with GPU support
-try:
-    model = YOLO("yolov8n.pt")
-    if device == 'cuda':
-        model.to(device)
+def _load_detector():
+    """Load the configured detector backend"""
+    print(f"🎯 YOLOv8 backend: {DETECTOR_BACKEND} ({device.upper() if DETECTOR_BACKEND == 'ultralytics' else 'CPU'})")
+    model_path = YOLO_MODEL if DETECTOR_BACKEND == "ultralytics" else DETECTOR_EXPORTED_MODEL
+    model = load_backend(
+        DETECTOR_BACKEND,
+        model_path,
+        device=device,
+        img_size=DETECTOR_IMG_SIZE,
+        iou_threshold=DETECTOR_NMS_IOU
+    )
+    if DETECTOR_BACKEND == "ultralytics" and device == 'cuda':
         print(f"✅ YOLOv8 loaded on GPU: {torch.cuda.get_device_name(0)}")
-    else:
+    elif DETECTOR_BACKEND == "ultralytics":
         print("⚠️  GPU not available, using CPU (slower)")
-except Exception as e:
-    print(f"Warning: Failed to load YOLOv8 model: {e}")
-    model = None
+    else:
+        print(f"✅ YOLOv8 loaded from {model_path}")
+    return model
 
-def detect(image_path, confidence_threshold=0.5, detect_colors=True):
+# Loaded on first detection or during server warmup
+detector_model = LazyModel(
+    "yolo", _load_detector,
+    model_id=f"{DETECTOR_BACKEND}/{YOLO_MODEL if DETECTOR_BACKEND == 'ultralytics' else DETECTOR_EXPORTED_MODEL}",
+    device=device if DETECTOR_BACKEND == "ultralytics" else "cpu"
+)
+
+def detect(image, confidence_threshold=0.5, detect_colors=True):
     """
-    Detect objects in an image using YOLOv8 with GPU acceleration
+    Detect objects in an image using the configured YOLOv8 backend
     
     Args:
-        image_path: Path to the image file
+        image: Path to the image file, or a decoded BGR frame (numpy array)
         confidence_threshold: Minimum confidence score for detections
         detect_colors: Whether to detect colors for each object
     
     Returns:
         list: List of detection dictionaries with label, box, confidence, color, and colors
     """
+    model = detector_model.get()
     if model is None:
         return []
     
-    if not os.path.exists(image_path):
-        print(f"Warning: Image not found: {image_path}")
-        return []
+    if isinstance(image, str):
+        if not os.path.exists(image):
+            print(f"Warning: Image not found: {image}")
+            return []
+        image = cv2.imread(image)
+        if image is None:
+            return []
     
     try:
-        # Run inference with device specification
-        results = model(image_path, conf=confidence_threshold, verbose=False, device=device)
-        detections = []
-        
-        for r in results:
-            for box in r.boxes:
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                conf = float(box.conf[0])
-                cls = int(box.cls[0])
-                label = model.names[cls]
-                
-                detections.append({
-                    "label": label,
-                    "box": [x1, y1, x2, y2],
-                    "confidence": conf
-                })
+        detections = model.predict([image], confidence_threshold)[0]
         
         # Add color detection
         if detect_colors and detections:
-            detections = add_colors_to_detections(image_path, detections)
+            detections = add_colors_to_detections(image, detections)
         
         return detections
     except Exception as e:
         print(f"Error during detection: {e}")
         return []
+
+def get_labels():
+    """
+    Return the class names the detector can output
+    
+    Returns:
+        list: Label names, or an empty list if the detector is unavailable
+    """
+    model = detector_model.get()
+    if model is None:
+        return []
+    return list(model.names.values())
+
+def detect_batch(frames, confidence_threshold=0.5, detect_colors=True, batch_size=DETECT_BATCH_SIZE):
+    """
+    Detect objects in several frames with batched inference
+    
+    Args:
+        frames: List of decoded BGR frames (numpy arrays)
+        confidence_threshold: Minimum confidence score for detections
+        detect_colors: Whether to detect colors for each object
+        batch_size: Maximum number of frames per model call
+    
+    Returns:
+        list: One list of detection dictionaries per input frame
+    """
+    if not frames:
+        return []
+    
+    model = detector_model.get()
+    if model is None:
+        return [[] for _ in frames]
+    
+    all_detections = []
+    for start in range(0, len(frames), batch_size):
+        chunk = frames[start:start + batch_size]
+        try:
+            chunk_detections = model.predict(chunk, confidence_threshold)
+        except Exception as e:
+            print(f"Error during batch detection: {e}")
+            chunk_detections = [[] for _ in chunk]
+        
+        # Add color detection
+        if detect_colors:
+            for frame, detections in zip(chunk, chunk_detections):
+                if detections:
+                    add_colors_to_detections(frame, detections)
+        
+        all_detections.extend(chunk_detections)
+    
+    return all_detections
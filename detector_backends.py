@@ -0,0 +1,344 @@
+"""
+Inference backends for the object detector
+PyTorch (ultralytics), ONNX Runtime and OpenVINO, with optional INT8 quantization
+"""
+
+import ast
+import os
+
+import cv2
+import numpy as np
+
+
+class UltralyticsBackend:
+    """Runs a YOLOv8 .pt model through ultralytics (PyTorch)"""
+
+    def __init__(self, model_path, device="cpu"):
+        from ultralytics import YOLO
+
+        self.device = device
+        self.model = YOLO(model_path)
+        if device == "cuda":
+            self.model.to(device)
+        self.names = self.model.names
+
+    def predict(self, frames, confidence_threshold):
+        """
+        Run detection on a batch of frames
+
+        Args:
+            frames: List of BGR frames (numpy arrays)
+            confidence_threshold: Minimum confidence score for detections
+
+        Returns:
+            list: One list of detection dictionaries per frame
+        """
+        results = self.model(frames, conf=confidence_threshold, verbose=False, device=self.device)
+        all_detections = []
+        for r in results:
+            detections = []
+            for box in r.boxes:
+                x1, y1, x2, y2 = box.xyxy[0].tolist()
+                detections.append({
+                    "label": self.names[int(box.cls[0])],
+                    "box": [x1, y1, x2, y2],
+                    "confidence": float(box.conf[0])
+                })
+            all_detections.append(detections)
+        return all_detections
+
+
+def letterbox(frame, size):
+    """
+    Resize a frame to fit a size x size square, padding the rest (YOLO preprocessing)
+
+    Returns:
+        tuple: (padded image, scale ratio, (pad_x, pad_y))
+    """
+    h, w = frame.shape[:2]
+    ratio = min(size / h, size / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    pad_x, pad_y = (size - new_w) / 2, (size - new_h) / 2
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    padded = cv2.copyMakeBorder(resized, top, bottom, left, right,
+                                cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return padded, ratio, (left, top)
+
+
+def preprocess(frames, size):
+    """
+    Convert BGR frames into a normalized NCHW float32 batch
+
+    Returns:
+        tuple: (batch, list of (ratio, (pad_x, pad_y)) per frame)
+    """
+    images = []
+    transforms = []
+    for frame in frames:
+        padded, ratio, pad = letterbox(frame, size)
+        images.append(padded[:, :, ::-1])  # BGR -> RGB
+        transforms.append((ratio, pad))
+    batch = np.ascontiguousarray(np.stack(images).transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+    return batch, transforms
+
+
+def postprocess(output, frames, transforms, names, confidence_threshold, iou_threshold, max_det=300):
+    """
+    Decode raw YOLOv8 output (N, 4 + classes, anchors) into detection dictionaries
+    """
+    all_detections = []
+    for pred, frame, (ratio, (pad_x, pad_y)) in zip(output, frames, transforms):
+        pred = pred.T  # anchors x (4 + classes)
+        scores = pred[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+
+        keep = confidences >= confidence_threshold
+        pred, class_ids, confidences = pred[keep], class_ids[keep], confidences[keep]
+
+        detections = []
+        if len(pred):
+            cx, cy, bw, bh = pred[:, 0], pred[:, 1], pred[:, 2], pred[:, 3]
+            xywh = np.stack([cx - bw / 2, cy - bh / 2, bw, bh], axis=1)
+            kept = cv2.dnn.NMSBoxesBatched(
+                xywh.tolist(), confidences.tolist(), class_ids.tolist(),
+                confidence_threshold, iou_threshold
+            )
+            kept = np.array(kept, dtype=int).reshape(-1)[:max_det]
+
+            h, w = frame.shape[:2]
+            for i in kept:
+                x, y, bw_i, bh_i = xywh[i]
+                x1 = float(np.clip((x - pad_x) / ratio, 0, w))
+                y1 = float(np.clip((y - pad_y) / ratio, 0, h))
+                x2 = float(np.clip((x + bw_i - pad_x) / ratio, 0, w))
+                y2 = float(np.clip((y + bh_i - pad_y) / ratio, 0, h))
+                detections.append({
+                    "label": names[int(class_ids[i])],
+                    "box": [x1, y1, x2, y2],
+                    "confidence": float(confidences[i])
+                })
+            detections.sort(key=lambda d: d["confidence"], reverse=True)
+        all_detections.append(detections)
+    return all_detections
+
+
+def _model_file_bytes(model_path):
+    """Size of a model on disk, including the .bin weights next to an OpenVINO IR .xml"""
+    size = os.path.getsize(model_path)
+    weights_path = os.path.splitext(model_path)[0] + ".bin"
+    if model_path.endswith(".xml") and os.path.exists(weights_path):
+        size += os.path.getsize(weights_path)
+    return size
+
+
+def _names_from_metadata(value):
+    """Parse the class-name map ultralytics stores in exported model metadata"""
+    names = ast.literal_eval(value) if isinstance(value, str) else value
+    return {int(k): v for k, v in names.items()}
+
+
+class _ExportedModelBackend:
+    """Shared pre/post-processing for exported (ONNX / OpenVINO) YOLOv8 models"""
+
+    def __init__(self, img_size, iou_threshold):
+        self.img_size = img_size
+        self.iou_threshold = iou_threshold
+        self.names = {}
+        self.dynamic_batch = False
+
+    def _infer(self, batch):
+        raise NotImplementedError
+
+    def predict(self, frames, confidence_threshold):
+        """
+        Run detection on a batch of frames
+
+        Args:
+            frames: List of BGR frames (numpy arrays)
+            confidence_threshold: Minimum confidence score for detections
+
+        Returns:
+            list: One list of detection dictionaries per frame
+        """
+        batch, transforms = preprocess(frames, self.img_size)
+        if self.dynamic_batch:
+            output = self._infer(batch)
+        else:
+            # Model was exported with a fixed batch size of one
+            output = np.concatenate([self._infer(batch[i:i + 1]) for i in range(len(batch))])
+        return postprocess(output, frames, transforms, self.names,
+                           confidence_threshold, self.iou_threshold)
+
+
+class OnnxRuntimeBackend(_ExportedModelBackend):
+    """Runs an exported YOLOv8 ONNX model (FP32 or INT8) with ONNX Runtime on CPU"""
+
+    def __init__(self, model_path, img_size=640, iou_threshold=0.7, num_threads=0):
+        import onnxruntime as ort
+
+        super().__init__(img_size, iou_threshold)
+        self.memory_bytes = os.path.getsize(model_path)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        if "names" in metadata:
+            self.names = _names_from_metadata(metadata["names"])
+        if "imgsz" in metadata:
+            self.img_size = ast.literal_eval(metadata["imgsz"])[0]
+
+    def _infer(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVINOBackend(_ExportedModelBackend):
+    """Runs an exported YOLOv8 model (ONNX or OpenVINO IR, FP32 or INT8) with OpenVINO on CPU"""
+
+    def __init__(self, model_path, img_size=640, iou_threshold=0.7):
+        import openvino as ov
+
+        super().__init__(img_size, iou_threshold)
+        self.memory_bytes = _model_file_bytes(model_path)
+        core = ov.Core()
+        model = core.read_model(model_path)
+        self.dynamic_batch = model.inputs[0].get_partial_shape()[0].is_dynamic
+
+        try:
+            self.names = _names_from_metadata(model.get_rt_info(["model_info", "names"]).astype(str))
+        except Exception:
+            self.names = _names_from_onnx(model_path)
+
+        self.compiled = core.compile_model(model, "CPU", {"PERFORMANCE_HINT": "THROUGHPUT"})
+
+    def _infer(self, batch):
+        return self.compiled(batch)[0]
+
+
+def _names_from_onnx(model_path):
+    """Read class names from ONNX metadata (for OpenVINO runs of ONNX files)"""
+    if not model_path.endswith(".onnx"):
+        return {}
+    import onnx
+
+    metadata = {p.key: p.value for p in onnx.load(model_path, load_external_data=False).metadata_props}
+    return _names_from_metadata(metadata["names"]) if "names" in metadata else {}
+
+
+def load_backend(name, model_path, device="cpu", img_size=640, iou_threshold=0.7):
+    """
+    Create a detector backend
+
+    Args:
+        name: "ultralytics", "onnxruntime" or "openvino"
+        model_path: .pt weights for ultralytics, exported .onnx / .xml model otherwise
+        device: Torch device for the ultralytics backend
+        img_size: Network input size for exported models
+        iou_threshold: NMS IoU threshold for exported models
+
+    Returns:
+        Backend object with predict(frames, confidence_threshold) and names
+    """
+    if name == "ultralytics":
+        return UltralyticsBackend(model_path, device)
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Exported detector model not found: {model_path}")
+    if name == "onnxruntime":
+        return OnnxRuntimeBackend(model_path, img_size, iou_threshold)
+    if name == "openvino":
+        return OpenVINOBackend(model_path, img_size, iou_threshold)
+    raise ValueError(f"Unknown detector backend '{name}'. Use ultralytics, onnxruntime or openvino")
+
+
+def export_onnx(weights_path, img_size=640):
+    """
+    Export YOLOv8 weights to ONNX with a dynamic batch dimension
+
+    Returns:
+        str: Path to the exported .onnx file
+    """
+    from ultralytics import YOLO
+
+    return YOLO(weights_path).export(format="onnx", imgsz=img_size, dynamic=True, simplify=True)
+
+
+class _FrameCalibrationReader:
+    """Feeds preprocessed calibration frames to ONNX Runtime static quantization"""
+
+    def __init__(self, image_paths, input_name, img_size):
+        self.image_paths = iter(image_paths)
+        self.input_name = input_name
+        self.img_size = img_size
+
+    def get_next(self):
+        for path in self.image_paths:
+            frame = cv2.imread(path)
+            if frame is not None:
+                batch, _ = preprocess([frame], self.img_size)
+                return {self.input_name: batch}
+        return None
+
+
+def quantize_int8(onnx_path, output_path, calibration_images, img_size=640):
+    """
+    Statically quantize an ONNX detector to INT8
+
+    Activation ranges are calibrated on representative frames (e.g. a few
+    hundred stored CCTV frames). The QDQ output runs on both ONNX Runtime and
+    OpenVINO.
+
+    Args:
+        onnx_path: FP32 ONNX model from export_onnx
+        output_path: Where to write the INT8 model
+        calibration_images: List of image paths used for calibration
+        img_size: Network input size
+
+    Returns:
+        str: output_path
+    """
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    if not calibration_images:
+        raise ValueError("INT8 quantization needs at least one calibration image")
+
+    prepared_path = output_path + ".prep.onnx"
+    quant_pre_process(onnx_path, prepared_path, skip_symbolic_shape=True)
+    try:
+        input_name = ort.InferenceSession(prepared_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+        quantize_static(
+            prepared_path,
+            output_path,
+            _FrameCalibrationReader(calibration_images, input_name, img_size),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            calibrate_method=CalibrationMethod.MinMax
+        )
+    finally:
+        if os.path.exists(prepared_path):
+            os.remove(prepared_path)
+
+    # Keep the class names so the quantized model reports the same labels
+    import onnx
+
+    source = onnx.load(onnx_path, load_external_data=False)
+    quantized = onnx.load(output_path)
+    existing = {p.key for p in quantized.metadata_props}
+    for prop in source.metadata_props:
+        if prop.key not in existing:
+            quantized.metadata_props.append(prop)
+    onnx.save(quantized, output_path)
+    return output_path
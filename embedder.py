@@ -1,68 +1,125 @@
-from sentence_transformers import SentenceTransformer
 import numpy as np
-import faiss
+import threading
+import torch
 
-# Initialize model
-model = SentenceTransformer('all-MiniLM-L6-v2')
+from config import EMBEDDING_MODEL, TEXT_EMBEDDING_CACHE_SIZE, EMBEDDING_INDEX_TYPE, INDEX_FOLDER
+from lazy_model import LazyModel
+from embedding_cache import EmbeddingCache
+from vector_index import VectorIndex
+from sharded_index import ShardedIndex
+
+device = "cuda" if torch.cuda.is_available() else "cpu"
+
+def _load_text_model():
+    """Load the sentence transformer used for label-text embeddings"""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL, device=device)
+
+# Loaded on first use or during server warmup
+text_model = LazyModel(
+    "text_embedder", _load_text_model,
+    model_id=f"sentence-transformers/{EMBEDDING_MODEL}", device=device
+)
+
+def _encode(texts):
+    """Encode texts, raising if the text model could not be loaded"""
+    model = text_model.get()
+    if model is None:
+        raise RuntimeError(f"Text embedding model unavailable: {text_model.error}")
+    return np.array(model.encode(texts)).astype('float32')
+
+# Frame texts come from a tiny label vocabulary ("person", "person car", ...),
+# so nearly every frame and repeated query is a cache hit
+_text_cache = EmbeddingCache(TEXT_EMBEDDING_CACHE_SIZE)
+
+def _embed(texts):
+    """Embed texts through the cache, returning a (N, dimension) float32 array"""
+    return np.stack(_text_cache.get_many(texts, _encode))
 
 dimension = 384
-index = faiss.IndexFlatL2(dimension)
-metadata = []
 
-def add(text, meta):
+# One index per video under IDs unique across videos, so deletes drop a whole
+# shard and never renumber frames
+index = ShardedIndex(
+    "text", dimension, lambda folder: VectorIndex(dimension, EMBEDDING_INDEX_TYPE, metric="l2"),
+    metric="l2", root=INDEX_FOLDER
+)
+
+# Guards the index against concurrent ingestion jobs and queries
+_lock = threading.RLock()
+
+def add(text, meta, vector=None):
     """
     Add a text embedding to the FAISS index
     
     Args:
         text: Text to encode
-        meta: Metadata dictionary to store
+        meta: Metadata dictionary to store (its video_filename selects the shard)
+        vector: Precomputed embedding to reuse instead of encoding text
+    
+    Returns:
+        numpy.ndarray: The stored embedding
     """
-    if not text or not text.strip():
-        text = "unknown"
+    if vector is None:
+        if not text or not text.strip():
+            text = "unknown"
+        vector = _embed([text])
     
-    vector = model.encode([text])
-    index.add(np.array(vector).astype('float32'))
-    metadata.append(meta)
+    with _lock:
+        index.add(vector, [meta])
+    return vector
 
-def search(query, k=5):
+def search(query, k=5, video_filename=None):
     """
     Search for similar embeddings in the index
     
     Args:
         query: Query text
         k: Number of results to return
+        video_filename: Only search frames from this video
     
     Returns:
         list: List of metadata dictionaries for matching results
     """
-    if not metadata:
-        return []
-    
     if not query or not query.strip():
         return []
     
-    # Limit k to available items
-    k = min(k, len(metadata))
+    with _lock:
+        if not len(index):
+            return []
     
-    vector = model.encode([query])
-    D, I = index.search(np.array(vector).astype('float32'), k)
+    if text_model.get() is None:
+        return []
+    vector = _embed([query])
     
-    results = []
-    for i in I[0]:
-        if i < len(metadata) and i >= 0:
-            results.append(metadata[i])
+    with _lock:
+        matches = index.search(vector, k, video_filename=video_filename)[0]
     
-    return results
+    return [meta for _, meta in matches]
 
 def get_index_size():
     """Return the number of items in the index"""
-    return len(metadata)
+    with _lock:
+        return len(index)
+
+def set_search_params(nprobe=None, ef_search=None):
+    """Tune ANN recall/latency (IVF nprobe, HNSW efSearch) of the text index"""
+    with _lock:
+        index.set_search_params(nprobe=nprobe, ef_search=ef_search)
+
+def get_index_stats():
+    """Return the text index configuration and size"""
+    with _lock:
+        return index.stats()
+
+def get_text_cache_stats():
+    """Return hit-rate statistics of the text embedding cache"""
+    return _text_cache.stats()
 
 def clear_embeddings():
     """Clear all embeddings and rebuild index"""
-    global index, metadata
-    metadata = []
-    index = faiss.IndexFlatL2(dimension)
+    with _lock:
+        index.clear()
 
 def remove_video_embeddings(video_filename):
     """
@@ -71,20 +128,28 @@ def remove_video_embeddings(video_filename):
     Args:
         video_filename: Name of the video file to remove
     """
-    global index, metadata
+    with _lock:
+        index.remove_video(video_filename)
+
+def load_index(folder=INDEX_FOLDER):
+    """
+    Load the persisted text index shards and keep them saved from now on
     
-    # Filter out metadata for this video
-    new_metadata = [m for m in metadata if m.get("video_filename") != video_filename]
+    Args:
+        folder: Directory holding the shard folders
     
-    # Rebuild index if items were removed
-    if len(new_metadata) < len(metadata):
-        metadata = new_metadata
-        index = faiss.IndexFlatL2(dimension)
-        
-        # Re-add all remaining items
-        for meta in metadata:
-            objects = meta.get("objects", [])
-            text = " ".join(objects) if objects else "unknown"
-            vector = model.encode([text])
-            index.add(np.array(vector).astype('float32'))
+    Returns:
+        int: Number of frames loaded
+    """
+    with _lock:
+        return index.load(folder)
 
+def save_index(video_filename=None):
+    """
+    Snapshot text index shards and compact their logs
+    
+    Args:
+        video_filename: Only save this video's shard (default: every shard with new frames)
+    """
+    with _lock:
+        index.save(video_filename)
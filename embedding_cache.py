@@ -0,0 +1,90 @@
+"""
+LRU cache for text embeddings
+Repeated strings (label vocabularies, common queries) are encoded only once
+"""
+
+import threading
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Cache key for a text: lowercased with whitespace collapsed"""
+    return " ".join(text.lower().split())
+
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU cache mapping normalized text to its embedding
+
+    Misses are encoded together in one batch, and hit/miss counters are kept
+    so the hit rate can be reported.
+    """
+
+    def __init__(self, max_size):
+        """
+        Args:
+            max_size: Maximum number of cached embeddings
+        """
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, texts, encode_fn):
+        """
+        Look up embeddings, encoding the texts that are not cached
+
+        Args:
+            texts: List of texts
+            encode_fn: Callable encoding a list of texts into a (N, D) array
+
+        Returns:
+            list: One embedding (1-D array) per text
+        """
+        keys = [normalize_text(text) for text in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing:
+            for key, vector in zip(missing, encode_fn(missing)):
+                found[key] = vector
+
+        with self._lock:
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+            for key in missing:
+                self._entries[key] = found[key]
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return [found[key] for key in keys]
+
+    def clear(self):
+        """Drop every cached embedding and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return size and hit-rate statistics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,70 @@
+"""
+Seek-based frame sampling for video ingestion
+Decodes only the frames that are actually sampled
+"""
+
+import cv2
+
+from config import SEEK_MIN_GAP_SECONDS
+
+
+def sample_frames(cap, sample_fps, seek_min_gap=SEEK_MIN_GAP_SECONDS):
+    """
+    Yield sampled frames from an opened video capture
+
+    Frames between targets are skipped with grab() (no retrieve/colour
+    conversion), and gaps longer than seek_min_gap seconds are skipped by
+    seeking, which only decodes from the nearest keyframe onward.
+
+    Args:
+        cap: Opened cv2.VideoCapture
+        sample_fps: Number of frames to sample per second of video
+        seek_min_gap: Minimum gap (seconds) before seeking instead of grabbing
+
+    Yields:
+        tuple: (frame_index, timestamp, frame)
+    """
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps == 0:
+        fps = 30  # Default fallback
+
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if frame_count <= 0:
+        # Unknown length (e.g. some streams) - sample until the stream ends
+        frame_count = float("inf")
+
+    step = fps / sample_fps
+    seek_gap = max(1, int(seek_min_gap * fps))
+    position = 0  # Index of the next frame grab() would return
+    k = 0
+
+    while True:
+        target = int(round(k * step))
+        k += 1
+        if target < position:
+            continue
+        if target >= frame_count:
+            break
+
+        gap = target - position
+        if gap >= seek_gap and cap.set(cv2.CAP_PROP_POS_FRAMES, target):
+            position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+            if position > target:
+                # Backend overshot; nothing we can do but sample from here
+                target = position
+
+        # Step over the remaining frames without decoding them to BGR
+        while position < target:
+            if not cap.grab():
+                return
+            position += 1
+
+        if not cap.grab():
+            return
+        position += 1
+
+        ret, frame = cap.retrieve()
+        if not ret:
+            return
+
+        yield target, target / fps, frame
@@ -0,0 +1,58 @@
+"""
+Asynchronous frame persistence
+Writes sampled frames to disk off the ingestion hot path
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import cv2
+
+from config import FRAME_WRITER_THREADS, FRAME_WRITE_QUEUE_SIZE
+
+_executor = ThreadPoolExecutor(max_workers=FRAME_WRITER_THREADS, thread_name_prefix="frame-writer")
+
+# Bounds the number of frames held in memory waiting to be written
+_pending = threading.BoundedSemaphore(FRAME_WRITE_QUEUE_SIZE)
+
+
+def _write(path, frame):
+    try:
+        if not cv2.imwrite(path, frame):
+            print(f"Warning: Failed to write frame: {path}")
+    except Exception as e:
+        print(f"Error writing frame {path}: {e}")
+    finally:
+        _pending.release()
+
+
+def save_frame_async(path, frame):
+    """
+    Queue a frame to be JPEG-encoded and written in the background
+
+    Blocks only when FRAME_WRITE_QUEUE_SIZE frames are already waiting.
+
+    Args:
+        path: Destination image path
+        frame: BGR frame (numpy array); must not be modified afterwards
+
+    Returns:
+        Future that completes once the file is written
+    """
+    _pending.acquire()
+    try:
+        return _executor.submit(_write, path, frame)
+    except Exception:
+        _pending.release()
+        raise
+
+
+def wait_for_writes(futures):
+    """
+    Block until the given frame writes have finished
+
+    Args:
+        futures: Futures returned by save_frame_async
+    """
+    if futures:
+        wait(futures)
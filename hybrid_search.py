@@ -3,17 +3,20 @@ Hybrid search combining CLIP visual matching + text embeddings
 Provides national-level accuracy with smart scoring
 """
 
-from embedder import search as text_search
+import embedder
+import clip_engine
+from embedder import search as text_search, get_text_cache_stats, get_index_stats
 from clip_engine import search_clip, get_clip_status
 from query_parser import parse_query
 
-def hybrid_search(query, top_k=10):
+def hybrid_search(query, top_k=10, video_filename=None):
     """
     Hybrid search combining multiple methods
     
     Args:
         query: Natural language query
         top_k: Number of results to return
+        video_filename: Only search frames from this video (default: every video)
     
     Returns:
         List of ranked results with scores
@@ -22,13 +25,13 @@ def hybrid_search(query, top_k=10):
     parsed = parse_query(query)
     
     # Get results from text search
-    text_results = text_search(query, k=top_k)
+    text_results = text_search(query, k=top_k, video_filename=video_filename)
     
     # Get results from CLIP if available
     clip_status = get_clip_status()
     clip_results = []
     if clip_status['available']:
-        clip_results = search_clip(query, top_k=top_k)
+        clip_results = search_clip(query, top_k=top_k, video_filename=video_filename)
     
     # Combine results with scoring
     combined = {}
@@ -67,10 +70,11 @@ def hybrid_search(query, top_k=10):
     for image_key, data in combined.items():
         meta = data["meta"]
         
-        # Time range filter
+        # Time range filter (merged CLIP entries cover a range of frames)
         if parsed.get("time_range"):
             timestamp = meta.get("timestamp", 0)
-            if not (parsed["time_range"]["start"] <= timestamp <= parsed["time_range"]["end"]):
+            covered = meta.get("time_range", {"start": timestamp, "end": timestamp})
+            if covered["end"] < parsed["time_range"]["start"] or covered["start"] > parsed["time_range"]["end"]:
                 continue
         
         # Match specific detections to query
@@ -154,5 +158,20 @@ def get_search_stats():
         "clip_available": clip_status['available'],
         "clip_device": clip_status['device'],
         "clip_indexed": clip_status['indexed_images'],
-        "hybrid_search": "enabled" if clip_status['available'] else "text-only"
+        "hybrid_search": "enabled" if clip_status['available'] else "text-only",
+        "text_embedding_cache": get_text_cache_stats(),
+        "clip_text_cache": clip_engine.get_text_cache_stats(),
+        "text_index": get_index_stats(),
+        "clip_index": clip_status['index']
     }
+
+def set_search_params(nprobe=None, ef_search=None):
+    """
+    Tune the recall/latency trade-off of both ANN indexes
+    
+    Args:
+        nprobe: IVF clusters visited per query
+        ef_search: HNSW candidates considered per query
+    """
+    embedder.set_search_params(nprobe=nprobe, ef_search=ef_search)
+    clip_engine.set_search_params(nprobe=nprobe, ef_search=ef_search)
@@ -0,0 +1,215 @@
+"""
+On-disk persistence for vector indexes
+Append-only metadata/vector logs plus periodic index snapshots
+"""
+
+import json
+import os
+import threading
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+from vector_index import codes_path, rows_path
+
+
+def _json_default(value):
+    """Serialize numpy scalars and arrays found in frame metadata"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+_SHARD_PREFIX = "video-"
+
+
+def shard_folder(root, video_filename):
+    """Folder holding every store of one video's shard"""
+    return os.path.join(root, _SHARD_PREFIX + quote(video_filename or "", safe=""))
+
+
+def list_shard_folders(root):
+    """Yield (video_filename, folder) for every shard folder under root"""
+    if not os.path.isdir(root):
+        return
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if name.startswith(_SHARD_PREFIX) and os.path.isdir(path):
+            yield unquote(name[len(_SHARD_PREFIX):]), path
+
+
+def remove_empty_folder(path):
+    """Delete a shard folder once its last store has removed its files"""
+    try:
+        os.rmdir(path)
+    except OSError:
+        pass
+
+
+def read_jsonl(path):
+    """Yield the records of a JSONL file, skipping a torn last line after a crash"""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+class JsonlLog:
+    """Append-only JSONL file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def append(self, records):
+        """Append records and flush them to disk"""
+        lines = "".join(json.dumps(r, default=_json_default) + "\n" for r in records)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+
+    def rewrite(self, records):
+        """Atomically replace the file with the given records"""
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for r in records:
+                    f.write(json.dumps(r, default=_json_default) + "\n")
+            os.replace(tmp_path, self.path)
+
+    def clear(self):
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+class IndexStore:
+    """
+    Persists one VectorIndex and its metadata
+
+    Files in the store folder:
+        {name}.faiss      snapshot of the index (memory-mapped on load where FAISS allows)
+        {name}.codes.npz  compressed EmbeddingMatrix rows saved with the snapshot
+        {name}.jsonl      metadata log: snapshot entries, appended entries (with
+                          their row in the vector log) and metadata updates
+        {name}.f32        raw float32 vectors appended since the last snapshot
+
+    Every add and metadata update is written immediately, so a crash loses
+    nothing; vectors are only removed by dropping the whole store with
+    clear(). On load, the snapshot is mapped and the log is replayed on top
+    of it; the vector log is read through np.memmap. Snapshots compact the log.
+    """
+
+    def __init__(self, folder, name, dim):
+        """
+        Args:
+            folder: Directory holding the index files
+            name: File name prefix (e.g. "text", "clip")
+            dim: Vector dimension
+        """
+        os.makedirs(folder, exist_ok=True)
+        self.dim = dim
+        self.index_path = os.path.join(folder, f"{name}.faiss")
+        self.vectors_path = os.path.join(folder, f"{name}.f32")
+        self.log = JsonlLog(os.path.join(folder, f"{name}.jsonl"))
+        self._rows = 0
+
+    @property
+    def exists(self):
+        """Whether anything of this store is on disk"""
+        return any(os.path.exists(p) for p in (self.index_path, self.vectors_path, self.log.path))
+
+    @property
+    def pending_rows(self):
+        """Vectors appended since the last snapshot"""
+        return self._rows
+
+    def append(self, ids, vectors, metas):
+        """
+        Record newly indexed vectors
+
+        Args:
+            ids: Vector IDs
+            vectors: (N, dim) float32 array
+            metas: Metadata dictionary per vector
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with open(self.vectors_path, "ab") as f:
+            f.write(vectors.tobytes())
+        self.log.append(
+            {"id": int(i), "row": self._rows + n, "meta": meta}
+            for n, (i, meta) in enumerate(zip(ids, metas))
+        )
+        self._rows += len(vectors)
+
+    def update(self, ids, metas):
+        """Record new metadata for already stored vectors"""
+        self.log.append({"id": int(i), "meta": meta} for i, meta in zip(ids, metas))
+
+    def load(self, index):
+        """
+        Restore an index and its metadata from disk
+
+        Args:
+            index: VectorIndex to fill (replaced by the snapshot if one exists)
+
+        Returns:
+            dict: Vector ID -> metadata
+        """
+        if os.path.exists(self.index_path):
+            index.read(self.index_path)
+        in_snapshot = set(index.ids().tolist())
+
+        vectors = None
+        if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path):
+            vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r").reshape(-1, self.dim)
+        self._rows = 0 if vectors is None else len(vectors)
+
+        metadata = {}
+        pending = {}  # ID -> row of vectors added after the snapshot
+        for record in read_jsonl(self.log.path):
+            i = record["id"]
+            row = record.get("row")
+            if row is not None and i not in in_snapshot:
+                if vectors is None or row >= len(vectors):
+                    continue  # Vector write was interrupted
+                pending[i] = row
+            elif i not in in_snapshot and i not in pending:
+                continue  # Metadata update for a vector that never reached disk
+            metadata[i] = record["meta"]
+
+        # Snapshot entries without metadata never had their log entry written
+        removed = in_snapshot - metadata.keys()
+        if removed:
+            index.remove_ids(sorted(removed))
+        if pending:
+            index.add(vectors[list(pending.values())], list(pending.keys()))
+        return metadata
+
+    def snapshot(self, index, metadata):
+        """
+        Write a full snapshot and compact the logs
+
+        Args:
+            index: VectorIndex to save
+            metadata: Vector ID -> metadata of every stored vector
+        """
+        index.write(self.index_path)
+        self.log.rewrite({"id": int(i), "meta": meta} for i, meta in metadata.items())
+        open(self.vectors_path, "wb").close()
+        self._rows = 0
+
+    def clear(self):
+        """Delete every file of the store"""
+        for path in (self.index_path, self.vectors_path, codes_path(self.index_path), rows_path(self.index_path)):
+            if os.path.exists(path):
+                os.remove(path)
+        self.log.clear()
+        self._rows = 0
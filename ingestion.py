@@ -0,0 +1,331 @@
+"""
+Pipelined video ingestion
+Overlaps frame decoding, model inference and indexing using bounded queues
+"""
+
+import math
+import queue
+import threading
+import time
+
+import cv2
+
+from config import (
+    INGEST_QUEUE_SIZE, DETECT_BATCH_SIZE, DETECT_BATCH_MAX_WAIT, MOTION_GATE_ENABLED, KEYFRAME_INTERVAL,
+    REID_ENABLED, ALERT_UNATTENDED_BAG, ALERT_CROWD_THRESHOLD
+)
+from frame_sampler import sample_frames
+from frame_writer import save_frame_async, wait_for_writes
+from motion_gate import MotionGate
+from box_propagation import BoxPropagator
+from detector import detect_batch
+from embedder import add
+from database import add_frame
+from track_store import record_detections
+from tracker import MultiObjectTracker, primary_person_id
+from reid_gallery import ReIDGallery
+from clip_engine import ClipBatcher
+
+# Marks the end of the stream on a stage queue
+_END = object()
+
+
+def _put(q, item, stop_event):
+    """
+    Put an item on a bounded queue without blocking forever
+
+    Returns:
+        bool: False if the pipeline was stopped before the item was queued
+    """
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop_event):
+    """Get an item from a stage queue, returning _END once the pipeline stops"""
+    while not stop_event.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _END
+
+
+def _decode_stage(path, frame_folder, sample_fps, max_width, motion_gate, out_q, stop_event, state):
+    """Decoder thread: sample and resize frames, queueing them to be saved"""
+    cap = cv2.VideoCapture(path)
+    gate = MotionGate() if motion_gate else None
+    try:
+        state["total_frames"] = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        state["expected_frames"] = math.ceil(state["total_frames"] / fps * sample_fps)
+
+        for frame_index, timestamp, frame in sample_frames(cap, sample_fps):
+            if stop_event.is_set():
+                break
+
+            # Resize frame for faster processing
+            h, w = frame.shape[:2]
+            if w > max_width:
+                scale = max_width / w
+                frame = cv2.resize(frame, (int(w * scale), int(h * scale)))
+
+            # Frames are handed downstream in memory; the JPEG is written in the background
+            img_path = f"{frame_folder}/frame_{int(timestamp)}_{frame_index}.jpg"
+            state["writes"].append(save_frame_async(img_path, frame))
+
+            # Near-identical frames skip inference and reuse the previous results
+            static = gate is not None and gate.is_static(frame)
+
+            item = {"image": img_path, "timestamp": timestamp, "frame": frame, "static": static}
+            if not _put(out_q, item, stop_event):
+                break
+    except Exception as e:
+        state["error"] = e
+        stop_event.set()
+    finally:
+        cap.release()
+        _put(out_q, _END, stop_event)
+
+
+def _collect_batch(in_q, batch_size, max_wait, stop_event):
+    """
+    Collect up to batch_size items, waiting at most max_wait seconds after the first
+
+    Returns:
+        tuple: (items, ended) where ended is True once _END was received
+    """
+    first = _get(in_q, stop_event)
+    if first is _END:
+        return [], True
+
+    items = [first]
+    deadline = time.time() + max_wait
+    while len(items) < batch_size:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        try:
+            item = in_q.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if item is _END:
+            return items, True
+        items.append(item)
+    return items, False
+
+
+def _inference_stage(in_q, out_q, confidence, batch_size, max_wait, keyframe_interval,
+                     stop_event, state):
+    """Inference thread: run batched object detection and person tracking"""
+    try:
+        tracker = MultiObjectTracker(reid=ReIDGallery() if REID_ENABLED else None)
+        propagator = BoxPropagator() if keyframe_interval > 1 else None
+        frames_since_keyframe = 0
+        last = None
+        ended = False
+        while not ended:
+            items, ended = _collect_batch(in_q, batch_size, max_wait, stop_event)
+            if not items:
+                break
+
+            # Without propagation every processed frame is a keyframe, so the batch is detected at once
+            batch_detections = None
+            if propagator is None:
+                batch_detections = iter(detect_batch(
+                    [item["frame"] for item in items if not item["static"]],
+                    confidence_threshold=confidence,
+                    batch_size=batch_size
+                ))
+
+            for item in items:
+                if item["static"]:
+                    # Items arrive in order, so last holds the most recent processed frame
+                    detections = [dict(d) for d in last["detections"]]
+                    person_id = last["person_id"]
+                else:
+                    if propagator is None:
+                        detections = next(batch_detections)
+                        detected = True
+                    else:
+                        # Keyframes are decided frame by frame, so a fallback detection
+                        # restarts the interval for the frames after it
+                        detections = None
+                        if frames_since_keyframe % keyframe_interval:
+                            detections = propagator.propagate(item["frame"])
+                        detected = detections is None
+                        if detected:
+                            # Keyframe, or propagation lost an object
+                            detections = detect_batch([item["frame"]], confidence_threshold=confidence)[0]
+                            propagator.reset(item["frame"], detections)
+                            frames_since_keyframe = 0
+                        frames_since_keyframe += 1
+
+                    # Detected and propagated boxes both advance the tracks;
+                    # person crops are only embedded for re-ID on real detections
+                    tracker.update(detections, frame=item["frame"] if detected else None,
+                                   timestamp=item["timestamp"])
+                    person_id = primary_person_id(detections)
+                    last = {"detections": detections, "person_id": person_id}
+
+                item["detections"] = detections
+                item["objects"] = [d["label"] for d in detections]
+                item["person_id"] = person_id
+                if not _put(out_q, item, stop_event):
+                    return
+    except Exception as e:
+        state["error"] = e
+        stop_event.set()
+    finally:
+        _put(out_q, _END, stop_event)
+
+
+def _check_alerts(objects, timestamp):
+    """Return alert messages for a processed frame"""
+    alerts = []
+
+    # ALERT: bag without person
+    if ALERT_UNATTENDED_BAG and "backpack" in objects and "person" not in objects:
+        alerts.append(f"⚠ ALERT: Unattended bag detected at {timestamp:.2f}s!")
+
+    # ALERT: multiple people
+    person_count = objects.count("person")
+    if person_count > ALERT_CROWD_THRESHOLD:
+        alerts.append(f"⚠ ALERT: Crowd detected ({person_count} people) at {timestamp:.2f}s!")
+
+    return alerts
+
+
+def process_video(path, video_filename, frame_folder, sample_fps=0.2, max_width=640,
+                  confidence=0.5, queue_size=INGEST_QUEUE_SIZE, batch_size=DETECT_BATCH_SIZE,
+                  batch_max_wait=DETECT_BATCH_MAX_WAIT, motion_gate=MOTION_GATE_ENABLED,
+                  keyframe_interval=KEYFRAME_INTERVAL, progress_callback=None, cancel_event=None):
+    """
+    Ingest a video through a three-stage pipeline
+
+    The decoder and inference stages run in their own threads and hand frames
+    over bounded queues, so memory stays bounded by queue depth while decoding
+    overlaps with YOLO and CLIP work. Indexing runs in the calling thread.
+
+    Args:
+        path: Path to the video file
+        video_filename: Stored name of the video (used in frame metadata)
+        frame_folder: Folder to write sampled frames to
+        sample_fps: Number of frames to sample per second of video
+        max_width: Resize frames to this width
+        confidence: Detection confidence threshold
+        queue_size: Maximum number of frames buffered between stages
+        batch_size: Maximum number of frames per batched detection call
+        batch_max_wait: Seconds to wait for a detection batch to fill
+        motion_gate: Reuse the previous frame's results for near-identical frames
+        keyframe_interval: Run the detector on every Nth frame and propagate
+            boxes with optical flow in between (1 = detect every frame)
+        progress_callback: Optional callable(frames_done, expected_frames)
+        cancel_event: Optional threading.Event that stops processing when set
+
+    Returns:
+        dict: Processing summary with frames, skipped_frames, total_frames,
+        alerts, frames merged into near-duplicate CLIP entries, fps and
+        whether the run was cancelled
+    """
+    decoded_q = queue.Queue(maxsize=queue_size)
+    detected_q = queue.Queue(maxsize=queue_size)
+    stop_event = threading.Event()
+    state = {"total_frames": 0, "expected_frames": 0, "writes": [], "error": None}
+
+    decoder = threading.Thread(
+        target=_decode_stage,
+        args=(path, frame_folder, sample_fps, max_width, motion_gate, decoded_q, stop_event, state),
+        name="ingest-decode",
+        daemon=True,
+    )
+    inference = threading.Thread(
+        target=_inference_stage,
+        args=(decoded_q, detected_q, confidence, batch_size, batch_max_wait, keyframe_interval,
+              stop_event, state),
+        name="ingest-inference",
+        daemon=True,
+    )
+
+    start_time = time.time()
+    processed_frames = 0
+    skipped_frames = 0
+    alerts = []
+    last_text_vector = None
+    clip_batcher = ClipBatcher()
+
+    decoder.start()
+    inference.start()
+    cancelled = False
+    try:
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                cancelled = True
+                break
+
+            item = _get(detected_q, stop_event)
+            if item is _END:
+                break
+
+            meta = {
+                "image": item["image"],
+                "timestamp": item["timestamp"],
+                "detections": item["detections"],  # Full detection data with boxes and confidence
+                "objects": item["objects"],  # For backward compatibility
+                "person_id": item["person_id"],
+                "video_path": path,
+                "video_filename": video_filename
+            }
+
+            if item["static"]:
+                skipped_frames += 1
+            else:
+                last_text_vector = None
+
+            # Add to text search index
+            last_text_vector = add(" ".join(meta["objects"]), meta, vector=last_text_vector)
+
+            # Add to CLIP visual search index (encoded in batches)
+            clip_batcher.add(item["frame"], meta, reuse=item["static"])
+
+            # Add to database
+            add_frame(meta)
+            record_detections(video_filename, item["timestamp"], item["detections"])
+            processed_frames += 1
+
+            for alert_msg in _check_alerts(meta["objects"], meta["timestamp"]):
+                print(alert_msg)
+                alerts.append(alert_msg)
+
+            if progress_callback is not None:
+                progress_callback(processed_frames, state["expected_frames"])
+
+        if not cancelled:
+            clip_batcher.flush()
+    except Exception as e:
+        state["error"] = e
+    finally:
+        stop_event.set()
+        decoder.join()
+        inference.join()
+        # Frames must be on disk before the video is reported as done
+        wait_for_writes(state["writes"])
+
+    if state["error"] is not None:
+        raise state["error"]
+
+    elapsed = time.time() - start_time
+    return {
+        "frames": processed_frames,
+        "skipped_frames": skipped_frames,
+        "total_frames": state["total_frames"],
+        "alerts": alerts,
+        "clip_merged_frames": clip_batcher.merged,
+        "processing_fps": round(processed_frames / elapsed, 2) if elapsed > 0 else 0.0,
+        "cancelled": cancelled
+    }
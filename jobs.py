@@ -0,0 +1,208 @@
+"""
+Background ingestion jobs
+Runs video processing in a worker pool with progress reporting and cancellation
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import INGEST_WORKERS
+from ingestion import process_video
+from embedder import remove_video_embeddings, save_index as save_text_index
+from clip_engine import remove_video_clip_embeddings, save_index as save_clip_index
+from database import remove_video_frames, get_frames_by_video
+from track_store import remove_video_tracks
+
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest-job")
+_jobs = {}
+_lock = threading.Lock()
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+_FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+def _update(job_id, **fields):
+    with _lock:
+        _jobs[job_id].update(fields)
+
+
+def _video_in_use(video_filename):
+    """Whether a video is already indexed or has a queued or running job (caller holds _lock)"""
+    if any(job["video_filename"] == video_filename and job["status"] not in _FINISHED_STATES
+           for job in _jobs.values()):
+        return True
+    return bool(get_frames_by_video(video_filename))
+
+
+def video_in_use(video_filename):
+    """
+    Check whether a stored video name is taken
+
+    Args:
+        video_filename: Stored name of the video
+
+    Returns:
+        bool: True if the video is indexed or still being processed
+    """
+    with _lock:
+        return _video_in_use(video_filename)
+
+
+def _discard_video(video_filename):
+    """Drop everything a job indexed for its video, so searches never see half a video"""
+    remove_video_embeddings(video_filename)
+    remove_video_clip_embeddings(video_filename)
+    remove_video_frames(video_filename)
+    remove_video_tracks(video_filename)
+
+
+def _run_job(job_id, path, video_filename, options):
+    """Worker entry point: process the video and record the outcome"""
+    with _lock:
+        job = _jobs[job_id]
+        if job["cancel_event"].is_set():
+            return
+        job["status"] = RUNNING
+        job["started_at"] = time.time()
+
+    def on_progress(frames_done, expected_frames):
+        _update(job_id, frames_done=frames_done, frames_expected=max(expected_frames, frames_done))
+
+    try:
+        summary = process_video(
+            path,
+            video_filename,
+            progress_callback=on_progress,
+            cancel_event=job["cancel_event"],
+            **options
+        )
+    except Exception as e:
+        print(f"Error processing video {video_filename}: {e}")
+        _discard_video(video_filename)
+        _update(job_id, status=FAILED, error=str(e), finished_at=time.time())
+        return
+
+    if summary["cancelled"]:
+        _discard_video(video_filename)
+        _update(job_id, status=CANCELLED, finished_at=time.time())
+        return
+
+    # The video's shards are complete: snapshot them and compact their logs
+    save_text_index(video_filename)
+    save_clip_index(video_filename)
+    _update(job_id, status=COMPLETED, result=summary, finished_at=time.time())
+
+
+def submit_ingestion_job(path, video_filename, **options):
+    """
+    Queue a video for background ingestion
+
+    A failed or cancelled job discards everything stored under its video
+    name, so a name that is indexed or still being processed is refused.
+
+    Args:
+        path: Path to the saved video file
+        video_filename: Stored name of the video
+        **options: Extra keyword arguments for ingestion.process_video
+
+    Returns:
+        str: Job ID
+
+    Raises:
+        ValueError: If the video is already indexed or being processed
+    """
+    job_id = uuid.uuid4().hex
+    with _lock:
+        if _video_in_use(video_filename):
+            raise ValueError(f"Video '{video_filename}' is already indexed or being processed")
+        _jobs[job_id] = {
+            "job_id": job_id,
+            "video_filename": video_filename,
+            "status": QUEUED,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "frames_done": 0,
+            "frames_expected": 0,
+            "result": None,
+            "error": None,
+            "cancel_event": threading.Event()
+        }
+    _executor.submit(_run_job, job_id, path, video_filename, options)
+    return job_id
+
+
+def get_job(job_id):
+    """
+    Get the progress of a job
+
+    Args:
+        job_id: Job ID returned by submit_ingestion_job
+
+    Returns:
+        dict: Job status with progress, fps and ETA, or None if unknown
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        job = dict(job)
+
+    del job["cancel_event"]
+
+    fps = 0.0
+    eta = None
+    if job["started_at"] is not None:
+        end = job["finished_at"] or time.time()
+        elapsed = end - job["started_at"]
+        if elapsed > 0:
+            fps = job["frames_done"] / elapsed
+        if job["status"] == RUNNING and fps > 0:
+            eta = max(job["frames_expected"] - job["frames_done"], 0) / fps
+
+    progress = 0.0
+    if job["status"] == COMPLETED:
+        progress = 1.0
+    elif job["frames_expected"]:
+        progress = min(job["frames_done"] / job["frames_expected"], 1.0)
+
+    job["fps"] = round(fps, 2)
+    job["eta_seconds"] = round(eta, 1) if eta is not None else None
+    job["progress"] = round(progress, 3)
+    return job
+
+
+def list_jobs():
+    """Return the status of all known jobs, newest first"""
+    with _lock:
+        job_ids = sorted(_jobs, key=lambda j: _jobs[j]["created_at"], reverse=True)
+    return [get_job(job_id) for job_id in job_ids]
+
+
+def cancel_job(job_id):
+    """
+    Request cancellation of a queued or running job
+
+    Args:
+        job_id: Job ID to cancel
+
+    Returns:
+        bool: True if the job exists and had not finished yet
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None or job["status"] in _FINISHED_STATES:
+            return False
+        job["cancel_event"].set()
+        if job["status"] == QUEUED:
+            job["status"] = CANCELLED
+            job["finished_at"] = time.time()
+    return True
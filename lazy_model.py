@@ -0,0 +1,111 @@
+"""
+Lazy, thread-safe model handles
+Models load on first use or during background warmup instead of at import
+"""
+
+import threading
+
+import model_registry
+from model_registry import NOT_LOADED, LOADING, READY, FAILED
+
+_handles = []
+
+# Callables run once warmup has loaded every model (e.g. precomputing embeddings)
+_warmup_hooks = []
+
+
+class LazyModel:
+    """
+    Named handle on a model in the shared registry
+
+    The model loads the first time it is needed. Handles with the same
+    model_id and device share one instance, and a failed load is remembered
+    so every request does not retry a missing download.
+    """
+
+    def __init__(self, name, loader, model_id=None, device="cpu", required=True):
+        """
+        Args:
+            name: Name reported in health checks
+            loader: Callable returning the loaded model
+            model_id: Registry key shared by users of the same weights (defaults to name)
+            device: Device the model is loaded on
+            required: Whether the server is only ready once this model loaded
+                (optional models may fail and the system degrades instead)
+        """
+        self.name = name
+        self._loader = loader
+        self.model_id = model_id or name
+        self.device = device
+        self.required = required
+        _handles.append(self)
+
+    def get(self):
+        """
+        Return the model, loading it if necessary
+
+        Returns:
+            The loaded model, or None if loading failed
+        """
+        return model_registry.get_model(self.model_id, self._loader, self.device)
+
+    @property
+    def state(self):
+        return model_registry.get_model_status(self.model_id, self.device)["state"]
+
+    @property
+    def error(self):
+        return model_registry.get_model_status(self.model_id, self.device)["error"]
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def status(self):
+        """Return the load state for health reporting"""
+        status = model_registry.get_model_status(self.model_id, self.device)
+        status["required"] = self.required
+        return status
+
+
+def add_warmup_hook(hook):
+    """Run hook() at the end of warmup, after every model has been loaded"""
+    _warmup_hooks.append(hook)
+
+
+def warmup_models():
+    """Load every registered model, then run the warmup hooks (call from a background thread)"""
+    for handle in list(_handles):
+        handle.get()
+    for hook in list(_warmup_hooks):
+        try:
+            hook()
+        except Exception as e:
+            print(f"⚠️  Warmup step {hook.__name__} failed: {e}")
+
+
+def start_warmup():
+    """
+    Start loading all models in a background thread
+
+    Returns:
+        threading.Thread: The warmup thread
+    """
+    thread = threading.Thread(target=warmup_models, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def get_model_statuses():
+    """Return the load state of every registered model"""
+    return {handle.name: handle.status() for handle in _handles}
+
+
+def models_ready():
+    """Return True once required models are loaded and optional ones have settled"""
+    for handle in _handles:
+        if handle.required and not handle.ready:
+            return False
+        if handle.state in (NOT_LOADED, LOADING):
+            return False
+    return True
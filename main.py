@@ -4,23 +4,30 @@ from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 import shutil
 import os
+import threading
 import cv2
 import numpy as np
 
-from detector import detect
-from embedder import add, search, clear_embeddings
-from database import add_frame, get_all_frames, clear_database
-from tracker import assign_id
+import embedder
+import clip_engine
+from embedder import clear_embeddings
+from database import get_all_frames, clear_database, load_frames
+from track_store import list_tracks, get_timeline, get_trajectory, clear_tracks, restore_tracks
+from tracker import restore_track_ids
 from auth import login
-from clip_engine import add_image_embedding, get_clip_status, clear_clip_index
-from hybrid_search import hybrid_search, get_search_stats
+from clip_engine import get_clip_status, clear_clip_index
+from jobs import submit_ingestion_job, get_job, list_jobs, cancel_job, video_in_use
+from hybrid_search import hybrid_search, get_search_stats, set_search_params
+from lazy_model import start_warmup, get_model_statuses, models_ready
+from model_registry import get_registry_stats, unload_model
 from video_builder import create_highlight_video
+from config import PERSIST_INDEXES
 
 # ⚡ PERFORMANCE CONFIGURATION
 # Adjust these values to balance speed vs accuracy
-FRAME_SKIP = 5          # Process every Nth frame (1=all, 5=every 5th, 10=every 10th)
-                        # Higher = faster but may miss fast events
-                        # Recommended: 5 for 5x speedup
+SAMPLE_FPS = 0.2        # Frames sampled per second of video (0.2 = one frame every 5s)
+                        # Skipped frames are never decoded
+                        # Higher = denser coverage but slower
 MAX_FRAME_WIDTH = 640   # Resize frames to this width (640, 1280, 1920)
                         # Lower = faster but less detail
                         # Recommended: 640 for 2x speedup
@@ -29,10 +36,9 @@ DETECTION_CONFIDENCE = 0.5  # Confidence threshold (0.3-0.9)
                             # Recommended: 0.5 for balance
 
 print(f"⚡ Performance Settings:")
-print(f"   Frame Skip: Every {FRAME_SKIP} frame(s) → {FRAME_SKIP}x faster")
+print(f"   Sample Rate: {SAMPLE_FPS} frame(s) per second")
 print(f"   Max Width: {MAX_FRAME_WIDTH}px → ~2x faster")
 print(f"   Confidence: {DETECTION_CONFIDENCE} → balanced")
-print(f"   Expected Speedup: ~{FRAME_SKIP * 2}x faster overall")
 
 app = FastAPI(title="CCTV AI System")
 templates = Jinja2Templates(directory="templates")
@@ -50,6 +56,10 @@ os.makedirs(VIDEO_FOLDER, exist_ok=True)
 os.makedirs(MARKED_FOLDER, exist_ok=True)
 os.makedirs(HIGHLIGHTS_FOLDER, exist_ok=True)
 
+# Stored names of uploads still being saved, so two uploads never write the same file
+_uploading = set()
+_uploading_lock = threading.Lock()
+
 # Serve static files (frames)
 app.mount("/storage", StaticFiles(directory="storage"), name="storage")
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -63,14 +73,42 @@ def dashboard(request: Request):
     response.headers["Expires"] = "0"
     return response
 
+@app.on_event("startup")
+def warmup():
+    """Restore saved indexes, then load models in the background so the server accepts traffic immediately"""
+    if PERSIST_INDEXES:
+        frame_count = load_frames()
+        frames = get_all_frames()
+        track_count = restore_tracks(frames)
+        # New tracks continue after every stored ID (frame-level person IDs included)
+        restore_track_ids(
+            [d["track_id"] for f in frames for d in f.get("detections", []) if "track_id" in d]
+            + [f["person_id"] for f in frames if f.get("person_id")]
+        )
+        text_count = embedder.load_index()
+        clip_count = clip_engine.load_index()
+        print(f"💾 Restored {frame_count} frames ({track_count} tracks, {text_count} text vectors, "
+              f"{clip_count} CLIP vectors)")
+    start_warmup()
+
+@app.on_event("shutdown")
+def save_indexes():
+    """Snapshot the indexes so the next startup maps them instead of replaying logs"""
+    if PERSIST_INDEXES:
+        embedder.save_index()
+        clip_engine.save_index()
+        print("💾 Indexes saved")
+
 @app.get("/health")
 def health_check():
-    """Health check endpoint for monitoring"""
+    """Health check endpoint for monitoring (liveness plus per-model readiness)"""
     clip_status = get_clip_status()
     all_frames = get_all_frames()
     
     return {
         "status": "healthy",
+        "ready": models_ready(),
+        "models": get_model_statuses(),
         "version": "2.0",
         "clip_available": clip_status.get('available', False),
         "clip_device": clip_status.get('device', 'unknown'),
@@ -79,8 +117,43 @@ def health_check():
         "timestamp": __import__('datetime').datetime.now().isoformat()
     }
 
+@app.get("/health/live")
+def liveness_check():
+    """Liveness probe: the server process is up and serving requests"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def readiness_check():
+    """Readiness probe: 503 until the required models are warm"""
+    statuses = get_model_statuses()
+    if not models_ready():
+        raise HTTPException(status_code=503, detail={"ready": False, "models": statuses})
+    return {"ready": True, "models": statuses}
+
+@app.get("/models/")
+def get_models():
+    """Loaded models with their memory footprint"""
+    return get_registry_stats()
+
+@app.post("/models/unload")
+def unload_models(model_id: str = Form(...), device: str = Form(None)):
+    """Release a model's memory; it is reloaded on next use"""
+    unloaded = unload_model(model_id, device)
+    if not unloaded:
+        raise HTTPException(status_code=404, detail="Model not loaded")
+    return {"status": "unloaded", "model_id": model_id, "instances": unloaded}
+
+@app.post("/search/params")
+def update_search_params(nprobe: int = Form(None), ef_search: int = Form(None)):
+    """Tune ANN search: IVF clusters probed (nprobe) and HNSW candidates (ef_search)"""
+    if (nprobe is not None and nprobe < 1) or (ef_search is not None and ef_search < 1):
+        raise HTTPException(status_code=400, detail="nprobe and ef_search must be positive")
+    set_search_params(nprobe=nprobe, ef_search=ef_search)
+    stats = get_search_stats()
+    return {"text_index": stats["text_index"], "clip_index": stats["clip_index"]}
+
 @app.post("/upload/")
-async def upload_video(file: UploadFile):
+def upload_video(file: UploadFile):
     try:
         if not file or not file.filename:
             raise HTTPException(status_code=400, detail="No file provided. Please select a video file.")
@@ -113,117 +186,84 @@ async def upload_video(file: UploadFile):
     video_filename = f"video_{safe_filename}"
     path = f"{VIDEO_FOLDER}/{video_filename}"
     
-    try:
-        with open(path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
-    
-    cap = cv2.VideoCapture(path)
-    
-    if not cap.isOpened():
-        raise HTTPException(status_code=400, detail="Failed to open video file")
-    
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    if fps == 0:
-        fps = 30  # Default fallback
-    
-    # PERFORMANCE OPTIMIZATION: Process every Nth frame for 5x speedup
-    FRAME_SKIP = 5  # Process every 5th frame (adjustable: 1=all frames, 5=every 5th, 10=every 10th)
-    MAX_FRAME_WIDTH = 640  # Resize frames for faster processing
-    
-    frame_count = 0
-    processed_frames = 0
-    alerts = []
-    
-    print(f"⚡ Performance mode: Processing every {FRAME_SKIP} frame(s) at max {MAX_FRAME_WIDTH}px width")
+    # A job removes everything stored under its name if it fails or is cancelled,
+    # and reads the file while it runs, so a name in use is never overwritten
+    with _uploading_lock:
+        if video_filename in _uploading or video_in_use(video_filename):
+            raise HTTPException(status_code=409, detail=f"A video named '{file.filename}' is already indexed or being processed. Rename the file or clear the data first.")
+        _uploading.add(video_filename)
     
     try:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Skip frames for faster processing
-            if frame_count % (int(fps) * FRAME_SKIP) != 0:
-                frame_count += 1
-                continue
-            
-            # Resize frame for faster processing
-            h, w = frame.shape[:2]
-            if w > MAX_FRAME_WIDTH:
-                scale = MAX_FRAME_WIDTH / w
-                new_w = int(w * scale)
-                new_h = int(h * scale)
-                frame = cv2.resize(frame, (new_w, new_h))
-            
-            timestamp = frame_count / fps
-            img_path = f"{FRAME_FOLDER}/frame_{int(timestamp)}.jpg"
-            cv2.imwrite(img_path, frame)
-            
-            detections = detect(img_path, confidence_threshold=DETECTION_CONFIDENCE)
-            
-            # Extract objects list for backward compatibility
-            objects = [d["label"] for d in detections]
-            
-            person_id = None
-            if "person" in objects:
-                person_id = assign_id(img_path)
-            
-            meta = {
-                "image": img_path,
-                "timestamp": timestamp,
-                "detections": detections,  # Full detection data with boxes and confidence
-                "objects": objects,  # For backward compatibility
-                "person_id": person_id,
-                "video_path": path,
-                "video_filename": video_filename
-            }
-            
-            # Add to text search index
-            add(" ".join(objects), meta)
-            
-            # Add to CLIP visual search index
-            add_image_embedding(img_path, meta)
-            
-            # Add to database
-            add_frame(meta)
-            processed_frames += 1
-            
-            # ALERT: bag without person
-            if "backpack" in objects and "person" not in objects:
-                alert_msg = f"⚠ ALERT: Unattended bag detected at {timestamp:.2f}s!"
-                print(alert_msg)
-                alerts.append(alert_msg)
-            
-            # ALERT: multiple people
-            person_count = objects.count("person")
-            if person_count > 5:
-                alert_msg = f"⚠ ALERT: Crowd detected ({person_count} people) at {timestamp:.2f}s!"
-                print(alert_msg)
-                alerts.append(alert_msg)
-            
-            frame_count += 1
-    finally:
+        try:
+            with open(path, "wb") as buffer:
+                shutil.copyfileobj(file.file, buffer)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
+        
+        cap = cv2.VideoCapture(path)
+        opened = cap.isOpened()
         cap.release()
-    
-    # Get search engine status
-    search_stats = get_search_stats()
+        
+        if not opened:
+            raise HTTPException(status_code=400, detail="Failed to open video file")
+        
+        print(f"⚡ Performance mode: Sampling {SAMPLE_FPS} frame(s)/s at max {MAX_FRAME_WIDTH}px width")
+        
+        # Processing runs in the background job pool so the server stays responsive
+        job_id = submit_ingestion_job(
+            path,
+            video_filename,
+            frame_folder=FRAME_FOLDER,
+            sample_fps=SAMPLE_FPS,
+            max_width=MAX_FRAME_WIDTH,
+            confidence=DETECTION_CONFIDENCE
+        )
+    finally:
+        with _uploading_lock:
+            _uploading.discard(video_filename)
     
     return {
-        "status": "Processed",
-        "frames": processed_frames,
-        "alerts": alerts,
-        "total_frames": frame_count,
-        "video_filename": video_filename,
-        "search_engine": search_stats
+        "status": "Queued",
+        "job_id": job_id,
+        "video_filename": video_filename
     }
 
+@app.get("/jobs/")
+def get_jobs():
+    """List all ingestion jobs"""
+    return {"jobs": list_jobs()}
+
+@app.get("/jobs/{job_id}")
+def get_job_status(job_id: str):
+    """
+    Get ingestion progress (frames done, fps, ETA) for a job
+    Completed jobs include the processing summary and alerts in 'result'
+    """
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if job["status"] == "completed":
+        job["search_engine"] = get_search_stats()
+    return job
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_ingestion_job(job_id: str):
+    """Cancel a queued or running ingestion job"""
+    if get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if not cancel_job(job_id):
+        raise HTTPException(status_code=409, detail="Job has already finished")
+    
+    return {"status": "cancelling", "job_id": job_id}
+
 @app.post("/query/")
 def query(
     username: str = Form(...),
     password: str = Form(...),
-    text: str = Form(...)
+    text: str = Form(...),
+    video_filename: str = Form(None)
 ):
     role = login(username, password)
     if not role:
@@ -232,8 +272,8 @@ def query(
     if not text.strip():
         raise HTTPException(status_code=400, detail="Query text cannot be empty")
     
-    # Use hybrid search for better accuracy
-    results = hybrid_search(text, top_k=10)
+    # Use hybrid search for better accuracy (only that video's shards when one is given)
+    results = hybrid_search(text, top_k=10, video_filename=video_filename or None)
     
     # Handle empty results
     if not results:
@@ -243,7 +283,7 @@ def query(
             "results": [],
             "count": 0,
             "timeline_markers": [],
-            "video_filename": None,
+            "video_filename": video_filename or None,
             "highlight_video": None,
             "search_method": "hybrid" if get_clip_status()['available'] else "text-only",
             "message": "No results found. Try a different query."
@@ -251,7 +291,7 @@ def query(
     
     # Add timeline data for video playback with matched detections
     timeline_markers = []
-    video_filename = None
+    video_filename = video_filename or None
     
     for result in results:
         timeline_markers.append({
@@ -308,6 +348,28 @@ def get_stats():
         "unique_objects": len(total_objects)
     }
 
+@app.get("/tracks/")
+def get_tracks(video_filename: str = None, label: str = None):
+    """List tracked objects, optionally for one video or object class"""
+    tracks = list_tracks(video_filename=video_filename, label=label)
+    return {"tracks": tracks, "count": len(tracks)}
+
+@app.get("/tracks/{track_id}/timeline")
+def get_track_timeline(track_id: str):
+    """Every time interval a tracked person or object was in view"""
+    timeline = get_timeline(track_id)
+    if timeline is None:
+        raise HTTPException(status_code=404, detail="Track not found")
+    return timeline
+
+@app.get("/tracks/{track_id}/trajectory")
+def get_track_trajectory(track_id: str, start: float = None, end: float = None):
+    """Box positions of a tracked person or object over time"""
+    trajectory = get_trajectory(track_id, start=start, end=end)
+    if trajectory is None:
+        raise HTTPException(status_code=404, detail="Track not found")
+    return trajectory
+
 @app.get("/annotated_image/{frame_name}")
 def get_annotated_image(frame_name: str, query: str = "", matched_indices: str = ""):
     """
@@ -487,6 +549,9 @@ def clear_all_data():
         # Clear CLIP embeddings
         clear_clip_index()
         
+        # Clear person/object tracks
+        clear_tracks()
+        
         # Optionally clear frame files
         # (Commented out to preserve files, uncomment if you want to delete them)
         # import shutil
@@ -499,7 +564,8 @@ def clear_all_data():
             "message": "All data cleared successfully",
             "frames_cleared": True,
             "embeddings_cleared": True,
-            "clip_cleared": True
+            "clip_cleared": True,
+            "tracks_cleared": True
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error clearing data: {str(e)}")
@@ -0,0 +1,175 @@
+"""
+Shared model registry
+Hands out one loaded instance per (model, device) and tracks its memory footprint
+"""
+
+import gc
+import os
+import threading
+import time
+
+# Load states
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+_entries = {}
+_lock = threading.Lock()
+
+
+class _Entry:
+    def __init__(self, model_id, device):
+        self.model_id = model_id
+        self.device = device
+        self.lock = threading.Lock()
+        self.model = None
+        self.state = NOT_LOADED
+        self.error = None
+        self.load_seconds = None
+        self.memory_bytes = 0
+
+
+def _get_entry(model_id, device):
+    key = (model_id, device)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            entry = _entries[key] = _Entry(model_id, device)
+        return entry
+
+
+def estimate_memory_bytes(model):
+    """
+    Estimate the resident size of a loaded model
+
+    Counts torch parameters and buffers. Objects that know their own size
+    (e.g. exported detector backends) can expose a memory_bytes attribute.
+
+    Returns:
+        int: Approximate size in bytes
+    """
+    if model is None:
+        return 0
+    if isinstance(model, (tuple, list)):
+        return sum(estimate_memory_bytes(m) for m in model)
+    if hasattr(model, "memory_bytes"):
+        return int(model.memory_bytes)
+    if hasattr(model, "parameters") and hasattr(model, "buffers"):
+        try:
+            tensors = list(model.parameters()) + list(model.buffers())
+            return sum(t.numel() * t.element_size() for t in tensors)
+        except Exception:
+            return 0
+    inner = getattr(model, "model", None)
+    if inner is not None and inner is not model:
+        return estimate_memory_bytes(inner)
+    return 0
+
+
+def get_model(model_id, loader, device="cpu"):
+    """
+    Return the shared instance of a model, loading it on first request
+
+    Concurrent callers for the same model and device wait for a single load.
+    A failed load is remembered until the model is unloaded.
+
+    Args:
+        model_id: Identifier shared by every user of the same weights
+        loader: Callable returning the loaded model (used only on first load)
+        device: Device the model is loaded on
+
+    Returns:
+        The loaded model, or None if loading failed
+    """
+    entry = _get_entry(model_id, device)
+    if entry.state == READY:
+        return entry.model
+
+    with entry.lock:
+        if entry.state == NOT_LOADED:
+            entry.state = LOADING
+            start = time.time()
+            try:
+                entry.model = loader()
+                entry.memory_bytes = estimate_memory_bytes(entry.model)
+                entry.state = READY
+            except Exception as e:
+                print(f"⚠️  Failed to load {model_id}: {e}")
+                entry.error = str(e)
+                entry.state = FAILED
+            entry.load_seconds = round(time.time() - start, 2)
+    return entry.model
+
+
+def get_model_status(model_id, device="cpu"):
+    """Return the load state of a model"""
+    entry = _get_entry(model_id, device)
+    return {
+        "model_id": entry.model_id,
+        "device": entry.device,
+        "state": entry.state,
+        "load_seconds": entry.load_seconds,
+        "memory_mb": round(entry.memory_bytes / (1024 * 1024), 1),
+        "error": entry.error
+    }
+
+
+def unload_model(model_id, device=None):
+    """
+    Release a model so it is reloaded on next use
+
+    Args:
+        model_id: Model identifier
+        device: Only unload the instance on this device (default: all devices)
+
+    Returns:
+        int: Number of instances unloaded
+    """
+    with _lock:
+        entries = [e for (mid, dev), e in _entries.items()
+                   if mid == model_id and (device is None or dev == device)]
+
+    unloaded = 0
+    for entry in entries:
+        with entry.lock:
+            if entry.state in (READY, FAILED):
+                unloaded += entry.state == READY
+                entry.model = None
+                entry.state = NOT_LOADED
+                entry.error = None
+                entry.load_seconds = None
+                entry.memory_bytes = 0
+
+    if unloaded:
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+    return unloaded
+
+
+def get_registry_stats():
+    """
+    Report every registered model with its memory footprint
+
+    Returns:
+        dict: Per-model status, total model memory and process RSS
+    """
+    with _lock:
+        keys = list(_entries)
+
+    models = [get_model_status(model_id, device) for model_id, device in keys]
+    stats = {
+        "models": models,
+        "total_model_memory_mb": round(sum(m["memory_mb"] for m in models), 1)
+    }
+    try:
+        import psutil
+        stats["process_rss_mb"] = round(psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024), 1)
+    except ImportError:
+        pass
+    return stats
@@ -0,0 +1,59 @@
+"""
+Frame-difference gating for static CCTV scenes
+Flags frames that are near-identical to the last processed frame
+"""
+
+import cv2
+import numpy as np
+
+from config import MOTION_GATE_WIDTH, MOTION_PIXEL_DELTA, MOTION_CHANGED_FRACTION
+
+
+class MotionGate:
+    """
+    Compares downscaled grayscale frames against the last processed frame
+
+    The reference is only updated when a frame is processed, so slow changes
+    accumulate until they cross the threshold instead of drifting past it.
+    """
+
+    def __init__(self, width=MOTION_GATE_WIDTH, pixel_delta=MOTION_PIXEL_DELTA,
+                 changed_fraction=MOTION_CHANGED_FRACTION):
+        """
+        Args:
+            width: Width frames are downscaled to before comparing
+            pixel_delta: Minimum grayscale difference for a pixel to count as changed
+            changed_fraction: Fraction of changed pixels above which a frame is processed
+        """
+        self.width = width
+        self.pixel_delta = pixel_delta
+        self.changed_fraction = changed_fraction
+        self.reference = None
+
+    def _signature(self, frame):
+        h, w = frame.shape[:2]
+        height = max(1, int(round(h * self.width / w)))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (3, 3), 0)
+
+    def is_static(self, frame):
+        """
+        Check whether a frame can reuse the last processed frame's results
+
+        Args:
+            frame: BGR frame (numpy array)
+
+        Returns:
+            bool: True if the frame is near-identical to the reference frame
+        """
+        signature = self._signature(frame)
+
+        if self.reference is not None and self.reference.shape == signature.shape:
+            diff = cv2.absdiff(signature, self.reference)
+            changed = np.count_nonzero(diff > self.pixel_delta) / diff.size
+            if changed < self.changed_fraction:
+                return True
+
+        self.reference = signature
+        return False
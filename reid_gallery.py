@@ -0,0 +1,218 @@
+"""
+Person re-identification gallery
+Remembers the appearance of people who left the view so they get their old ID back
+"""
+
+from collections import OrderedDict
+
+import faiss
+import numpy as np
+
+from config import (
+    REID_INDEX_TYPE, REID_HNSW_M, REID_EF_SEARCH, REID_SIMILARITY_THRESHOLD, REID_MAX_IDENTITIES,
+    REID_MAX_AGE_SECONDS, REID_MIN_CROP_SIZE
+)
+
+# Live candidates fetched per query (removed entries still in the index are fetched on top)
+_SEARCH_K = 8
+
+
+class ReIDGallery:
+    """
+    Appearance gallery over normalized CLIP embeddings of person crops
+
+    Active tracks accumulate a running mean of their crop embeddings. When
+    the tracker drops a track, its mean embedding is added to a FAISS
+    inner-product index (HNSW by default, so lookups stay sublinear over
+    day-long videos). New tracks are matched against the index in one batch
+    per frame; a matched identity leaves the gallery because it is visible
+    again.
+
+    Removed or evicted entries are tombstoned and the index is rebuilt once
+    tombstones outnumber live entries, since HNSW does not support removal.
+    """
+
+    def __init__(self, embed_fn=None, similarity_threshold=REID_SIMILARITY_THRESHOLD,
+                 max_identities=REID_MAX_IDENTITIES, max_age_seconds=REID_MAX_AGE_SECONDS,
+                 index_type=REID_INDEX_TYPE, hnsw_m=REID_HNSW_M, ef_search=REID_EF_SEARCH):
+        """
+        Args:
+            embed_fn: Callable mapping a list of BGR crops to normalized (N, D)
+                embeddings, or None when no model is available (default: CLIP)
+            similarity_threshold: Minimum cosine similarity to re-identify a person
+            max_identities: Identities kept in the gallery before the oldest are evicted
+            max_age_seconds: Video time after which a lost identity is forgotten
+            index_type: "hnsw" or "flat"
+            hnsw_m: HNSW graph degree
+            ef_search: HNSW candidate list size per query (recall/latency knob)
+        """
+        if embed_fn is None:
+            from clip_engine import encode_images
+            embed_fn = encode_images
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.max_identities = max_identities
+        self.max_age_seconds = max_age_seconds
+        self.index_type = index_type
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+
+        self._active = {}  # track_id -> [embedding sum, count]
+        self._entries = OrderedDict()  # gallery position -> (track_id, retired_at), oldest first
+        self._vectors = {}  # gallery position -> normalized mean embedding
+        self._index = None
+        self._next_position = 0
+        self._tombstones = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _new_index(self, dim):
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efSearch = self.ef_search
+            return faiss.IndexIDMap(index)
+        return faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+
+    def embed(self, frame, boxes):
+        """
+        Embed the person crops of one frame in a single batch
+
+        Args:
+            frame: BGR frame (numpy array)
+            boxes: List of [x1, y1, x2, y2] boxes
+
+        Returns:
+            list: Normalized embedding per box (None for crops too small to use),
+            or None if no embedding model is available
+        """
+        h, w = frame.shape[:2]
+        crops, positions = [], []
+        for i, box in enumerate(boxes):
+            x1, y1 = max(0, int(box[0])), max(0, int(box[1]))
+            x2, y2 = min(w, int(box[2])), min(h, int(box[3]))
+            if x2 - x1 >= REID_MIN_CROP_SIZE and y2 - y1 >= REID_MIN_CROP_SIZE:
+                crops.append(frame[y1:y2, x1:x2])
+                positions.append(i)
+
+        embeddings = [None] * len(boxes)
+        if not crops:
+            return embeddings
+        try:
+            vectors = self.embed_fn(crops)
+        except Exception as e:
+            print(f"Error embedding person crops: {e}")
+            return None
+        if vectors is None:
+            return None
+        for i, vector in zip(positions, np.asarray(vectors, dtype=np.float32)):
+            embeddings[i] = vector
+        return embeddings
+
+    def observe(self, track_id, embedding):
+        """Add a crop embedding to an active track's running mean"""
+        if embedding is None:
+            return
+        entry = self._active.get(track_id)
+        if entry is None:
+            self._active[track_id] = [embedding.astype(np.float32).copy(), 1]
+        else:
+            entry[0] += embedding
+            entry[1] += 1
+
+    def retire(self, track_id, timestamp):
+        """
+        Move a lost track into the gallery
+
+        Args:
+            track_id: Track that left the view
+            timestamp: Video time the track was dropped at
+        """
+        entry = self._active.pop(track_id, None)
+        if entry is None:
+            return
+        mean = entry[0] / max(np.linalg.norm(entry[0]), 1e-12)
+
+        if self._index is None:
+            self._index = self._new_index(len(mean))
+        position = self._next_position
+        self._next_position += 1
+        self._index.add_with_ids(mean.reshape(1, -1), np.array([position], dtype=np.int64))
+        self._entries[position] = (track_id, timestamp)
+        self._vectors[position] = mean
+        self.evict(timestamp)
+
+    def match(self, embeddings, timestamp=None):
+        """
+        Re-identify a batch of new tracks against the gallery
+
+        Each gallery identity is given to at most one query, best score first.
+        Matched identities leave the gallery and become active again.
+
+        Args:
+            embeddings: Normalized embeddings of new person crops (None entries are skipped)
+            timestamp: Current video time, used to evict stale identities first
+
+        Returns:
+            list: Re-identified track ID per embedding, or None for new people
+        """
+        matches = [None] * len(embeddings)
+        if timestamp is not None:
+            self.evict(timestamp)
+        queries = [i for i, e in enumerate(embeddings) if e is not None]
+        if not queries or not self._entries:
+            return matches
+
+        vectors = np.stack([embeddings[i] for i in queries]).astype(np.float32)
+        # Every tombstone could rank above the live entries, so fetch that many extra
+        k = min(len(self._entries), _SEARCH_K) + self._tombstones
+        scores, positions = self._index.search(vectors, k)
+
+        candidates = [
+            (score, q, int(position))
+            for q, (row_scores, row_positions) in enumerate(zip(scores, positions))
+            for score, position in zip(row_scores, row_positions)
+            if position in self._entries and score >= self.similarity_threshold
+        ]
+        candidates.sort(key=lambda c: c[0], reverse=True)
+
+        claimed = set()
+        for score, q, position in candidates:
+            i = queries[q]
+            if matches[i] is not None or position in claimed:
+                continue
+            track_id, _ = self._entries[position]
+            matches[i] = track_id
+            claimed.add(position)
+            # Carry the stored appearance over to the revived track
+            self._active[track_id] = [self._vectors[position].copy(), 1]
+
+        for position in claimed:
+            self._remove(position)
+        return matches
+
+    def evict(self, timestamp):
+        """Forget identities lost longer than max_age_seconds ago or beyond max_identities"""
+        while self._entries:
+            position, (_, retired_at) = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_identities and timestamp - retired_at <= self.max_age_seconds:
+                break
+            self._remove(position)
+
+    def _remove(self, position):
+        del self._entries[position]
+        del self._vectors[position]
+        self._tombstones += 1
+        if self._tombstones > len(self._entries):
+            self._rebuild()
+
+    def _rebuild(self):
+        """Rebuild the index from live entries, dropping tombstones"""
+        self._tombstones = 0
+        if not self._vectors:
+            self._index = None
+            return
+        positions = np.fromiter(self._vectors.keys(), dtype=np.int64)
+        vectors = np.stack(list(self._vectors.values()))
+        self._index = self._new_index(vectors.shape[1])
+        self._index.add_with_ids(vectors, positions)
@@ -0,0 +1,49 @@
+"""
+Export the YOLOv8 detector to ONNX and quantize it to INT8
+Calibrates on stored CCTV frames so activation ranges match real footage
+
+Usage (from the project root):
+    python scripts/quantize_detector.py [calibration_folder] [num_images]
+
+Then set DETECTOR_BACKEND = "onnxruntime" (or "openvino") and
+DETECTOR_EXPORTED_MODEL = "yolov8n-int8.onnx" in config.py.
+"""
+
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import YOLO_MODEL, DETECTOR_IMG_SIZE
+from detector_backends import export_onnx, quantize_int8
+
+def main():
+    calibration_folder = sys.argv[1] if len(sys.argv) > 1 else "storage/frames"
+    num_images = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    images = [
+        os.path.join(calibration_folder, f)
+        for f in os.listdir(calibration_folder)
+        if f.endswith(('.jpg', '.jpeg', '.png')) and not f.startswith("annotated_")
+    ] if os.path.isdir(calibration_folder) else []
+
+    if not images:
+        print(f"❌ No calibration frames found in {calibration_folder}")
+        print("   Upload a few videos first, or pass a folder of representative frames")
+        sys.exit(1)
+
+    random.seed(0)
+    images = random.sample(images, min(num_images, len(images)))
+
+    print(f"📦 Exporting {YOLO_MODEL} to ONNX...")
+    onnx_path = export_onnx(YOLO_MODEL, img_size=DETECTOR_IMG_SIZE)
+    print(f"✅ FP32 model: {onnx_path}")
+
+    int8_path = onnx_path.replace(".onnx", "-int8.onnx")
+    print(f"⚙️  Calibrating INT8 on {len(images)} frames...")
+    quantize_int8(onnx_path, int8_path, images, img_size=DETECTOR_IMG_SIZE)
+    print(f"✅ INT8 model: {int8_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Vector indexes partitioned by video
+Each video's vectors live in their own shard that is searched, saved and dropped independently
+"""
+
+import numpy as np
+
+from index_store import IndexStore, shard_folder, list_shard_folders, remove_empty_folder
+
+
+class _Shard:
+    """One video's index, its metadata and (when persisted) its on-disk store"""
+
+    def __init__(self, index, folder, store=None):
+        self.index = index
+        self.folder = folder
+        self.store = store
+        self.metadata = {}  # vector ID -> frame metadata
+
+
+class ShardedIndex:
+    """
+    Vector index split into one shard per video
+
+    Vectors are routed by their metadata's video_filename and get IDs that
+    are unique across shards. Searches scoped to one video only touch its
+    shard; unscoped searches fan out to every shard and merge the top-k.
+    Dropping a video discards its shard (and its files) without touching
+    the others. Once load() has been called, every shard persists itself in
+    its own folder under the root, next to the other stores of that video.
+
+    Not thread-safe: callers hold their own lock around every call.
+    """
+
+    def __init__(self, name, dim, make_index, metric="l2", root=None):
+        """
+        Args:
+            name: File name prefix of the shard stores (e.g. "text", "clip")
+            dim: Vector dimension
+            make_index: Callable(shard_folder) returning an empty VectorIndex or EmbeddingMatrix
+            metric: "l2" (smaller is better) or "ip" (larger is better), for merging
+            root: Folder holding the shard folders
+        """
+        self.name = name
+        self.dim = dim
+        self._make_index = make_index
+        self.larger_is_better = metric == "ip"
+        self.root = root
+        self.persistent = False
+        self.shards = {}  # video_filename -> _Shard
+        self._next_id = 0
+        self._search_params = {}
+
+    def __len__(self):
+        return sum(len(shard.metadata) for shard in self.shards.values())
+
+    def _shard(self, video_filename):
+        shard = self.shards.get(video_filename)
+        if shard is None:
+            folder = shard_folder(self.root, video_filename) if self.root else None
+            index = self._make_index(folder)
+            if self._search_params:
+                index.set_search_params(**self._search_params)
+            store = IndexStore(folder, self.name, self.dim) if self.persistent else None
+            shard = self.shards[video_filename] = _Shard(index, folder, store)
+        return shard
+
+    def add(self, vectors, metas):
+        """
+        Add vectors to the shards of their videos
+
+        Args:
+            vectors: (N, dim) float32 array
+            metas: Metadata dictionary per vector (routed by "video_filename")
+
+        Returns:
+            list: The IDs assigned to the vectors
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        ids = list(range(self._next_id, self._next_id + len(metas)))
+        self._next_id += len(metas)
+
+        rows_by_video = {}
+        for row, meta in enumerate(metas):
+            rows_by_video.setdefault(meta.get("video_filename"), []).append(row)
+        for video_filename, rows in rows_by_video.items():
+            shard = self._shard(video_filename)
+            shard_ids = [ids[row] for row in rows]
+            shard_metas = [metas[row] for row in rows]
+            shard.index.add(vectors[rows], shard_ids)
+            shard.metadata.update(zip(shard_ids, shard_metas))
+            if shard.store is not None:
+                shard.store.append(shard_ids, vectors[rows], shard_metas)
+        return ids
+
+    def update(self, vector_id, meta):
+        """
+        Replace the metadata of a stored vector
+
+        Args:
+            vector_id: ID returned by add()
+            meta: New metadata dictionary (same video as before)
+        """
+        shard = self.shards.get(meta.get("video_filename"))
+        if shard is None or vector_id not in shard.metadata:
+            raise KeyError(f"Unknown vector ID {vector_id}")
+        shard.metadata[vector_id] = meta
+        if shard.store is not None:
+            shard.store.update([vector_id], [meta])
+
+    def search(self, queries, k, video_filename=None):
+        """
+        Find the k best vectors per query
+
+        Args:
+            queries: (Q, dim) float32 array
+            k: Results per query
+            video_filename: Only search this video's shard
+
+        Returns:
+            list: Per query, a best-first list of (score, metadata) tuples
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if video_filename is not None:
+            shards = [self.shards[video_filename]] if video_filename in self.shards else []
+        else:
+            shards = list(self.shards.values())
+
+        scores, metas = [], []
+        for shard in shards:
+            n = min(k, len(shard.metadata))
+            if n == 0:
+                continue
+            shard_scores, shard_ids = shard.index.search(queries, n)
+            scores.append(shard_scores)
+            metas.append([[shard.metadata.get(int(i)) for i in row] for row in shard_ids])
+        if not scores:
+            return [[] for _ in queries]
+
+        # Merge the per-shard top-k lists
+        scores = np.concatenate(scores, axis=1)
+        order = np.argsort(-scores if self.larger_is_better else scores, axis=1, kind="stable")
+        results = []
+        for q, row in enumerate(order):
+            candidates = [meta for shard_metas in metas for meta in shard_metas[q]]
+            results.append([(float(scores[q, j]), candidates[j]) for j in row
+                            if candidates[j] is not None][:k])
+        return results
+
+    def video_ids(self, video_filename):
+        """Return the IDs stored for a video"""
+        shard = self.shards.get(video_filename)
+        return list(shard.metadata) if shard else []
+
+    def vectors(self, ids):
+        """Return the stored vectors for the given IDs, in order (approximate for compressed indexes)"""
+        rows = np.empty((len(ids), self.dim), dtype=np.float32)
+        for shard in self.shards.values():
+            positions = [n for n, i in enumerate(ids) if i in shard.metadata]
+            if positions:
+                rows[positions] = shard.index.reconstruct_batch([ids[n] for n in positions])
+        return rows
+
+    def _drop(self, shard):
+        shard.index.reset()
+        if shard.store is not None:
+            shard.store.clear()
+        if shard.folder:
+            remove_empty_folder(shard.folder)
+
+    def remove_video(self, video_filename):
+        """
+        Drop a video's shard
+
+        Returns:
+            int: Number of vectors removed
+        """
+        shard = self.shards.pop(video_filename, None)
+        if shard is None:
+            return 0
+        self._drop(shard)
+        return len(shard.metadata)
+
+    def clear(self):
+        """Drop every shard"""
+        for shard in self.shards.values():
+            self._drop(shard)
+        self.shards = {}
+
+    def set_search_params(self, nprobe=None, ef_search=None):
+        """Change the recall/latency knobs of every shard, current and future"""
+        if nprobe is not None:
+            self._search_params["nprobe"] = nprobe
+        if ef_search is not None:
+            self._search_params["ef_search"] = ef_search
+        for shard in self.shards.values():
+            shard.index.set_search_params(nprobe=nprobe, ef_search=ef_search)
+
+    def load(self, root):
+        """
+        Load every persisted shard under root and persist all shards from now on
+
+        Args:
+            root: Folder holding the shard folders
+
+        Returns:
+            int: Number of vectors loaded
+        """
+        # Replace the in-memory shards only; their files are what gets loaded
+        self.shards = {}
+        self.root = root
+        self.persistent = True
+        for video_filename, folder in list_shard_folders(root):
+            store = IndexStore(folder, self.name, self.dim)
+            if not store.exists:
+                continue
+            shard = self._shard(video_filename)
+            shard.metadata = store.load(shard.index)
+        self._next_id = max((max(s.metadata, default=-1) for s in self.shards.values()), default=-1) + 1
+        return len(self)
+
+    def save(self, video_filename=None):
+        """
+        Snapshot shards and compact their logs
+
+        Args:
+            video_filename: Only save this video's shard (default: every shard with new vectors)
+        """
+        if video_filename is not None:
+            shards = [self.shards[video_filename]] if video_filename in self.shards else []
+        else:
+            shards = [s for s in self.shards.values() if s.store is not None and s.store.pending_rows]
+        for shard in shards:
+            if shard.store is not None:
+                shard.store.snapshot(shard.index, shard.metadata)
+
+    def stats(self):
+        """Describe the shards: count, vectors and the configuration of the indexes"""
+        shard_stats = [shard.index.stats() for shard in self.shards.values()]
+        # An empty index stands in for the configuration when there are no shards yet
+        sample = shard_stats[0] if shard_stats else self._make_index(None).stats()
+        stats = {key: value for key, value in sample.items()
+                 if key not in ("vectors", "trained", "nlist", "capacity", "memory_bytes", "mapped_bytes")}
+        stats.update(
+            shards=len(self.shards),
+            vectors=len(self),
+            trained_shards=sum(s["trained"] for s in shard_stats)
+        )
+        for key in ("memory_bytes", "mapped_bytes"):
+            if key in sample:
+                stats[key] = sum(s[key] for s in shard_stats)
+        return stats
@@ -0,0 +1,57 @@
+"""
+Tests for box propagation module
+"""
+
+import unittest
+import numpy as np
+from box_propagation import BoxPropagator
+
+class TestBoxPropagation(unittest.TestCase):
+    
+    @classmethod
+    def setUpClass(cls):
+        """Create a textured object that moves between two frames"""
+        rng = np.random.default_rng(0)
+        cls.texture = rng.integers(0, 255, (80, 60, 3), dtype=np.uint8)
+        cls.background = np.full((240, 320, 3), 30, dtype=np.uint8)
+    
+    def _frame(self, x, y):
+        frame = self.background.copy()
+        frame[y:y + 80, x:x + 60] = self.texture
+        return frame
+    
+    def test_box_follows_object(self):
+        """Test that a box is shifted by the object motion"""
+        propagator = BoxPropagator()
+        propagator.reset(self._frame(100, 80), [{"label": "person", "box": [100, 80, 160, 160], "confidence": 0.9}])
+        
+        result = propagator.propagate(self._frame(108, 84))
+        
+        self.assertEqual(len(result), 1)
+        x1, y1, x2, y2 = result[0]["box"]
+        self.assertAlmostEqual(x1, 108, delta=2)
+        self.assertAlmostEqual(y1, 84, delta=2)
+        self.assertAlmostEqual(x2, 168, delta=2)
+        self.assertAlmostEqual(y2, 164, delta=2)
+        self.assertEqual(result[0]["label"], "person")
+        self.assertTrue(result[0]["propagated"])
+    
+    def test_lost_object_requests_detection(self):
+        """Test that a box without trackable points forces a re-detection"""
+        propagator = BoxPropagator()
+        flat = self.background.copy()
+        propagator.reset(flat, [{"label": "car", "box": [10, 10, 60, 60], "confidence": 0.8}])
+        self.assertIsNone(propagator.propagate(flat))
+    
+    def test_no_keyframe(self):
+        """Test propagate before any keyframe"""
+        self.assertIsNone(BoxPropagator().propagate(self.background))
+    
+    def test_empty_detections(self):
+        """Test that a keyframe without detections propagates nothing"""
+        propagator = BoxPropagator()
+        propagator.reset(self.background, [])
+        self.assertEqual(propagator.propagate(self.background), [])
+
+if __name__ == '__main__':
+    unittest.main()
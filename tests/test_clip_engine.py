@@ -0,0 +1,130 @@
+"""
+Tests for CLIP engine module
+"""
+
+import unittest
+from unittest import mock
+import numpy as np
+import clip_engine
+
+def fake_encode(frames):
+    """Embed each frame as a one-hot vector on its first pixel value"""
+    embeddings = np.zeros((len(frames), clip_engine.embedding_dim), dtype=np.float32)
+    for row, frame in enumerate(frames):
+        embeddings[row, int(frame.flat[0])] = 1.0
+    return embeddings
+
+def frame(value):
+    return np.full((4, 4, 3), value, dtype=np.uint8)
+
+class TestClipBatcher(unittest.TestCase):
+    
+    def setUp(self):
+        clip_engine.clear_clip_index()
+    
+    def tearDown(self):
+        clip_engine.clear_clip_index()
+    
+    def _stored(self):
+        shard = clip_engine.image_index.shards[None]
+        ids = sorted(shard.metadata)
+        vectors = clip_engine.image_index.vectors(ids)
+        return [(shard.metadata[i]["timestamp"], int(v.argmax())) for i, v in zip(ids, vectors)]
+    
+    def test_batches_and_flush(self):
+        """Test that frames are encoded one batch at a time and flushed at the end"""
+        encode = mock.Mock(side_effect=fake_encode)
+        with mock.patch.object(clip_engine, "encode_images", encode):
+            batcher = clip_engine.ClipBatcher(batch_size=4, dedup_threshold=None)
+            for t in range(10):
+                batcher.add(frame(t), {"timestamp": t})
+            self.assertEqual(encode.call_count, 2)
+            self.assertEqual(len(clip_engine.image_index), 8)
+            self.assertEqual(batcher.flush(), 2)
+        
+        self.assertEqual([len(c.args[0]) for c in encode.call_args_list], [4, 4, 2])
+        self.assertEqual(self._stored(), [(t, t) for t in range(10)])
+    
+    def test_static_frames_reuse_embedding(self):
+        """Test that static frames are indexed without being encoded, across batches"""
+        encode = mock.Mock(side_effect=fake_encode)
+        with mock.patch.object(clip_engine, "encode_images", encode):
+            batcher = clip_engine.ClipBatcher(batch_size=2, dedup_threshold=None)
+            for t, static in enumerate([True, False, True, True, False]):
+                batcher.add(frame(t), {"timestamp": t}, reuse=static)
+            batcher.flush()
+        
+        # The first frame has nothing to reuse, so it is encoded anyway
+        self.assertEqual(sum(len(c.args[0]) for c in encode.call_args_list), 3)
+        self.assertEqual(self._stored(), [(0, 0), (1, 1), (2, 1), (3, 1), (4, 4)])
+    
+    def test_near_duplicates_merge_into_time_range(self):
+        """Test that consecutive look-alike frames collapse into one entry, across batches"""
+        values = [1, 1, 1, 2, 2, 1, 1]
+        objects = [["car"], ["car"], ["car"], ["car"], ["car"], ["car"], ["car", "person"]]
+        with mock.patch.object(clip_engine, "encode_images", side_effect=fake_encode):
+            batcher = clip_engine.ClipBatcher(batch_size=2, dedup_threshold=0.95)
+            for t, (value, labels) in enumerate(zip(values, objects)):
+                batcher.add(frame(value), {"timestamp": t, "objects": labels})
+            batcher.flush()
+        
+        self.assertEqual(batcher.merged, 3)
+        shard = clip_engine.image_index.shards[None]
+        ranges = [(m["time_range"]["start"], m["time_range"]["end"]) for _, m in sorted(shard.metadata.items())]
+        # A new object keeps the last frame separate even though it looks the same
+        self.assertEqual(ranges, [(0, 2), (3, 4), (5, 5), (6, 6)])
+    
+    def test_unavailable_model_drops_batch(self):
+        """Test that nothing is indexed when CLIP cannot be loaded"""
+        with mock.patch.object(clip_engine, "encode_images", return_value=None):
+            batcher = clip_engine.ClipBatcher(batch_size=2)
+            batcher.add(frame(1), {"timestamp": 1})
+            self.assertEqual(batcher.flush(), 0)
+        self.assertEqual(len(clip_engine.image_index), 0)
+
+def fake_encode_texts(texts):
+    """Embed each text as a one-hot vector on its length"""
+    embeddings = np.zeros((len(texts), clip_engine.embedding_dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        embeddings[row, len(text)] = 1.0
+    return embeddings
+
+class TestQueryEmbeddings(unittest.TestCase):
+    
+    def setUp(self):
+        self._saved_bank = clip_engine._prompt_bank
+        clip_engine._text_cache.clear()
+        self.encode = mock.Mock(side_effect=fake_encode_texts)
+        patches = [
+            mock.patch.object(clip_engine, "_encode_texts", self.encode),
+            mock.patch.object(clip_engine.clip_model, "get", return_value=("model", "processor")),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+    
+    def tearDown(self):
+        clip_engine._prompt_bank = self._saved_bank
+        clip_engine._text_cache.clear()
+    
+    def test_prompt_bank_skips_encoder(self):
+        """Test that banked label/color prompts are served without encoding"""
+        self.assertEqual(clip_engine.build_prompt_bank(["person", "car"], ["red", "blue"], batch_size=4), 6)
+        self.assertEqual(self.encode.call_count, 2)
+        self.encode.reset_mock()
+        
+        vectors = clip_engine.encode_texts(["Red  Car", "person"])
+        self.encode.assert_not_called()
+        self.assertEqual(vectors.argmax(axis=1).tolist(), [len("red car"), len("person")])
+    
+    def test_repeated_queries_are_cached(self):
+        """Test that other queries go through the LRU cache, normalized"""
+        clip_engine._prompt_bank = {}
+        clip_engine.encode_texts(["person with red bag"])
+        clip_engine.encode_texts(["Person with  red bag", "car at gate"])
+        self.assertEqual([c.args[0] for c in self.encode.call_args_list],
+                         [["person with red bag"], ["car at gate"]])
+        self.assertEqual(clip_engine.get_text_cache_stats()["cache"]["hits"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Tests for color detector module
+"""
+
+import unittest
+import cv2
+import numpy as np
+from color_detector import (
+    COLOR_RANGES, FrameColorMap, color_fractions, analyze_colors,
+    get_dominant_color, get_color_histogram, add_colors_to_detections
+)
+
+def inrange_fractions(hsv):
+    """Reference: one cv2.inRange mask per color range"""
+    total = hsv.shape[0] * hsv.shape[1]
+    fractions = []
+    for ranges in COLOR_RANGES.values():
+        mask = np.zeros(hsv.shape[:2], dtype=np.uint8)
+        for lower, upper in ranges:
+            mask = cv2.bitwise_or(mask, cv2.inRange(hsv, np.array(lower), np.array(upper)))
+        fractions.append(np.count_nonzero(mask) / total)
+    return np.array(fractions)
+
+class TestColorDetector(unittest.TestCase):
+    
+    def test_fractions_match_inrange(self):
+        """Test that the single-pass counts equal per-range inRange masks"""
+        rng = np.random.default_rng(0)
+        hsv = np.stack([
+            rng.integers(0, 180, (64, 80)),
+            rng.integers(0, 256, (64, 80)),
+            rng.integers(0, 256, (64, 80))
+        ], axis=-1).astype(np.uint8)
+        np.testing.assert_allclose(color_fractions(hsv), inrange_fractions(hsv))
+    
+    def test_every_hsv_value_matches_inrange(self):
+        """Test range boundaries exhaustively on a coarse HSV grid"""
+        h, s, v = np.meshgrid(np.arange(180), np.arange(0, 256, 5), np.arange(0, 256, 5), indexing="ij")
+        hsv = np.stack([h, s, v], axis=-1).reshape(-1, 1, 3).astype(np.uint8)
+        np.testing.assert_allclose(color_fractions(hsv), inrange_fractions(hsv))
+    
+    def test_solid_colors(self):
+        """Test dominant color of solid patches"""
+        image = np.zeros((200, 300, 3), dtype=np.uint8)
+        image[:, :100] = (0, 0, 255)      # red (BGR)
+        image[:, 100:200] = (255, 0, 0)   # blue
+        image[:, 200:] = (255, 255, 255)  # white
+        self.assertEqual(get_dominant_color(image, [0, 0, 100, 200]), "red")
+        self.assertEqual(get_dominant_color(image, [100, 0, 200, 200]), "blue")
+        self.assertEqual(get_dominant_color(image, [200, 0, 300, 200]), "white")
+    
+    def test_histogram_and_dominant_agree(self):
+        """Test that analyze_colors returns both results from one pass"""
+        image = np.zeros((100, 100, 3), dtype=np.uint8)
+        image[:, :60] = (0, 200, 0)
+        dominant, colors = analyze_colors(image, [0, 0, 100, 100])
+        self.assertEqual(dominant, "green")
+        self.assertEqual(colors, get_color_histogram(image, [0, 0, 100, 100]))
+        self.assertEqual(colors[0], "green")
+        self.assertIn("black", colors)
+    
+    def test_empty_box(self):
+        """Test that degenerate boxes are unknown"""
+        image = np.zeros((50, 50, 3), dtype=np.uint8)
+        self.assertEqual(get_dominant_color(image, [40, 40, 10, 10]), "unknown")
+        self.assertEqual(get_color_histogram(image, [60, 60, 80, 80]), [])
+    
+    def test_add_colors_to_detections(self):
+        """Test that detections get color and colors keys"""
+        image = np.full((100, 100, 3), (255, 0, 0), dtype=np.uint8)
+        detections = add_colors_to_detections(image, [{"label": "car", "box": [10, 10, 90, 90]}])
+        self.assertEqual(detections[0]["color"], "blue")
+        self.assertEqual(detections[0]["colors"], ["blue"])
+    
+    def test_frame_color_map_matches_direct_count(self):
+        """Test that integral-image box counts equal counting the box pixels"""
+        rng = np.random.default_rng(2)
+        frame = rng.integers(0, 256, (120, 160, 3)).astype(np.uint8)
+        color_map = FrameColorMap(frame, width=160)
+        hsv = cv2.GaussianBlur(cv2.cvtColor(frame, cv2.COLOR_BGR2HSV), (5, 5), 0)
+        for box in ([0, 0, 160, 120], [10, 20, 70, 90], [100, 5, 101, 6]):
+            x1, y1, x2, y2 = box
+            np.testing.assert_allclose(color_map.fractions(box), color_fractions(hsv[y1:y2, x1:x2]))
+    
+    def test_frame_color_map_scales_boxes(self):
+        """Test that boxes in original coordinates map onto the downscaled frame"""
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        frame[:, 320:] = (0, 0, 255)
+        color_map = FrameColorMap(frame, width=160)
+        self.assertEqual(color_map.analyze([400, 100, 600, 400])[0], "red")
+        self.assertEqual(color_map.analyze([0, 100, 300, 400])[0], "black")
+        self.assertEqual(color_map.analyze([500, 500, 600, 600]), ("unknown", []))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+"""
+Tests for database module
+"""
+
+import threading
+import unittest
+import database
+
+class TestDatabase(unittest.TestCase):
+
+    def tearDown(self):
+        database.clear_database()
+
+    def test_frames_by_video(self):
+        """Test listing, counting and removing frames per video"""
+        database.add_frame({"video_filename": "a.mp4", "timestamp": 1.0, "objects": ["person"]})
+        database.add_frame({"video_filename": "b.mp4", "timestamp": 2.0, "objects": ["car"]})
+        self.assertEqual(database.get_frame_count(), 2)
+        self.assertEqual([f["timestamp"] for f in database.get_frames_with_object("car")], [2.0])
+        database.remove_video_frames("a.mp4")
+        self.assertEqual(database.get_frames_by_video("a.mp4"), [])
+        self.assertEqual([f["video_filename"] for f in database.get_all_frames()], ["b.mp4"])
+
+    def test_reads_during_ingestion_and_removal(self):
+        """Test that readers never see the store change size mid-iteration"""
+        stop = threading.Event()
+        errors = []
+
+        def ingest():
+            for i in range(2000):
+                video = f"cam{i}.mp4"
+                database.add_frame({"video_filename": video, "timestamp": 0.0})
+                if i % 2:
+                    database.remove_video_frames(video)
+            stop.set()
+
+        def query():
+            try:
+                while not stop.is_set():
+                    database.get_all_frames()
+                    database.get_frame_count()
+            except RuntimeError as e:
+                errors.append(e)
+                stop.set()
+
+        threads = [threading.Thread(target=ingest), threading.Thread(target=query)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(database.get_frame_count(), 1000)
+
+if __name__ == '__main__':
+    unittest.main()
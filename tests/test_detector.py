@@ -6,7 +6,7 @@ import unittest
 import os
 import cv2
 import numpy as np
-from detector import detect
+from detector import detect, detect_batch
 
 class TestDetector(unittest.TestCase):
     
@@ -49,6 +49,24 @@ class TestDetector(unittest.TestCase):
             self.assertIn("confidence", detection)
             self.assertIsInstance(detection["box"], list)
             self.assertEqual(len(detection["box"]), 4)
+    
+    def test_detect_with_frame(self):
+        """Test detect with an in-memory frame"""
+        frame = cv2.imread(self.test_image_path)
+        result = detect(frame)
+        self.assertIsInstance(result, list)
+    
+    def test_detect_batch_returns_one_list_per_frame(self):
+        """Test that detect_batch returns per-frame detections"""
+        frames = [np.zeros((480, 640, 3), dtype=np.uint8) for _ in range(5)]
+        result = detect_batch(frames, batch_size=2)
+        self.assertEqual(len(result), 5)
+        for detections in result:
+            self.assertIsInstance(detections, list)
+    
+    def test_detect_batch_empty(self):
+        """Test detect_batch with no frames"""
+        self.assertEqual(detect_batch([]), [])
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,144 @@
+"""
+Tests for detector backends module
+"""
+
+import os
+import tempfile
+import unittest
+import cv2
+import numpy as np
+from detector_backends import (
+    letterbox, preprocess, postprocess, _ExportedModelBackend, _FrameCalibrationReader,
+    _model_file_bytes, _names_from_metadata
+)
+
+NAMES = {0: "person", 1: "car"}
+
+def raw_output(boxes, size=640, classes=2, anchors=20):
+    """
+    Synthetic YOLOv8 output for one image: (1, 4 + classes, anchors)
+
+    Args:
+        boxes: (x1, y1, x2, y2, class_id, score) rows in network input coordinates
+    """
+    output = np.zeros((1, 4 + classes, anchors), dtype=np.float32)
+    for anchor, (x1, y1, x2, y2, class_id, score) in enumerate(boxes):
+        output[0, :4, anchor] = [(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1]
+        output[0, 4 + class_id, anchor] = score
+    return output
+
+class TestPreprocessing(unittest.TestCase):
+
+    def test_letterbox_pads_to_square(self):
+        """Test that a wide frame is scaled to fit and padded top and bottom"""
+        frame = np.zeros((480, 960, 3), dtype=np.uint8)
+        padded, ratio, (pad_x, pad_y) = letterbox(frame, 640)
+        self.assertEqual(padded.shape, (640, 640, 3))
+        self.assertAlmostEqual(ratio, 640 / 960)
+        self.assertEqual((pad_x, pad_y), (0, 160))
+        self.assertEqual(padded[0, 0].tolist(), [114, 114, 114])
+        self.assertEqual(padded[320, 320].tolist(), [0, 0, 0])
+
+    def test_preprocess_batch_layout(self):
+        """Test NCHW layout, RGB channel order and scaling to [0, 1]"""
+        blue = np.zeros((100, 200, 3), dtype=np.uint8)
+        blue[:, :, 0] = 255
+        batch, transforms = preprocess([blue, blue], 64)
+        self.assertEqual(batch.shape, (2, 3, 64, 64))
+        self.assertEqual(batch.dtype, np.float32)
+        self.assertEqual(batch[0, :, 32, 32].tolist(), [0.0, 0.0, 1.0])
+        self.assertEqual(transforms[0], (0.32, (0, 16)))
+
+class TestPostprocessing(unittest.TestCase):
+
+    def _detect(self, boxes, frame_shape=(480, 960, 3), confidence=0.5, **kwargs):
+        frame = np.zeros(frame_shape, dtype=np.uint8)
+        _, transforms = preprocess([frame], 640)
+        return postprocess(raw_output(boxes), [frame], transforms, NAMES, confidence, 0.7, **kwargs)[0]
+
+    def test_letterboxed_box_maps_back(self):
+        """Test that a box found on the letterboxed input maps back to frame coordinates"""
+        # Frame box (300, 120)-(600, 420) becomes (200, 240)-(400, 440) after scaling by 2/3 and padding by 160
+        detections = self._detect([(200, 240, 400, 440, 0, 0.9)])
+        self.assertEqual(len(detections), 1)
+        self.assertEqual(detections[0]["label"], "person")
+        np.testing.assert_allclose(detections[0]["box"], [300, 120, 600, 420], atol=1e-3)
+        self.assertAlmostEqual(detections[0]["confidence"], 0.9, places=5)
+
+    def test_boxes_are_clipped_to_the_frame(self):
+        """Test that boxes reaching into the padding are clipped"""
+        detections = self._detect([(0, 100, 100, 300, 1, 0.8)])
+        self.assertEqual(detections[0]["box"][1], 0.0)
+        self.assertEqual(detections[0]["label"], "car")
+
+    def test_nms_per_class_and_threshold(self):
+        """Test that NMS drops overlapping boxes of one class only, and low scores are filtered"""
+        detections = self._detect([
+            (200, 240, 400, 440, 0, 0.9),
+            (205, 245, 405, 445, 0, 0.6),  # Duplicate person
+            (205, 245, 405, 445, 1, 0.7),  # Car in the same place
+            (10, 200, 50, 250, 0, 0.3)     # Below the confidence threshold
+        ])
+        self.assertEqual([(d["label"], round(d["confidence"], 2)) for d in detections],
+                         [("person", 0.9), ("car", 0.7)])
+
+    def test_max_det_and_empty_output(self):
+        """Test the detection cap and frames without detections"""
+        boxes = [(40 * i, 200, 40 * i + 30, 230, 0, 0.5 + i / 100) for i in range(10)]
+        self.assertEqual(len(self._detect(boxes, max_det=3)), 3)
+        self.assertEqual(self._detect([]), [])
+
+class FixedBatchBackend(_ExportedModelBackend):
+    """Exported backend stub that only accepts one image per call"""
+
+    def __init__(self, boxes):
+        super().__init__(640, 0.7)
+        self.names = NAMES
+        self.boxes = boxes
+        self.calls = []
+
+    def _infer(self, batch):
+        self.calls.append(len(batch))
+        return raw_output(self.boxes)
+
+class TestExportedBackend(unittest.TestCase):
+
+    def test_fixed_batch_runs_one_frame_at_a_time(self):
+        """Test that a fixed-batch model is called per frame and results stay per frame"""
+        backend = FixedBatchBackend([(200, 240, 400, 440, 0, 0.9)])
+        frames = [np.zeros((480, 960, 3), dtype=np.uint8) for _ in range(3)]
+        detections = backend.predict(frames, 0.5)
+        self.assertEqual(backend.calls, [1, 1, 1])
+        self.assertEqual([len(d) for d in detections], [1, 1, 1])
+
+    def test_names_from_metadata(self):
+        """Test parsing the class map stored by ultralytics exports"""
+        self.assertEqual(_names_from_metadata("{0: 'person', 1: 'car'}"), NAMES)
+        self.assertEqual(_names_from_metadata({"0": "person"}), {0: "person"})
+
+    def test_model_file_bytes(self):
+        """Test that OpenVINO IR models count their .bin weights"""
+        with tempfile.TemporaryDirectory() as folder:
+            xml_path = os.path.join(folder, "model.xml")
+            with open(xml_path, "wb") as f:
+                f.write(b"x" * 10)
+            self.assertEqual(_model_file_bytes(xml_path), 10)
+            with open(os.path.join(folder, "model.bin"), "wb") as f:
+                f.write(b"w" * 1000)
+            self.assertEqual(_model_file_bytes(xml_path), 1010)
+
+    def test_calibration_reader(self):
+        """Test that calibration frames are preprocessed and unreadable files skipped"""
+        with tempfile.TemporaryDirectory() as folder:
+            paths = [os.path.join(folder, "missing.jpg")]
+            for i in range(2):
+                paths.append(os.path.join(folder, f"frame{i}.jpg"))
+                cv2.imwrite(paths[-1], np.full((48, 64, 3), 50 * i, dtype=np.uint8))
+            reader = _FrameCalibrationReader(paths, "images", 32)
+            batches = [reader.get_next(), reader.get_next()]
+            self.assertIsNone(reader.get_next())
+        self.assertEqual(batches[0]["images"].shape, (1, 3, 32, 32))
+        self.assertGreater(batches[1]["images"][0, 0, 16, 16], batches[0]["images"][0, 0, 16, 16])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+Tests for embedder module
+"""
+
+import unittest
+from unittest import mock
+import numpy as np
+import embedder
+
+def vector(seed):
+    return np.random.default_rng(seed).normal(size=(1, embedder.dimension)).astype('float32')
+
+class TestEmbedder(unittest.TestCase):
+    
+    def setUp(self):
+        embedder.clear_embeddings()
+        for i in range(6):
+            video = "a.mp4" if i % 2 == 0 else "b.mp4"
+            embedder.add("person", {"timestamp": i, "video_filename": video}, vector=vector(i))
+    
+    def tearDown(self):
+        embedder.clear_embeddings()
+    
+    def _nearest_timestamp(self, query, video_filename=None):
+        matches = embedder.index.search(query, 1, video_filename=video_filename)[0]
+        return matches[0][1]["timestamp"]
+    
+    def _all_ids(self):
+        return [i for video in embedder.index.shards for i in embedder.index.video_ids(video)]
+    
+    def test_remove_video_keeps_ids_and_vectors(self):
+        """Test that deleting a video neither re-encodes nor remaps other frames"""
+        with mock.patch.object(embedder, "_encode", side_effect=AssertionError("re-encoded")):
+            embedder.remove_video_embeddings("a.mp4")
+        
+        self.assertEqual(embedder.get_index_size(), 3)
+        self.assertEqual(list(embedder.index.shards), ["b.mp4"])
+        for i in (1, 3, 5):
+            self.assertEqual(self._nearest_timestamp(vector(i)), i)
+    
+    def test_ids_stay_unique_after_removal(self):
+        """Test that new frames never reuse the ID of a removed one"""
+        embedder.remove_video_embeddings("b.mp4")
+        embedder.add("car", {"timestamp": 99, "video_filename": "c.mp4"}, vector=vector(99))
+        self.assertEqual(len(set(self._all_ids())), 4)
+        self.assertEqual(self._nearest_timestamp(vector(99)), 99)
+    
+    def test_fan_out_merges_shards(self):
+        """Test that unscoped searches merge every shard's top-k by distance"""
+        matches = embedder.index.search(vector(3), 6)[0]
+        self.assertEqual(len(matches), 6)
+        self.assertEqual(matches[0][1]["timestamp"], 3)
+        distances = [distance for distance, _ in matches]
+        self.assertEqual(distances, sorted(distances))
+    
+    def test_scoped_search_touches_one_shard(self):
+        """Test that a search scoped to a video never searches other shards"""
+        other = embedder.index.shards["b.mp4"].index
+        with mock.patch.object(other, "search", side_effect=AssertionError("searched b.mp4")):
+            self.assertEqual(self._nearest_timestamp(vector(3), video_filename="a.mp4") % 2, 0)
+        self.assertEqual(embedder.index.search(vector(3), 1, video_filename="z.mp4"), [[]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+Tests for embedding cache module
+"""
+
+import unittest
+import numpy as np
+from embedding_cache import EmbeddingCache, normalize_text
+
+class TestEmbeddingCache(unittest.TestCase):
+    
+    def setUp(self):
+        self.calls = []
+    
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(t), t.count(" ")] for t in texts], dtype=np.float32)
+    
+    def test_normalize_text(self):
+        """Test that case and whitespace do not create new cache keys"""
+        self.assertEqual(normalize_text("  Person   CAR "), "person car")
+    
+    def test_repeated_texts_encoded_once(self):
+        """Test that only misses reach the encoder, batched and deduplicated"""
+        cache = EmbeddingCache(max_size=10)
+        first = cache.get_many(["person", "person car", "person"], self.encode)
+        second = cache.get_many(["Person", "car"], self.encode)
+        
+        self.assertEqual(self.calls, [["person", "person car"], ["car"]])
+        np.testing.assert_array_equal(first[0], first[2])
+        np.testing.assert_array_equal(first[0], second[0])
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 3))
+        self.assertAlmostEqual(stats["hit_rate"], 0.4)
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted"""
+        cache = EmbeddingCache(max_size=2)
+        cache.get_many(["a"], self.encode)
+        cache.get_many(["b"], self.encode)
+        cache.get_many(["a"], self.encode)  # a is now most recent
+        cache.get_many(["c"], self.encode)  # evicts b
+        self.assertEqual(len(cache), 2)
+        
+        self.calls.clear()
+        cache.get_many(["a", "b"], self.encode)
+        self.assertEqual(self.calls, [["b"]])
+    
+    def test_clear(self):
+        """Test that clearing drops entries and counters"""
+        cache = EmbeddingCache(max_size=2)
+        cache.get_many(["a", "a"], self.encode)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()["hit_rate"], 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+Tests for frame sampler module
+"""
+
+import unittest
+import os
+import cv2
+import numpy as np
+from frame_sampler import sample_frames
+
+class TestFrameSampler(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Create a short test video whose pixel value encodes the frame index"""
+        cls.test_video_path = "test_sampler_video.avi"
+        cls.fps = 25
+        cls.frame_count = 250
+        writer = cv2.VideoWriter(
+            cls.test_video_path, cv2.VideoWriter_fourcc(*'MJPG'), cls.fps, (64, 48)
+        )
+        for i in range(cls.frame_count):
+            writer.write(np.full((48, 64, 3), i, dtype=np.uint8))
+        writer.release()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Clean up test video"""
+        if os.path.exists(cls.test_video_path):
+            os.remove(cls.test_video_path)
+
+    def _sample(self, sample_fps, seek_min_gap):
+        cap = cv2.VideoCapture(self.test_video_path)
+        try:
+            return list(sample_frames(cap, sample_fps, seek_min_gap=seek_min_gap))
+        finally:
+            cap.release()
+
+    def test_exact_sampling_rate(self):
+        """Test that non-integer rates sample exact timestamps"""
+        samples = self._sample(0.4, seek_min_gap=1000)
+        indices = [s[0] for s in samples]
+        self.assertEqual(indices, [0, 62, 125, 188])
+        self.assertAlmostEqual(samples[1][1], 62 / self.fps)
+
+    def test_returns_correct_frames(self):
+        """Test that sampled frames match their indices"""
+        for index, _, frame in self._sample(2, seek_min_gap=1000):
+            self.assertLessEqual(abs(int(frame.mean()) - index), 2)
+
+    def test_seek_matches_grab(self):
+        """Test that seeking yields the same frames as grabbing"""
+        grabbed = self._sample(0.5, seek_min_gap=1000)
+        seeked = self._sample(0.5, seek_min_gap=0.5)
+        self.assertEqual([s[0] for s in grabbed], [s[0] for s in seeked])
+        for (_, _, a), (_, _, b) in zip(grabbed, seeked):
+            self.assertLessEqual(abs(float(a.mean()) - float(b.mean())), 2)
+
+    def test_high_rate_samples_every_frame(self):
+        """Test that sampling above the video fps does not duplicate frames"""
+        indices = [s[0] for s in self._sample(100, seek_min_gap=1000)]
+        self.assertEqual(indices, list(range(self.frame_count)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Tests for index store module
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from vector_index import VectorIndex
+from index_store import IndexStore, JsonlLog, read_jsonl
+
+def unit_vectors(n, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+class TestIndexStore(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _fill(self, store, index, vectors, start=0):
+        ids = list(range(start, start + len(vectors)))
+        metas = [{"timestamp": i} for i in ids]
+        index.add(vectors, ids)
+        store.append(ids, vectors, metas)
+        return dict(zip(ids, metas))
+
+    def _reload(self, index_type="flat"):
+        index = VectorIndex(16, index_type, metric="ip")
+        metadata = IndexStore(self.folder, "test", 16).load(index)
+        return index, metadata
+
+    def test_replay_log(self):
+        """Test that appended vectors come back without a snapshot"""
+        vectors = unit_vectors(20)
+        self._fill(IndexStore(self.folder, "test", 16), VectorIndex(16, metric="ip"), vectors)
+
+        index, metadata = self._reload()
+        self.assertEqual(index.ntotal, 20)
+        self.assertEqual(metadata[7], {"timestamp": 7})
+        _, found = index.search(vectors[7:8], 1)
+        self.assertEqual(found[0, 0], 7)
+
+    def test_snapshot_then_append(self):
+        """Test replaying additions on top of a snapshot"""
+        store = IndexStore(self.folder, "test", 16)
+        index = VectorIndex(16, metric="ip")
+        vectors = unit_vectors(30)
+        metadata = self._fill(store, index, vectors[:20])
+        store.snapshot(index, metadata)
+        self.assertEqual(store.pending_rows, 0)
+
+        self._fill(store, index, vectors[20:], start=20)
+
+        loaded, metadata = self._reload()
+        self.assertEqual(loaded.ntotal, 30)
+        self.assertEqual(sorted(metadata), list(range(30)))
+        _, found = loaded.search(vectors[[3, 25, 22]], 1)
+        self.assertEqual(found[:, 0].tolist(), [3, 25, 22])
+
+        # Later additions continue the vector log after the reloaded rows
+        store = IndexStore(self.folder, "test", 16)
+        store.load(VectorIndex(16, metric="ip"))
+        self.assertEqual(store.pending_rows, 10)
+
+    def test_metadata_updates_replay(self):
+        """Test that metadata updates apply before and after a snapshot"""
+        store = IndexStore(self.folder, "test", 16)
+        index = VectorIndex(16, metric="ip")
+        metadata = self._fill(store, index, unit_vectors(4))
+        store.update([1], [{"timestamp": 1, "time_range": {"start": 1, "end": 3}}])
+        store.snapshot(index, {**metadata, 1: {"timestamp": 1, "time_range": {"start": 1, "end": 3}}})
+        store.update([2, 99], [{"timestamp": 2, "time_range": {"start": 2, "end": 5}}, {}])
+
+        _, metadata = self._reload()
+        self.assertEqual(metadata[1]["time_range"]["end"], 3)
+        self.assertEqual(metadata[2]["time_range"]["end"], 5)
+        self.assertNotIn(99, metadata)
+
+    def test_torn_write_is_skipped(self):
+        """Test that an entry whose vector never reached disk is dropped"""
+        self._fill(IndexStore(self.folder, "test", 16), VectorIndex(16, metric="ip"), unit_vectors(5))
+        with open(os.path.join(self.folder, "test.jsonl"), "a") as f:
+            f.write('{"id": 5, "row": 5, "meta": {}}\n{"id": 6, "ro')
+
+        index, metadata = self._reload()
+        self.assertEqual(index.ntotal, 5)
+        self.assertEqual(sorted(metadata), list(range(5)))
+
+    def test_migrates_index_type(self):
+        """Test that a snapshot is converted to the configured index type"""
+        store = IndexStore(self.folder, "test", 16)
+        index = VectorIndex(16, metric="ip")
+        vectors = unit_vectors(50)
+        store.snapshot(index, self._fill(store, index, vectors))
+
+        loaded, _ = self._reload("hnsw")
+        self.assertEqual(loaded.ntotal, 50)
+        self.assertEqual(loaded.stats()["type"], "hnsw")
+        _, found = loaded.search(vectors[:5], 1)
+        self.assertEqual(found[:, 0].tolist(), list(range(5)))
+
+    def test_clear(self):
+        """Test that clearing deletes every file"""
+        store = IndexStore(self.folder, "test", 16)
+        index = VectorIndex(16, metric="ip")
+        store.snapshot(index, self._fill(store, index, unit_vectors(5)))
+        store.clear()
+        self.assertEqual(os.listdir(self.folder), [])
+
+    def test_jsonl_log(self):
+        """Test appending and atomically rewriting a JSON lines log"""
+        log = JsonlLog(os.path.join(self.folder, "frames.jsonl"))
+        log.append([{"timestamp": np.float32(1.5)}, {"objects": ["person"]}])
+        self.assertEqual(list(read_jsonl(log.path)), [{"timestamp": 1.5}, {"objects": ["person"]}])
+        log.rewrite([{"timestamp": 2}])
+        self.assertEqual(list(read_jsonl(log.path)), [{"timestamp": 2}])
+
+if __name__ == '__main__':
+    unittest.main()
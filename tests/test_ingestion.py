@@ -0,0 +1,178 @@
+"""
+Tests for ingestion module
+"""
+
+import queue
+import threading
+import unittest
+from concurrent.futures import Future
+from unittest import mock
+import numpy as np
+import cv2
+import ingestion
+
+def frame(value):
+    return np.full((8, 8, 3), value, dtype=np.uint8)
+
+def fake_detect(frames, confidence_threshold=0.5, batch_size=8):
+    """One detection per frame whose label names the frame's pixel value"""
+    return [[{"label": f"obj{int(f[0, 0, 0])}", "box": [0, 0, 4, 4], "confidence": 0.9}] for f in frames]
+
+class FakeCapture:
+    """Stands in for cv2.VideoCapture: 1 fps, frames come from the patched sampler"""
+
+    def __init__(self, path):
+        self.released = False
+
+    def get(self, prop):
+        return 1.0 if prop == cv2.CAP_PROP_FPS else 20
+
+    def release(self):
+        self.released = True
+
+class StubBatcher:
+    """Records CLIP indexing instead of encoding"""
+
+    instances = []
+
+    def __init__(self):
+        self.added = []
+        self.flushed = False
+        self.merged = 0
+        StubBatcher.instances.append(self)
+
+    def add(self, frame, meta, reuse=False):
+        self.added.append(meta)
+
+    def flush(self):
+        self.flushed = True
+
+def written():
+    future = Future()
+    future.set_result(None)
+    return future
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.indexed = []
+        StubBatcher.instances = []
+
+    def _run(self, frames, detect=fake_detect, **kwargs):
+        def sample_frames(cap, sample_fps):
+            for i, f in enumerate(frames):
+                if isinstance(f, Exception):
+                    raise f
+                yield i, float(i), f
+
+        with mock.patch.multiple(
+            ingestion,
+            sample_frames=sample_frames,
+            save_frame_async=lambda path, f: written(),
+            detect_batch=detect,
+            add=lambda text, meta, vector=None: np.zeros(4, dtype=np.float32),
+            add_frame=self.indexed.append,
+            record_detections=mock.DEFAULT,
+            ClipBatcher=StubBatcher,
+            REID_ENABLED=False
+        ), mock.patch.object(ingestion.cv2, "VideoCapture", FakeCapture):
+            kwargs.setdefault("motion_gate", False)
+            return ingestion.process_video("cam.mp4", "cam.mp4", "frames", sample_fps=1, **kwargs)
+
+    def assertStagesStopped(self):
+        names = [t.name for t in threading.enumerate() if t.is_alive()]
+        self.assertNotIn("ingest-decode", names)
+        self.assertNotIn("ingest-inference", names)
+
+    def test_order_preserved_across_batches(self):
+        """Test that frames reach indexing in order with their own detections"""
+        result = self._run([frame(i) for i in range(20)], batch_size=4, queue_size=2)
+        self.assertEqual(result["frames"], 20)
+        self.assertFalse(result["cancelled"])
+        self.assertEqual([m["timestamp"] for m in self.indexed], [float(i) for i in range(20)])
+        self.assertEqual([m["objects"] for m in self.indexed], [[f"obj{i}"] for i in range(20)])
+        self.assertTrue(StubBatcher.instances[0].flushed)
+        self.assertStagesStopped()
+
+    def test_static_frames_reuse_results(self):
+        """Test that motion-gated frames skip detection and reuse the previous results"""
+        detect = mock.Mock(side_effect=fake_detect)
+        result = self._run([frame(7)] * 5, detect=detect, motion_gate=True)
+        self.assertEqual(result["skipped_frames"], 4)
+        self.assertEqual(sum(len(call.args[0]) for call in detect.call_args_list), 1)
+        self.assertEqual([m["objects"] for m in self.indexed], [["obj7"]] * 5)
+
+    def test_fallback_detection_restarts_keyframe_interval(self):
+        """Test that a detection after lost propagation moves the following keyframes"""
+        detected = []
+
+        def detect(frames, **kwargs):
+            detected.extend(int(f[0, 0, 0]) for f in frames)
+            return fake_detect(frames)
+
+        class LosesFrameTwo:
+            def reset(self, f, detections):
+                self.detections = detections
+
+            def propagate(self, f):
+                return None if f[0, 0, 0] == 2 else [dict(d) for d in self.detections]
+
+        with mock.patch.object(ingestion, "BoxPropagator", LosesFrameTwo):
+            self._run([frame(i) for i in range(12)], detect=detect, keyframe_interval=4, batch_size=8)
+        self.assertEqual(detected, [0, 2, 6, 10])
+        self.assertEqual([m["objects"] for m in self.indexed[:4]], [["obj0"], ["obj0"], ["obj2"], ["obj2"]])
+
+    def test_decoder_error_is_raised(self):
+        """Test that a decoding failure stops the pipeline and reaches the caller"""
+        with self.assertRaisesRegex(RuntimeError, "corrupt stream"):
+            self._run([frame(0), frame(1), RuntimeError("corrupt stream")])
+        self.assertStagesStopped()
+
+    def test_detector_error_is_raised(self):
+        """Test that an inference failure stops the pipeline and reaches the caller"""
+        def detect(frames, **kwargs):
+            if any(f[0, 0, 0] == 3 for f in frames):
+                raise ValueError("bad model output")
+            return fake_detect(frames)
+
+        with self.assertRaisesRegex(ValueError, "bad model output"):
+            self._run([frame(i) for i in range(10)], detect=detect, batch_size=1)
+        self.assertStagesStopped()
+
+    def test_cancel_mid_stream(self):
+        """Test that cancelling stops indexing, joins the stages and skips the final flush"""
+        cancel = threading.Event()
+
+        def on_progress(done, expected):
+            if done == 5:
+                cancel.set()
+
+        result = self._run([frame(i) for i in range(50)], queue_size=2,
+                           progress_callback=on_progress, cancel_event=cancel)
+        self.assertTrue(result["cancelled"])
+        self.assertEqual(len(self.indexed), 5)
+        self.assertFalse(StubBatcher.instances[0].flushed)
+        self.assertStagesStopped()
+
+class TestQueues(unittest.TestCase):
+
+    def test_put_gives_up_when_stopped(self):
+        """Test that a full queue does not block a stopped stage forever"""
+        q = queue.Queue(maxsize=1)
+        stop = threading.Event()
+        self.assertTrue(ingestion._put(q, 1, stop))
+        threading.Timer(0.2, stop.set).start()
+        self.assertFalse(ingestion._put(q, 2, stop))
+
+    def test_get_returns_end_when_stopped(self):
+        """Test that an empty queue yields the end marker once stopped"""
+        q = queue.Queue()
+        stop = threading.Event()
+        q.put("item")
+        self.assertEqual(ingestion._get(q, stop), "item")
+        stop.set()
+        q.put("late")
+        self.assertIs(ingestion._get(q, stop), ingestion._END)
+
+if __name__ == '__main__':
+    unittest.main()
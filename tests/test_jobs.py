@@ -0,0 +1,79 @@
+"""
+Tests for jobs module
+"""
+
+import threading
+import unittest
+from unittest import mock
+import numpy as np
+import jobs
+import embedder
+import database
+import track_store
+
+def fake_process_video(path, video_filename, progress_callback=None, cancel_event=None, **options):
+    """Index one frame of the video, then fail"""
+    database.add_frame({"video_filename": video_filename, "timestamp": 0.0})
+    embedder.add("person", {"timestamp": 0.0, "video_filename": video_filename},
+                 vector=np.ones((1, embedder.dimension), dtype=np.float32))
+    track_store.record_detections(video_filename, 0.0, [{"label": "person", "track_id": "P1", "box": [0, 0, 1, 1]}])
+    raise RuntimeError("decoder crashed")
+
+def indexing_process_video(path, video_filename, progress_callback=None, cancel_event=None, **options):
+    """Index one frame of the video, then wait until cancelled or released"""
+    database.add_frame({"video_filename": video_filename, "timestamp": 0.0, "path": path})
+    while not cancel_event.wait(0.01):
+        if options.get("release", threading.Event()).is_set():
+            break
+    return {"cancelled": cancel_event.is_set(), "frames": 1}
+
+class TestJobs(unittest.TestCase):
+
+    def tearDown(self):
+        database.clear_database()
+
+    def _wait(self, job_id):
+        for _ in range(200):
+            job = jobs.get_job(job_id)
+            if job["status"] in jobs._FINISHED_STATES:
+                return job
+            threading.Event().wait(0.01)
+        self.fail("Job did not finish")
+
+    def test_failed_job_discards_partial_results(self):
+        """Test that a job that raises leaves nothing of its video indexed"""
+        with mock.patch.object(jobs, "process_video", fake_process_video):
+            job = self._wait(jobs.submit_ingestion_job("missing.mp4", "failing.mp4"))
+        self.assertEqual(job["status"], jobs.FAILED)
+        self.assertEqual(job["error"], "decoder crashed")
+        self.assertEqual(database.get_frames_by_video("failing.mp4"), [])
+        self.assertEqual(embedder.index.video_ids("failing.mp4"), [])
+        self.assertEqual(track_store.list_tracks("failing.mp4"), [])
+
+    def test_reupload_cannot_wipe_earlier_upload(self):
+        """Test that a name in use is refused, so cancelling the re-upload keeps the first video"""
+        release = threading.Event()
+        release.set()
+        with mock.patch.object(jobs, "process_video", indexing_process_video):
+            first = self._wait(jobs.submit_ingestion_job("first.mp4", "same.mp4", release=release))
+            self.assertEqual(first["status"], jobs.COMPLETED)
+            self.assertTrue(jobs.video_in_use("same.mp4"))
+            with self.assertRaises(ValueError):
+                jobs.submit_ingestion_job("second.mp4", "same.mp4")
+
+            # A queued or running job also holds its name until it finishes
+            running = jobs.submit_ingestion_job("other.mp4", "other.mp4", release=threading.Event())
+            with self.assertRaises(ValueError):
+                jobs.submit_ingestion_job("again.mp4", "other.mp4")
+            self.assertTrue(jobs.cancel_job(running))
+            self.assertEqual(self._wait(running)["status"], jobs.CANCELLED)
+        self.assertFalse(jobs.video_in_use("other.mp4"))
+        self.assertEqual([f["path"] for f in database.get_frames_by_video("same.mp4")], ["first.mp4"])
+
+    def test_unknown_job(self):
+        """Test that unknown jobs are reported as missing"""
+        self.assertIsNone(jobs.get_job("nope"))
+        self.assertFalse(jobs.cancel_job("nope"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Tests for lazy model module
+"""
+
+import threading
+import unittest
+import lazy_model
+import model_registry
+from lazy_model import LazyModel
+
+class TestLazyModel(unittest.TestCase):
+    
+    def setUp(self):
+        self._saved_handles = list(lazy_model._handles)
+        self._saved_hooks = list(lazy_model._warmup_hooks)
+        self._saved_entries = dict(model_registry._entries)
+        lazy_model._handles.clear()
+        lazy_model._warmup_hooks.clear()
+        model_registry._entries.clear()
+    
+    def tearDown(self):
+        lazy_model._handles[:] = self._saved_handles
+        lazy_model._warmup_hooks[:] = self._saved_hooks
+        model_registry._entries.clear()
+        model_registry._entries.update(self._saved_entries)
+    
+    def test_loads_on_first_use(self):
+        """Test that the loader only runs when the model is requested"""
+        calls = []
+        handle = LazyModel("test", lambda: calls.append(1) or "model")
+        self.assertEqual(calls, [])
+        self.assertEqual(handle.get(), "model")
+        self.assertEqual(handle.get(), "model")
+        self.assertEqual(calls, [1])
+        self.assertTrue(handle.ready)
+    
+    def test_concurrent_callers_share_one_load(self):
+        """Test that concurrent first calls trigger a single load"""
+        calls = []
+        started = threading.Event()
+        
+        def loader():
+            calls.append(1)
+            started.wait(1)
+            return object()
+        
+        handle = LazyModel("test", loader)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(handle.get())) for _ in range(4)]
+        for t in threads:
+            t.start()
+        started.set()
+        for t in threads:
+            t.join()
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(set(map(id, results))), 1)
+    
+    def test_failed_load(self):
+        """Test that a failed load returns None and is reported"""
+        def loader():
+            raise OSError("offline")
+        
+        handle = LazyModel("test", loader)
+        self.assertIsNone(handle.get())
+        self.assertEqual(handle.status()["state"], lazy_model.FAILED)
+        self.assertIn("offline", handle.status()["error"])
+    
+    def test_readiness(self):
+        """Test readiness with required and optional models"""
+        required = LazyModel("required", lambda: "model")
+        
+        def fail():
+            raise OSError("offline")
+        
+        optional = LazyModel("optional", fail, required=False)
+        self.assertFalse(lazy_model.models_ready())
+        lazy_model.warmup_models()
+        self.assertTrue(required.ready)
+        self.assertFalse(optional.ready)
+        self.assertTrue(lazy_model.models_ready())
+        self.assertEqual(set(lazy_model.get_model_statuses()), {"required", "optional"})
+    
+    def test_warmup_hooks_run_after_models(self):
+        """Test that hooks see loaded models and a failing hook does not stop the others"""
+        handle = LazyModel("test", lambda: "model")
+        seen = []
+        
+        def broken():
+            raise RuntimeError("no labels")
+        
+        lazy_model.add_warmup_hook(broken)
+        lazy_model.add_warmup_hook(lambda: seen.append(handle.ready))
+        lazy_model.warmup_models()
+        self.assertEqual(seen, [True])
+    
+    def test_handles_share_model_id(self):
+        """Test that handles on the same weights share one instance"""
+        calls = []
+        first = LazyModel("first", lambda: calls.append(1) or object(), model_id="shared")
+        second = LazyModel("second", lambda: calls.append(1) or object(), model_id="shared")
+        self.assertIs(first.get(), second.get())
+        self.assertEqual(len(calls), 1)
+
+if __name__ == '__main__':
+    unittest.main()
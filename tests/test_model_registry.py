@@ -0,0 +1,56 @@
+"""
+Tests for model registry module
+"""
+
+import unittest
+import model_registry
+from model_registry import get_model, unload_model, get_registry_stats, estimate_memory_bytes
+
+class _SizedModel:
+    def __init__(self, nbytes):
+        self.memory_bytes = nbytes
+
+class TestModelRegistry(unittest.TestCase):
+    
+    def setUp(self):
+        self._saved_entries = dict(model_registry._entries)
+        model_registry._entries.clear()
+    
+    def tearDown(self):
+        model_registry._entries.clear()
+        model_registry._entries.update(self._saved_entries)
+    
+    def test_one_instance_per_model_and_device(self):
+        """Test that the same model and device share an instance"""
+        a = get_model("m", object, "cpu")
+        b = get_model("m", object, "cpu")
+        c = get_model("m", object, "cuda")
+        self.assertIs(a, b)
+        self.assertIsNot(a, c)
+    
+    def test_unload_and_reload(self):
+        """Test that an unloaded model is loaded again on next use"""
+        first = get_model("m", object)
+        self.assertEqual(unload_model("m"), 1)
+        self.assertEqual(model_registry.get_model_status("m")["state"], model_registry.NOT_LOADED)
+        self.assertIsNot(get_model("m", object), first)
+        self.assertEqual(unload_model("missing"), 0)
+    
+    def test_memory_footprint(self):
+        """Test that memory usage is reported per model"""
+        get_model("a", lambda: _SizedModel(2 * 1024 * 1024))
+        get_model("b", lambda: (_SizedModel(1024 * 1024), "processor"))
+        stats = get_registry_stats()
+        by_id = {m["model_id"]: m for m in stats["models"]}
+        self.assertEqual(by_id["a"]["memory_mb"], 2.0)
+        self.assertEqual(by_id["b"]["memory_mb"], 1.0)
+        self.assertEqual(stats["total_model_memory_mb"], 3.0)
+    
+    def test_estimate_torch_module(self):
+        """Test memory estimation for torch modules"""
+        import torch
+        module = torch.nn.Linear(10, 10)
+        self.assertEqual(estimate_memory_bytes(module), (10 * 10 + 10) * 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+"""
+Tests for motion gate module
+"""
+
+import unittest
+import numpy as np
+from motion_gate import MotionGate
+
+class TestMotionGate(unittest.TestCase):
+    
+    def setUp(self):
+        self.frame = np.full((360, 640, 3), 80, dtype=np.uint8)
+    
+    def test_first_frame_is_processed(self):
+        """Test that the first frame is never static"""
+        gate = MotionGate()
+        self.assertFalse(gate.is_static(self.frame))
+    
+    def test_identical_frame_is_static(self):
+        """Test that an unchanged frame is gated"""
+        gate = MotionGate()
+        gate.is_static(self.frame)
+        self.assertTrue(gate.is_static(self.frame.copy()))
+    
+    def test_noise_is_static(self):
+        """Test that small sensor noise does not trigger processing"""
+        gate = MotionGate()
+        gate.is_static(self.frame)
+        noise = np.random.default_rng(0).integers(-5, 6, self.frame.shape)
+        noisy = np.clip(self.frame.astype(int) + noise, 0, 255).astype(np.uint8)
+        self.assertTrue(gate.is_static(noisy))
+    
+    def test_moving_object_is_processed(self):
+        """Test that a new object in the scene triggers processing"""
+        gate = MotionGate()
+        gate.is_static(self.frame)
+        moved = self.frame.copy()
+        moved[100:250, 300:380] = 255
+        self.assertFalse(gate.is_static(moved))
+    
+    def test_reference_only_updates_on_processed_frames(self):
+        """Test that slow changes accumulate against the last processed frame"""
+        gate = MotionGate(changed_fraction=0.05)
+        gate.is_static(self.frame)
+        frame = self.frame.copy()
+        results = []
+        for step in range(1, 6):
+            frame = self.frame.copy()
+            frame[:, : step * 16] = 255
+            results.append(gate.is_static(frame))
+        self.assertIn(False, results)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Tests for re-identification gallery module
+"""
+
+import unittest
+import numpy as np
+from reid_gallery import ReIDGallery
+from tracker import MultiObjectTracker, reset_tracking
+
+def unit(seed, dim=16):
+    vector = np.random.default_rng(seed).normal(size=dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+def mean_color_embedding(crops):
+    """Fake embedding model: direction of the crop's mean BGR color"""
+    vectors = np.array([crop.reshape(-1, 3).mean(axis=0) + 1 for crop in crops], dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+class TestReIDGallery(unittest.TestCase):
+    
+    def _gallery(self, **kwargs):
+        return ReIDGallery(embed_fn=mean_color_embedding, **kwargs)
+    
+    def test_retired_track_is_matched(self):
+        """Test that a lost track is found again by appearance"""
+        for index_type in ("hnsw", "flat"):
+            gallery = self._gallery(index_type=index_type)
+            gallery.observe("P1", unit(1))
+            gallery.observe("P2", unit(2))
+            gallery.retire("P1", 10.0)
+            gallery.retire("P2", 10.0)
+            self.assertEqual(gallery.match([unit(2), unit(3)], 12.0), ["P2", None])
+            # A matched identity is active again and leaves the gallery
+            self.assertEqual(len(gallery), 1)
+            self.assertEqual(gallery.match([unit(2)], 13.0), [None])
+    
+    def test_identity_is_claimed_once(self):
+        """Test that two new tracks cannot both take the same identity"""
+        gallery = self._gallery()
+        gallery.observe("P1", unit(1))
+        gallery.retire("P1", 0.0)
+        self.assertEqual(gallery.match([unit(1), unit(1)], 1.0).count("P1"), 1)
+    
+    def test_eviction_by_count_and_age(self):
+        """Test that the oldest identities are forgotten first"""
+        gallery = self._gallery(max_identities=2, max_age_seconds=100)
+        for i in range(3):
+            gallery.observe(f"P{i}", unit(i))
+            gallery.retire(f"P{i}", float(i))
+        self.assertEqual(len(gallery), 2)
+        self.assertEqual(gallery.match([unit(0)], 3.0), [None])
+        
+        gallery.evict(500.0)
+        self.assertEqual(len(gallery), 0)
+    
+    def test_index_is_rebuilt_after_removals(self):
+        """Test that tombstoned entries are compacted away"""
+        gallery = self._gallery()
+        for i in range(10):
+            gallery.observe(f"P{i}", unit(i))
+            gallery.retire(f"P{i}", 0.0)
+        gallery.match([unit(i) for i in range(6)], 1.0)
+        self.assertEqual(len(gallery), 4)
+        self.assertEqual(gallery._index.ntotal, 4)
+        self.assertEqual(gallery.match([unit(8)], 1.0), ["P8"])
+
+    def test_tombstones_do_not_hide_a_match(self):
+        """Test that evicted look-alikes ranking first do not crowd out a live match"""
+        query = np.zeros(16, dtype=np.float32)
+        query[0] = 1
+        gallery = self._gallery(index_type="flat", max_age_seconds=50)
+        # Eight close look-alikes that will be evicted, then the real match and unrelated people
+        for i in range(8):
+            gallery.observe(f"P{i}", 0.99 * query + np.sqrt(1 - 0.99 ** 2) * np.eye(16, dtype=np.float32)[i + 1])
+            gallery.retire(f"P{i}", 0.0)
+        gallery.observe("P8", 0.9 * query + np.sqrt(1 - 0.9 ** 2) * np.eye(16, dtype=np.float32)[9])
+        gallery.retire("P8", 40.0)
+        for i in range(9, 20):
+            gallery.observe(f"P{i}", unit(i) * (np.arange(16) % 2))
+            gallery.retire(f"P{i}", 40.0)
+
+        gallery.evict(60.0)
+        self.assertEqual(gallery._tombstones, 8)
+        self.assertEqual(gallery.match([query], 60.0), ["P8"])
+
+    def test_tracker_revives_returning_person(self):
+        """Test that a person leaving and coming back keeps their track ID"""
+        reset_tracking()
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        frame[20:120, 10:50] = (0, 0, 200)      # red person
+        frame[20:120, 250:290] = (200, 0, 0)    # blue person
+        red = {"label": "person", "box": [10, 20, 50, 120], "confidence": 0.9}
+        blue = {"label": "person", "box": [250, 20, 290, 120], "confidence": 0.9}
+        
+        tracker = MultiObjectTracker(max_age=1, reid=self._gallery())
+        first = tracker.update([dict(red), dict(blue)], frame=frame, timestamp=0)
+        tracker.update([], frame=frame, timestamp=5)
+        tracker.update([], frame=frame, timestamp=10)
+        self.assertEqual(len(tracker), 0)
+        
+        # They come back at each other's positions
+        frame[:] = 0
+        frame[20:120, 250:290] = (0, 0, 200)
+        frame[20:120, 10:50] = (200, 0, 0)
+        back = tracker.update([dict(red), dict(blue)], frame=frame, timestamp=15)
+        self.assertEqual(back[1]["track_id"], first[0]["track_id"])
+        self.assertEqual(back[0]["track_id"], first[1]["track_id"])
+        reset_tracking()
+
+if __name__ == '__main__':
+    unittest.main()
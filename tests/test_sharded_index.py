@@ -0,0 +1,79 @@
+"""
+Tests for sharded index module
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from vector_index import VectorIndex, EmbeddingMatrix
+from sharded_index import ShardedIndex
+from index_store import shard_folder
+
+def unit_vectors(n, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def metas(video, count, start=0):
+    return [{"video_filename": video, "timestamp": start + t} for t in range(count)]
+
+class TestShardedIndex(unittest.TestCase):
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.root)
+    
+    def _index(self):
+        return ShardedIndex("clip", 16, lambda folder: EmbeddingMatrix(16), metric="ip", root=self.root)
+    
+    def test_routes_and_merges(self):
+        """Test that vectors land in their video's shard and fan-out returns the global top-k"""
+        index = self._index()
+        vectors = unit_vectors(40)
+        ids = index.add(vectors, metas("a.mp4", 20) + metas("b/c.mp4", 20, start=20))
+        self.assertEqual(ids, list(range(40)))
+        self.assertEqual(sorted(index.shards), ["a.mp4", "b/c.mp4"])
+        
+        expected = np.argsort(-(vectors @ vectors[25]), kind="stable")[:5]
+        matches = index.search(vectors[25:26], 5)[0]
+        self.assertEqual([meta["timestamp"] for _, meta in matches], expected.tolist())
+        
+        scoped = index.search(vectors[25:26], 3, video_filename="a.mp4")[0]
+        self.assertTrue(all(meta["video_filename"] == "a.mp4" for _, meta in scoped))
+        self.assertEqual(index.stats()["shards"], 2)
+    
+    def test_persist_load_and_drop(self):
+        """Test that shards persist independently and dropping one deletes its files"""
+        index = self._index()
+        vectors = unit_vectors(30)
+        index.load(self.root)
+        index.add(vectors[:10], metas("a.mp4", 10))
+        index.save("a.mp4")
+        index.add(vectors[10:], metas("b.mp4", 20))
+        self.assertTrue(os.path.exists(os.path.join(shard_folder(self.root, "a.mp4"), "clip.faiss")))
+        
+        loaded = self._index()
+        self.assertEqual(loaded.load(self.root), 30)
+        self.assertEqual(loaded.search(vectors[15:16], 1)[0][0][1]["timestamp"], 5)
+        self.assertEqual(loaded.add(vectors[:1], metas("c.mp4", 1)), [30])
+        
+        self.assertEqual(loaded.remove_video("b.mp4"), 20)
+        self.assertFalse(os.path.exists(shard_folder(self.root, "b.mp4")))
+        self.assertEqual(self._index().load(self.root), 11)
+        
+        # Reloading a live index keeps the files it reads from
+        self.assertEqual(loaded.load(self.root), 11)
+        self.assertEqual(loaded.load(self.root), 11)
+    
+    def test_search_params_reach_new_shards(self):
+        """Test that recall knobs set before a shard exists still apply to it"""
+        index = ShardedIndex("text", 16, lambda folder: VectorIndex(16, "hnsw"), root=self.root)
+        index.set_search_params(ef_search=128)
+        index.add(unit_vectors(5), metas("a.mp4", 5))
+        self.assertEqual(index.stats()["ef_search"], 128)
+
+if __name__ == '__main__':
+    unittest.main()
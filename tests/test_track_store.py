@@ -0,0 +1,71 @@
+"""
+Tests for track store module
+"""
+
+import unittest
+import track_store
+from track_store import (
+    record_detections, list_tracks, get_timeline, get_trajectory,
+    remove_video_tracks, clear_tracks, restore_tracks
+)
+
+def person(track_id, x):
+    return {"label": "person", "track_id": track_id, "box": [x, 10, x + 40, 110]}
+
+class TestTrackStore(unittest.TestCase):
+    
+    def setUp(self):
+        clear_tracks()
+        # P1 is seen at 0-10s and again at 40-45s; P2 only at 5s
+        for t in (0, 5, 10, 40, 45):
+            detections = [person("P1", t)]
+            if t == 5:
+                detections.append(person("P2", 200))
+            record_detections("cam1.mp4", float(t), detections, gap=10)
+        record_detections("cam2.mp4", 3.0, [person("P7", 0), {"label": "car", "box": [0, 0, 5, 5]}], gap=10)
+    
+    def tearDown(self):
+        clear_tracks()
+    
+    def test_timeline_merges_intervals(self):
+        """Test that sightings within the gap form one appearance"""
+        timeline = get_timeline("P1")
+        self.assertEqual([(i["start"], i["end"]) for i in timeline["intervals"]], [(0, 10), (40, 45)])
+        self.assertEqual(timeline["appearances"], 2)
+        self.assertEqual(timeline["sightings"], 5)
+        self.assertEqual(timeline["video_filename"], "cam1.mp4")
+    
+    def test_trajectory_time_range(self):
+        """Test that trajectories can be sliced by time"""
+        points = get_trajectory("P1", start=5, end=40)["points"]
+        self.assertEqual([p["timestamp"] for p in points], [5, 10, 40])
+        self.assertEqual(points[0]["box"], [5, 10, 45, 110])
+        self.assertEqual(len(get_trajectory("P1")["points"]), 5)
+    
+    def test_list_and_unknown_tracks(self):
+        """Test listing tracks by video and untracked detections"""
+        self.assertEqual([t["track_id"] for t in list_tracks("cam1.mp4")], ["P1", "P2"])
+        self.assertEqual(len(list_tracks()), 3)
+        self.assertIsNone(get_timeline("P99"))
+        self.assertIsNone(get_trajectory("P99"))
+    
+    def test_remove_video_tracks(self):
+        """Test that tracks are removed with their video"""
+        remove_video_tracks("cam1.mp4")
+        self.assertEqual(list(track_store.tracks), ["P7"])
+    
+    def test_restore_tracks(self):
+        """Test that tracks are rebuilt from persisted frame entries"""
+        clear_tracks()
+        frames = [
+            {"video_filename": "cam1.mp4", "timestamp": t, "detections": [person("P1", t)]}
+            for t in (0.0, 1.0, 30.0)
+        ]
+        frames.append({"video_filename": "cam1.mp4", "timestamp": 31.0, "objects": []})
+        self.assertEqual(restore_tracks(frames), 1)
+        timeline = get_timeline("P1")
+        self.assertEqual(timeline["sightings"], 3)
+        self.assertEqual(timeline["appearances"], 2)
+
+if __name__ == '__main__':
+    unittest.main()
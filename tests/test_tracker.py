@@ -0,0 +1,110 @@
+"""
+Tests for tracker module
+"""
+
+import unittest
+import numpy as np
+from reid_gallery import ReIDGallery
+from tracker import (
+    MultiObjectTracker, iou_matrix, primary_person_id,
+    get_tracked_count, reset_tracking, restore_track_ids
+)
+
+def person(x, y, confidence=0.9):
+    return {"label": "person", "box": [x, y, x + 40, y + 100], "confidence": confidence}
+
+class TestTracker(unittest.TestCase):
+    
+    def setUp(self):
+        reset_tracking()
+    
+    def tearDown(self):
+        reset_tracking()
+    
+    def test_iou_matrix(self):
+        """Test pairwise IoU values"""
+        a = np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=float)
+        b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [100, 100, 110, 110]], dtype=float)
+        iou = iou_matrix(a, b)
+        self.assertEqual(iou.shape, (2, 3))
+        self.assertAlmostEqual(iou[0, 0], 1.0)
+        self.assertAlmostEqual(iou[0, 1], 50 / 150)
+        self.assertEqual(iou[1, 2], 0.0)
+    
+    def test_moving_person_keeps_id(self):
+        """Test that a person moving steadily keeps one track ID"""
+        tracker = MultiObjectTracker()
+        ids = set()
+        for step in range(10):
+            detections = tracker.update([person(50 + 15 * step, 80)])
+            ids.add(detections[0]["track_id"])
+        self.assertEqual(ids, {"P1"})
+        self.assertEqual(get_tracked_count(), 1)
+    
+    def test_two_people_keep_separate_ids(self):
+        """Test that each detection gets its own track ID"""
+        tracker = MultiObjectTracker()
+        first = tracker.update([person(10, 10), person(300, 10)])
+        # Detections arrive in a different order on the next frame
+        second = tracker.update([person(305, 12), person(14, 11)])
+        self.assertEqual(second[0]["track_id"], first[1]["track_id"])
+        self.assertEqual(second[1]["track_id"], first[0]["track_id"])
+        self.assertNotEqual(first[0]["track_id"], first[1]["track_id"])
+    
+    def test_labels_are_not_mixed(self):
+        """Test that a detection never continues a track of another class"""
+        tracker = MultiObjectTracker()
+        tracker.update([person(10, 10)])
+        bag = tracker.update([{"label": "backpack", "box": [10, 10, 50, 110], "confidence": 0.8}])
+        self.assertEqual(bag[0]["track_id"], "T1")
+    
+    def test_lost_tracks_are_dropped(self):
+        """Test that unmatched tracks expire after max_age frames"""
+        tracker = MultiObjectTracker(max_age=2)
+        tracker.update([person(10, 10)])
+        for _ in range(3):
+            tracker.update([])
+        self.assertEqual(len(tracker), 0)
+        self.assertEqual(tracker.update([person(10, 10)])[0]["track_id"], "P2")
+    
+    def test_short_occlusion_keeps_id(self):
+        """Test that a track survives a missed detection"""
+        tracker = MultiObjectTracker(max_age=2)
+        tracker.update([person(10, 10)])
+        tracker.update([])
+        self.assertEqual(tracker.update([person(12, 10)])[0]["track_id"], "P1")
+    
+    def test_primary_person_id(self):
+        """Test that the frame-level person ID is the most confident person"""
+        detections = MultiObjectTracker().update([person(10, 10, 0.6), person(200, 10, 0.95)])
+        self.assertEqual(primary_person_id(detections), detections[1]["track_id"])
+        self.assertIsNone(primary_person_id([{"label": "car", "box": [0, 0, 5, 5]}]))
+    
+    def test_restored_ids_are_not_reissued(self):
+        """Test that numbering continues after track IDs restored from disk"""
+        restore_track_ids(["P3", "P12", "T4", "X9", "Pfoo"])
+        self.assertEqual(get_tracked_count(), 12)
+        tracker = MultiObjectTracker()
+        first = tracker.update([person(10, 10), {"label": "car", "box": [300, 0, 400, 50], "confidence": 0.8}])
+        self.assertEqual([d["track_id"] for d in first], ["P13", "T5"])
+
+    def test_reid_embeds_new_tracks_and_refreshes(self):
+        """Test that person crops are embedded when a track starts and then only on refresh"""
+        embedded = []
+
+        def embed(crops):
+            embedded.append(len(crops))
+            return np.eye(len(crops), 16, dtype=np.float32)
+
+        tracker = MultiObjectTracker(reid=ReIDGallery(embed_fn=embed), reid_refresh_seconds=10)
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        for t in range(0, 25, 2):
+            people = [person(10 + t, 10), person(200 + t, 10)]
+            if t >= 4:
+                people.append(person(100, 120))
+            tracker.update(people, frame=frame, timestamp=t)
+        # Two tracks start at 0s, one at 4s; refreshed at 10s, 14s and 20s, 24s
+        self.assertEqual(embedded, [2, 1, 2, 1, 2, 1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,340 @@
+"""
+Tests for vector index module
+"""
+
+import unittest
+import numpy as np
+import os
+import tempfile
+import time
+from vector_index import VectorIndex, EmbeddingMatrix
+
+def unit_vectors(n, dim=32, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+class TestVectorIndex(unittest.TestCase):
+    
+    def _check_index(self, index_type, n=1200, recall_at=1, **kwargs):
+        index = VectorIndex(32, index_type, metric="ip", nlist=4, **kwargs)
+        vectors = unit_vectors(n)
+        ids = np.arange(n) + 500
+        for start in range(0, n, 1000):
+            index.add(vectors[start:start + 1000], ids[start:start + 1000])
+        self.assertTrue(index.trained)
+        self.assertEqual(index.ntotal, n)
+        
+        _, found = index.search(vectors[:20], recall_at)
+        self.assertGreaterEqual((found == ids[:20, np.newaxis]).any(axis=1).mean(), 0.9)
+        
+        self.assertEqual(index.remove_ids(ids[:10]), 10)
+        self.assertEqual(index.ntotal, n - 10)
+        _, found = index.search(vectors[:10], 3)
+        self.assertFalse(np.isin(found, ids[:10]).any())
+        return index
+    
+    def test_flat(self):
+        """Test exact search with stable IDs"""
+        self._check_index("flat")
+    
+    def test_ivf_flat(self):
+        """Test that IVF trains once enough vectors arrived"""
+        index = VectorIndex(32, "ivf_flat", nlist=4)
+        index.add(unit_vectors(50), np.arange(50))
+        self.assertFalse(index.trained)
+        self._check_index("ivf_flat")
+    
+    def test_ivf_pq(self):
+        """Test product-quantized IVF search (PQ training needs ~10k vectors)"""
+        # Coarse 2-byte codes only rank the true neighbour near the top
+        self._check_index("ivf_pq", n=10000, recall_at=10, pq_m=2)
+    
+    def test_hnsw(self):
+        """Test HNSW search and removal by rebuild"""
+        self._check_index("hnsw")
+    
+    def test_retrain_keeps_vectors(self):
+        """Test that retraining after growth keeps every vector and ID"""
+        index = VectorIndex(32, "ivf_flat", nlist=2)
+        vectors = unit_vectors(2000, seed=1)
+        index.add(vectors[:100], np.arange(100))
+        trained_on = index.trained_on
+        index.add(vectors[100:], np.arange(100, 2000))
+        self.assertGreater(index.trained_on, trained_on)
+        self.assertEqual(index.ntotal, 2000)
+        np.testing.assert_allclose(index.reconstruct_batch([1999]), vectors[1999:2000], atol=1e-6)
+
+    def test_nlist_scales_with_vectors(self):
+        """Test that IVF uses about sqrt(N) clusters, so small indexes train too"""
+        index = VectorIndex(32, "ivf_flat")
+        vectors = unit_vectors(6100, seed=2)
+        index.add(vectors[:1520], np.arange(1520))
+        self.assertFalse(index.trained)
+        index.add(vectors[1520:1521], [1520])
+        self.assertEqual(index.stats()["nlist"], 39)
+        index.add(vectors[1521:], np.arange(1521, 6100))
+        self.assertEqual(index.stats()["nlist"], 78)
+        self.assertEqual(index.ntotal, 6100)
+
+    def test_search_params_and_reset(self):
+        """Test recall knobs and reset"""
+        index = VectorIndex(32, "hnsw", ef_search=16)
+        index.set_search_params(ef_search=128)
+        self.assertEqual(index.stats()["ef_search"], 128)
+        index.add(unit_vectors(10), np.arange(10))
+        index.reset()
+        self.assertEqual(index.ntotal, 0)
+    
+    def test_unknown_type(self):
+        """Test that a bad index type is rejected"""
+        with self.assertRaises(ValueError):
+            VectorIndex(32, "lsh")
+    
+    def test_search_restricted_to_ids(self):
+        """Test that an ID filter limits the candidates"""
+        index = VectorIndex(32, "flat", metric="ip")
+        vectors = unit_vectors(100)
+        index.add(vectors, np.arange(100))
+        _, found = index.search(vectors[:1], 3, ids=[50, 60, 70])
+        self.assertEqual(sorted(found[0].tolist()), [50, 60, 70])
+
+class TestEmbeddingMatrix(unittest.TestCase):
+    
+    def test_matches_exact_search(self):
+        """Test that top-k agrees with FAISS exact search across growth"""
+        matrix = EmbeddingMatrix(32, capacity=4)
+        reference = VectorIndex(32, "flat", metric="ip")
+        vectors = unit_vectors(500)
+        ids = np.arange(500) + 1000
+        for start in range(0, 500, 70):
+            matrix.add(vectors[start:start + 70], ids[start:start + 70])
+            reference.add(vectors[start:start + 70], ids[start:start + 70])
+        self.assertEqual(matrix.ntotal, 500)
+        
+        queries = unit_vectors(5, seed=1)
+        scores, found = matrix.search(queries, 10)
+        ref_scores, ref_found = reference.search(queries, 10)
+        np.testing.assert_array_equal(found, ref_found)
+        np.testing.assert_allclose(scores, ref_scores, atol=1e-5)
+    
+    def test_mask_and_padding(self):
+        """Test row masks, ID filters and padding when fewer rows qualify"""
+        matrix = EmbeddingMatrix(32)
+        vectors = unit_vectors(50)
+        matrix.add(vectors, np.arange(50))
+        mask = np.zeros(50, dtype=bool)
+        mask[[3, 7]] = True
+        scores, found = matrix.search(vectors[:1], 4, mask=mask)
+        self.assertEqual(sorted(found[0, :2].tolist()), [3, 7])
+        self.assertEqual(found[0, 2:].tolist(), [-1, -1])
+        self.assertTrue(np.isneginf(scores[0, 2:]).all())
+        
+        _, found = matrix.search(vectors[:1], 1, ids=[0, 9])
+        self.assertEqual(found[0, 0], 0)
+    
+    def test_remove_and_reconstruct(self):
+        """Test that removal compacts rows and keeps IDs attached to vectors"""
+        matrix = EmbeddingMatrix(32)
+        vectors = unit_vectors(20)
+        matrix.add(vectors, np.arange(20) * 2)
+        self.assertEqual(matrix.remove_ids([0, 10, 99]), 2)
+        self.assertEqual(matrix.ntotal, 18)
+        np.testing.assert_array_equal(matrix.reconstruct_batch([38, 2]), vectors[[19, 1]])
+        _, found = matrix.search(vectors[5:6], 1)
+        self.assertNotEqual(found[0, 0], 10)
+        self.assertNotIn(10, matrix.ids())
+        with self.assertRaises(KeyError):
+            matrix.reconstruct_batch([10])
+    
+    def test_write_read(self):
+        """Test saving in the flat VectorIndex format and loading back"""
+        matrix = EmbeddingMatrix(32)
+        vectors = unit_vectors(30)
+        matrix.add(vectors, np.arange(30) + 7)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "clip.faiss")
+            matrix.write(path)
+            loaded = EmbeddingMatrix(32)
+            loaded.read(path)
+            index = VectorIndex(32, "hnsw", metric="ip")
+            index.read(path)
+        self.assertEqual(loaded.ids().tolist(), list(range(7, 37)))
+        np.testing.assert_array_equal(loaded.reconstruct_batch([20]), vectors[13:14])
+        _, found = index.search(vectors[:1], 1)
+        self.assertEqual(found[0, 0], 7)
+
+    def test_read_maps_rows(self):
+        """Test that float32 snapshot rows are mapped until the matrix changes"""
+        matrix = EmbeddingMatrix(32)
+        vectors = unit_vectors(40)
+        matrix.add(vectors[:30], np.arange(30))
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "clip.faiss")
+            matrix.write(path)
+            loaded = EmbeddingMatrix(32)
+            loaded.read(path)
+            self.assertTrue(loaded.mapped)
+            self.assertTrue(loaded.matrix.flags.aligned)
+            self.assertEqual(loaded.stats()["memory_bytes"], 30 * 8)
+            _, found = loaded.search(vectors[4:5], 1)
+            self.assertEqual(found[0, 0], 4)
+
+            # Removing and adding rows copies them into private memory first
+            removed = EmbeddingMatrix(32)
+            removed.read(path)
+            self.assertEqual(removed.remove_ids([3]), 1)
+            self.assertFalse(removed.mapped)
+            loaded.add(vectors[30:], np.arange(30, 40))
+            self.assertFalse(loaded.mapped)
+            np.testing.assert_array_equal(loaded.reconstruct_batch([35, 2]), vectors[[35, 2]])
+
+            # Anything but a flat snapshot is decoded row by row
+            index = VectorIndex(32, "hnsw", metric="ip")
+            index.add(vectors, np.arange(40))
+            index.write(path)
+            loaded.read(path)
+            self.assertFalse(loaded.mapped)
+            self.assertEqual(loaded.ntotal, 40)
+
+            # A flat snapshot rewritten by a VectorIndex no longer matches the saved rows
+            index = VectorIndex(32, metric="ip")
+            index.add(vectors[::-1], np.arange(40))
+            index.write(path)
+            loaded.read(path)
+            self.assertFalse(loaded.mapped)
+            np.testing.assert_array_equal(loaded.reconstruct_batch([0]), vectors[[39]])
+
+    def test_mapped_search_speed(self):
+        """Test that searching mapped rows costs the same as searching rows in memory"""
+        def search_time(matrix, queries):
+            best = float("inf")
+            for _ in range(5):
+                start = time.perf_counter()
+                matrix.search(queries, 10)
+                best = min(best, time.perf_counter() - start)
+            return best
+
+        matrix = EmbeddingMatrix(256)
+        matrix.add(unit_vectors(20000, dim=256), np.arange(20000))
+        queries = unit_vectors(16, dim=256, seed=1)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "clip.faiss")
+            matrix.write(path)
+            loaded = EmbeddingMatrix(256)
+            loaded.read(path)
+            self.assertTrue(loaded.mapped)
+            np.testing.assert_array_equal(loaded.search(queries, 10)[1], matrix.search(queries, 10)[1])
+            # Unaligned rows fall off BLAS and are more than an order of magnitude slower
+            self.assertLess(search_time(loaded, queries), 4 * search_time(matrix, queries) + 0.005)
+            del loaded
+
+class TestCompressedStorage(unittest.TestCase):
+    
+    def _recall(self, matrix, vectors, k=5):
+        matrix.add(vectors, np.arange(len(vectors)))
+        queries = vectors[:20]
+        reference = EmbeddingMatrix(vectors.shape[1])
+        reference.add(vectors, np.arange(len(vectors)))
+        _, expected = reference.search(queries, k)
+        _, found = matrix.search(queries, k)
+        return np.mean([len(set(a) & set(b)) / k for a, b in zip(found, expected)])
+    
+    def test_scalar_storage(self):
+        """Test float16 and int8 rows shrink memory and keep the ranking"""
+        vectors = unit_vectors(300)
+        for storage, row_bytes in (("float16", 2 * 32 + 8), ("int8", 32 + 4 + 8)):
+            matrix = EmbeddingMatrix(32, storage=storage)
+            self.assertGreaterEqual(self._recall(matrix, vectors), 0.9)
+            self.assertEqual(matrix.stats()["bytes_per_vector"], row_bytes)
+    
+    def test_pq_storage_with_rerank(self):
+        """Test PQ codes after training, with exact re-ranking from disk"""
+        vectors = unit_vectors(10000, dim=16)
+        with tempfile.TemporaryDirectory() as folder:
+            matrix = EmbeddingMatrix(16, storage="pq", pq_m=4, rerank=50,
+                                     exact_path=os.path.join(folder, "exact.f32"))
+            matrix.add(vectors[:100], np.arange(100))
+            self.assertFalse(matrix.trained)
+            matrix.add(vectors[100:], np.arange(100, 10000))
+            self.assertTrue(matrix.trained)
+            self.assertEqual(matrix.stats()["bytes_per_vector"], 4 + 8 + 8)
+            
+            # Re-ranking returns exact scores and exact stored vectors
+            scores, found = matrix.search(vectors[:5], 1)
+            self.assertEqual(found[:, 0].tolist(), list(range(5)))
+            np.testing.assert_allclose(scores[:, 0], 1.0, atol=1e-5)
+            np.testing.assert_array_equal(matrix.reconstruct_batch([42]), vectors[42:43])
+            
+            # Removing most rows compacts the exact vector file
+            matrix.remove_ids(np.arange(9000))
+            self.assertEqual(os.path.getsize(os.path.join(folder, "exact.f32")), 1000 * 16 * 4)
+            np.testing.assert_array_equal(matrix.reconstruct_batch([9500]), vectors[9500:9501])
+
+    def test_pq_codebooks_sized_to_rows(self):
+        """Test that a small matrix trains narrow PQ codes and widens them as it grows"""
+        vectors = unit_vectors(3000, dim=16)
+        with tempfile.TemporaryDirectory() as folder:
+            matrix = EmbeddingMatrix(16, storage="pq", pq_m=4)
+            matrix.add(vectors[:623], np.arange(623))
+            self.assertFalse(matrix.trained)
+            matrix.add(vectors[623:700], np.arange(623, 700))
+            self.assertTrue(matrix.trained)
+            # 4 sub-quantizers of 4 bits pack into 2 bytes
+            self.assertEqual(matrix.stats()["bytes_per_vector"], 2 + 8)
+
+            path = os.path.join(folder, "clip.faiss")
+            matrix.write(path)
+            loaded = EmbeddingMatrix(16, storage="pq", pq_m=4)
+            loaded.read(path)
+            self.assertTrue(loaded.trained)
+            np.testing.assert_array_equal(loaded.reconstruct_batch([5]), matrix.reconstruct_batch([5]))
+
+            # Growing 4x retrains with log2(3000 / 39) = 6 bits
+            loaded.add(vectors[700:], np.arange(700, 3000))
+            self.assertEqual(loaded.trained_on, 3000)
+            self.assertEqual(loaded.stats()["bytes_per_vector"], 3 + 8)
+            _, found = loaded.search(vectors[:50], 5)
+            self.assertGreaterEqual((found == np.arange(50)[:, np.newaxis]).any(axis=1).mean(), 0.9)
+
+    def test_compressed_write_read(self):
+        """Test that codes, scales, codebooks and exact rows load without re-encoding"""
+        vectors = unit_vectors(10000, dim=16)
+        with tempfile.TemporaryDirectory() as folder:
+            exact_path = os.path.join(folder, "exact.f32")
+            path = os.path.join(folder, "clip.faiss")
+            matrix = EmbeddingMatrix(16, storage="pq", pq_m=4, rerank=50, exact_path=exact_path)
+            matrix.add(vectors, np.arange(10000))
+            matrix.write(path)
+            # A torn exact row written after the snapshot is cut off
+            with open(exact_path, "ab") as f:
+                f.write(b"\0" * 10)
+
+            loaded = EmbeddingMatrix(16, storage="pq", pq_m=4, rerank=50, exact_path=exact_path)
+            loaded.read(path)
+            self.assertTrue(loaded.trained)
+            self.assertEqual(os.path.getsize(exact_path), 10000 * 16 * 4)
+            np.testing.assert_array_equal(loaded.matrix[:10000], matrix.matrix[:10000])
+            scores, found = loaded.search(vectors[:5], 1)
+            self.assertEqual(found[:, 0].tolist(), list(range(5)))
+            loaded.add(vectors[:1], [10000])
+            np.testing.assert_array_equal(loaded.reconstruct_batch([10000, 7]), vectors[[0, 7]])
+
+            # int8 scales round-trip; a different configuration re-encodes instead
+            matrix = EmbeddingMatrix(16, storage="int8")
+            matrix.add(vectors[:100], np.arange(100))
+            matrix.write(path)
+            loaded = EmbeddingMatrix(16, storage="int8")
+            loaded.read(path)
+            np.testing.assert_array_equal(loaded.reconstruct_batch([3]), matrix.reconstruct_batch([3]))
+            loaded = EmbeddingMatrix(16, storage="float16")
+            loaded.read(path)
+            self.assertEqual(loaded.ntotal, 100)
+            self.assertEqual(loaded.matrix.dtype, np.float16)
+
+    def test_unknown_storage(self):
+        """Test that a bad storage type is rejected"""
+        with self.assertRaises(ValueError):
+            EmbeddingMatrix(32, storage="bf16")
+
+if __name__ == '__main__':
+    unittest.main()
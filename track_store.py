@@ -0,0 +1,169 @@
+"""
+Track store
+Per-track time intervals and trajectories, indexed by track ID
+"""
+
+import bisect
+import threading
+
+from config import TRACK_INTERVAL_GAP_SECONDS
+
+tracks = {}
+
+# Guards the store against concurrent ingestion jobs and queries
+_lock = threading.RLock()
+
+
+def record_detections(video_filename, timestamp, detections, gap=TRACK_INTERVAL_GAP_SECONDS):
+    """
+    Record where every tracked detection of a frame was seen
+
+    Frames of one video arrive in timestamp order, so each track's sightings
+    stay sorted and intervals are extended or started in place.
+
+    Args:
+        video_filename: Video the frame belongs to
+        timestamp: Frame timestamp in seconds
+        detections: Detections with 'track_id', 'label' and 'box' keys
+        gap: Longest absence (seconds) that still counts as one continuous appearance
+    """
+    with _lock:
+        for det in detections:
+            track_id = det.get("track_id")
+            if track_id is None:
+                continue
+
+            track = tracks.get(track_id)
+            if track is None:
+                track = tracks[track_id] = {
+                    "track_id": track_id,
+                    "label": det["label"],
+                    "video_filename": video_filename,
+                    "intervals": [],
+                    "timestamps": [],
+                    "boxes": []
+                }
+            elif track["timestamps"] and track["timestamps"][-1] == timestamp:
+                # Same frame seen twice (e.g. an overlapping duplicate box)
+                continue
+
+            intervals = track["intervals"]
+            if intervals and timestamp - intervals[-1][1] <= gap:
+                intervals[-1][1] = timestamp
+            else:
+                intervals.append([timestamp, timestamp])
+            track["timestamps"].append(timestamp)
+            track["boxes"].append([round(float(v), 1) for v in det["box"][:4]])
+
+
+def restore_tracks(frames):
+    """
+    Rebuild the tracks of persisted frame entries
+
+    Args:
+        frames: Frame entries with 'video_filename', 'timestamp' and
+            'detections', each video's frames in timestamp order
+
+    Returns:
+        int: Number of tracks in the store
+    """
+    for frame in frames:
+        record_detections(frame.get("video_filename"), frame.get("timestamp", 0), frame.get("detections", []))
+    with _lock:
+        return len(tracks)
+
+
+def _summary(track):
+    return {
+        "track_id": track["track_id"],
+        "label": track["label"],
+        "video_filename": track["video_filename"],
+        "first_seen": track["timestamps"][0],
+        "last_seen": track["timestamps"][-1],
+        "appearances": len(track["intervals"]),
+        "sightings": len(track["timestamps"])
+    }
+
+
+def list_tracks(video_filename=None, label=None):
+    """
+    List tracks, optionally for one video or object class
+
+    Returns:
+        list: Track summaries ordered by first appearance
+    """
+    with _lock:
+        summaries = [
+            _summary(track) for track in tracks.values()
+            if (video_filename is None or track["video_filename"] == video_filename)
+            and (label is None or track["label"] == label)
+        ]
+    summaries.sort(key=lambda s: (s["video_filename"], s["first_seen"]))
+    return summaries
+
+
+def get_timeline(track_id):
+    """
+    Every time a track was in view
+
+    Args:
+        track_id: Track ID (e.g., "P3")
+
+    Returns:
+        dict: Track summary with its [start, end] intervals, or None if unknown
+    """
+    with _lock:
+        track = tracks.get(track_id)
+        if track is None:
+            return None
+        timeline = _summary(track)
+        timeline["intervals"] = [
+            {"start": start, "end": end, "duration": end - start}
+            for start, end in track["intervals"]
+        ]
+    return timeline
+
+
+def get_trajectory(track_id, start=None, end=None):
+    """
+    Box positions of a track over time
+
+    Args:
+        track_id: Track ID (e.g., "P3")
+        start: Optional start timestamp in seconds
+        end: Optional end timestamp in seconds
+
+    Returns:
+        dict: Track summary with timestamped boxes, or None if unknown
+    """
+    with _lock:
+        track = tracks.get(track_id)
+        if track is None:
+            return None
+        timestamps = track["timestamps"]
+        lo = 0 if start is None else bisect.bisect_left(timestamps, start)
+        hi = len(timestamps) if end is None else bisect.bisect_right(timestamps, end)
+        trajectory = _summary(track)
+        trajectory["points"] = [
+            {"timestamp": timestamps[i], "box": track["boxes"][i]}
+            for i in range(lo, hi)
+        ]
+    return trajectory
+
+
+def remove_video_tracks(video_filename):
+    """
+    Remove all tracks recorded for a specific video
+
+    Args:
+        video_filename: Name of the video file to remove
+    """
+    with _lock:
+        for track_id in [t for t, track in tracks.items() if track["video_filename"] == video_filename]:
+            del tracks[track_id]
+
+
+def clear_tracks():
+    """Clear all stored tracks"""
+    with _lock:
+        tracks.clear()
@@ -1,61 +1,262 @@
+"""
+Multi-object tracking
+SORT-style tracker: constant-velocity Kalman filter per box, IoU cost matrix
+and Hungarian assignment between tracks and detections
+"""
+
+import threading
+
 import numpy as np
-from sentence_transformers import SentenceTransformer
-import cv2
+from scipy.optimize import linear_sum_assignment
+
+from config import TRACK_IOU_THRESHOLD, TRACK_MAX_AGE, REID_REFRESH_SECONDS
+
+# Kalman model over [cx, cy, area, aspect, vx, vy, v_area]; aspect ratio is constant
+_F = np.eye(7)
+_F[0, 4] = _F[1, 5] = _F[2, 6] = 1.0
+_Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001])
+_R = np.diag([1.0, 1.0, 10.0, 10.0])
+_P0 = np.diag([10.0, 10.0, 10.0, 10.0, 10000.0, 10000.0, 10000.0])
+
+# Track IDs are unique across videos: "P1", "P2", ... for people, "T1", ... for other objects
+_issued_ids = {}
+_id_lock = threading.Lock()
+
+
+def _next_track_id(label):
+    prefix = "P" if label == "person" else "T"
+    with _id_lock:
+        _issued_ids[prefix] = _issued_ids.get(prefix, 0) + 1
+        return f"{prefix}{_issued_ids[prefix]}"
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
 
-tracked = []
+def _boxes_to_measurements(boxes):
+    """[x1, y1, x2, y2] rows -> [cx, cy, area, aspect] rows"""
+    w = boxes[:, 2] - boxes[:, 0]
+    h = np.maximum(boxes[:, 3] - boxes[:, 1], 1e-6)
+    return np.stack([boxes[:, 0] + w / 2, boxes[:, 1] + h / 2, w * h, w / h], axis=1)
 
-def assign_id(image_path, similarity_threshold=0.85):
+
+def _states_to_boxes(states):
+    """Kalman states -> [x1, y1, x2, y2] rows"""
+    area = np.maximum(states[:, 2], 0)
+    w = np.sqrt(area * np.maximum(states[:, 3], 0))
+    h = np.where(w > 0, area / np.maximum(w, 1e-6), 0)
+    cx, cy = states[:, 0], states[:, 1]
+    return np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+
+def iou_matrix(boxes_a, boxes_b):
     """
-    Assign a person ID based on image similarity (basic Re-ID simulation)
-    
+    Pairwise IoU between two sets of boxes
+
     Args:
-        image_path: Path to the person image
-        similarity_threshold: Minimum similarity to match existing person
-    
+        boxes_a: (N, 4) array of [x1, y1, x2, y2]
+        boxes_b: (M, 4) array of [x1, y1, x2, y2]
+
     Returns:
-        str: Person ID (e.g., "P1", "P2")
-    """
-    try:
-        # Read and encode image
-        img = cv2.imread(image_path)
-        if img is None:
-            return f"P{len(tracked)+1}"
-        
-        # Use image path as simple feature (in production, use proper Re-ID model)
-        vector = model.encode(image_path)
-        
-        # Normalize vector for cosine similarity
-        vector_norm = vector / np.linalg.norm(vector)
-        
-        # Check against existing tracked persons
-        for person in tracked:
-            person_vector_norm = person["embedding"] / np.linalg.norm(person["embedding"])
-            similarity = np.dot(person_vector_norm, vector_norm)
-            
-            if similarity > similarity_threshold:
-                person["last_seen"] = image_path
-                return person["id"]
-        
-        # New person detected
-        new_id = f"P{len(tracked)+1}"
-        tracked.append({
-            "id": new_id,
-            "embedding": vector,
-            "first_seen": image_path,
-            "last_seen": image_path
-        })
-        return new_id
-    except Exception as e:
-        print(f"Error in person tracking: {e}")
-        return f"P{len(tracked)+1}"
+        numpy.ndarray: (N, M) IoU values
+    """
+    a = boxes_a[:, np.newaxis, :]
+    b = boxes_b[np.newaxis, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+class MultiObjectTracker:
+    """
+    Tracks detections across the processed frames of one video
+
+    All live tracks are kept as stacked Kalman states, so prediction and
+    correction are a handful of array operations per frame. Tracks that go
+    unmatched for more than max_age frames are dropped, keeping the cost
+    matrix as small as the number of objects currently in view.
+
+    With a re-ID gallery, dropped person tracks are remembered by appearance
+    and a person who comes back gets their old track ID instead of a new one.
+    Embedding crops is the expensive part, so only people starting a new
+    track are embedded, plus tracked people whose appearance is older than
+    reid_refresh_seconds.
+    """
+
+    def __init__(self, iou_threshold=TRACK_IOU_THRESHOLD, max_age=TRACK_MAX_AGE, reid=None,
+                 reid_refresh_seconds=REID_REFRESH_SECONDS):
+        """
+        Args:
+            iou_threshold: Minimum IoU between a predicted track and a detection to match
+            max_age: Consecutive frames a track may go unmatched before it is dropped
+            reid: Optional ReIDGallery used to re-identify people across gaps
+            reid_refresh_seconds: Video time after which a tracked person's crop is
+                embedded again (0 = only when their track starts)
+        """
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.reid = reid
+        self.reid_refresh_seconds = reid_refresh_seconds
+        self._embedded_at = {}  # track_id -> video time of its last embedded crop
+        self.frames = 0
+        self.states = np.zeros((0, 7))
+        self.covariances = np.zeros((0, 7, 7))
+        self.misses = np.zeros(0, dtype=int)
+        self.ids = []
+        self.labels = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _predict(self):
+        # Keep the predicted area positive
+        shrinking = self.states[:, 2] + self.states[:, 6] <= 0
+        self.states[shrinking, 6] = 0
+        self.states = self.states @ _F.T
+        self.covariances = _F @ self.covariances @ _F.T + _Q
+
+    def _correct(self, track_idx, measurements):
+        P = self.covariances[track_idx]
+        S = P[:, :4, :4] + _R
+        K = P[:, :, :4] @ np.linalg.inv(S)
+        residual = measurements - self.states[track_idx, :4]
+        self.states[track_idx] += (K @ residual[:, :, np.newaxis])[:, :, 0]
+        self.covariances[track_idx] = P - K @ P[:, :4, :]
+
+    def _associate(self, boxes, labels):
+        """Hungarian matching on IoU between predicted tracks and detections of the same label"""
+        if not len(self.ids) or not len(boxes):
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+
+        iou = iou_matrix(_states_to_boxes(self.states), boxes)
+        iou[np.array(self.labels)[:, np.newaxis] != np.array(labels)[np.newaxis, :]] = 0
+        track_idx, det_idx = linear_sum_assignment(-iou)
+        keep = iou[track_idx, det_idx] >= self.iou_threshold
+        return track_idx[keep], det_idx[keep]
+
+    def update(self, detections, frame=None, timestamp=None):
+        """
+        Advance the tracker by one frame and attach track IDs
+
+        Args:
+            detections: Detections for the frame (dicts with 'label' and 'box')
+            frame: BGR frame the detections come from; person crops are
+                embedded for re-identification when given
+            timestamp: Video time of the frame (defaults to the frame count)
+
+        Returns:
+            list: The same detections, each with a 'track_id' key
+        """
+        self.frames += 1
+        if timestamp is None:
+            timestamp = self.frames
+
+        boxes = np.array([d["box"][:4] for d in detections], dtype=np.float64).reshape(-1, 4)
+        labels = [d["label"] for d in detections]
+
+        if len(self.ids):
+            self._predict()
+        track_idx, det_idx = self._associate(boxes, labels)
+
+        self.misses += 1
+        if len(track_idx):
+            self._correct(track_idx, _boxes_to_measurements(boxes[det_idx]))
+            self.misses[track_idx] = 0
+            for t, d in zip(track_idx, det_idx):
+                detections[d]["track_id"] = self.ids[t]
+
+        # Embed the person crops that start a track or are due a refresh, in one batch
+        embeddings = {}
+        if self.reid is not None and frame is not None:
+            tracked_ids = {d: self.ids[t] for t, d in zip(track_idx, det_idx)}
+            people = [i for i, label in enumerate(labels)
+                      if label == "person" and self._embedding_due(tracked_ids.get(i), timestamp)]
+            if people:
+                vectors = self.reid.embed(frame, boxes[people])
+                if vectors is not None:
+                    embeddings = dict(zip(people, vectors))
+
+        # Start tracks for unmatched detections, reviving re-identified people
+        new_idx = np.setdiff1d(np.arange(len(detections)), det_idx)
+        revived = [None] * len(new_idx)
+        if embeddings and len(new_idx):
+            revived = self.reid.match([embeddings.get(d) for d in new_idx], timestamp)
+        if len(new_idx):
+            new_states = np.zeros((len(new_idx), 7))
+            new_states[:, :4] = _boxes_to_measurements(boxes[new_idx])
+            self.states = np.concatenate([self.states, new_states])
+            self.covariances = np.concatenate([self.covariances, np.repeat(_P0[np.newaxis], len(new_idx), axis=0)])
+            self.misses = np.concatenate([self.misses, np.zeros(len(new_idx), dtype=int)])
+            for d, revived_id in zip(new_idx, revived):
+                track_id = revived_id or _next_track_id(labels[d])
+                detections[d]["track_id"] = track_id
+                self.ids.append(track_id)
+                self.labels.append(labels[d])
+
+        for d, embedding in embeddings.items():
+            self.reid.observe(detections[d]["track_id"], embedding)
+            if embedding is not None:
+                self._embedded_at[detections[d]["track_id"]] = timestamp
+
+        # Drop tracks that have been lost for too long
+        alive = self.misses <= self.max_age
+        if not alive.all():
+            if self.reid is not None:
+                for track_id, keep in zip(self.ids, alive):
+                    if not keep:
+                        self.reid.retire(track_id, timestamp)
+                        self._embedded_at.pop(track_id, None)
+            self.states = self.states[alive]
+            self.covariances = self.covariances[alive]
+            self.misses = self.misses[alive]
+            self.ids = [track_id for track_id, keep in zip(self.ids, alive) if keep]
+            self.labels = [label for label, keep in zip(self.labels, alive) if keep]
+
+        return detections
+
+    def _embedding_due(self, track_id, timestamp):
+        """Whether a person's crop should be embedded (track_id is None for a new track)"""
+        embedded_at = self._embedded_at.get(track_id)
+        if embedded_at is None:
+            return True
+        return self.reid_refresh_seconds > 0 and timestamp - embedded_at >= self.reid_refresh_seconds
+
+
+def primary_person_id(detections):
+    """
+    Frame-level person ID: the track ID of the most confident person
+
+    Returns:
+        str: Person ID (e.g., "P1", "P2"), or None if no person is tracked
+    """
+    people = [d for d in detections if d["label"] == "person" and "track_id" in d]
+    if not people:
+        return None
+    return max(people, key=lambda d: d.get("confidence", 0))["track_id"]
+
 
 def get_tracked_count():
     """Return the number of unique persons tracked"""
-    return len(tracked)
+    with _id_lock:
+        return _issued_ids.get("P", 0)
+
+
+def restore_track_ids(track_ids):
+    """
+    Continue numbering after restored track IDs, so new tracks never reuse them
+
+    Args:
+        track_ids: Track IDs found in persisted frames (e.g., "P3", "T12")
+    """
+    with _id_lock:
+        for track_id in track_ids:
+            prefix, number = track_id[:1], track_id[1:]
+            if prefix in ("P", "T") and number.isdigit():
+                _issued_ids[prefix] = max(_issued_ids.get(prefix, 0), int(number))
+
 
 def reset_tracking():
     """Clear all tracked persons"""
-    global tracked
-    tracked = []
+    with _id_lock:
+        _issued_ids.clear()
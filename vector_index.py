@@ -0,0 +1,799 @@
+"""
+Configurable vector index
+Flat, IVF-Flat, IVF-PQ or HNSW search over stable integer IDs, with training and rebuilds managed
+"""
+
+import os
+
+import faiss
+import numpy as np
+
+from config import (
+    ANN_NLIST, ANN_NPROBE, ANN_PQ_M, ANN_HNSW_M, ANN_EF_SEARCH,
+    ANN_TRAIN_POINTS_PER_LIST, ANN_RETRAIN_GROWTH
+)
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+STORAGE_TYPES = ("float32", "float16", "int8", "pq")
+
+# PQ codebooks have 256 centroids per sub-quantizer and need matching training data
+_PQ_MIN_TRAIN = 256 * ANN_TRAIN_POINTS_PER_LIST
+
+# Smallest EmbeddingMatrix PQ codebooks: 2^4 = 16 centroids per sub-quantizer
+_PQ_MIN_NBITS = 4
+
+# Compressed rows are decoded this many at a time while scoring (bounds temporary memory)
+_DECODE_BLOCK = 16384
+
+# Byte offset of the float32 rows in a flat IndexIDMap2 file: ID map and flat
+# index fourccs and headers, then the row count prefix (the IDs follow the rows)
+_FLAT_ROWS_OFFSET = 82
+
+
+def codes_path(index_path):
+    """File next to a snapshot holding the EmbeddingMatrix rows in their stored encoding"""
+    return os.path.splitext(index_path)[0] + ".codes.npz"
+
+
+def rows_path(index_path):
+    """File next to a snapshot holding float32 EmbeddingMatrix rows, aligned for memory-mapping"""
+    return os.path.splitext(index_path)[0] + ".rows.npy"
+
+
+def _flat_rows(path, dim):
+    """
+    Count the rows of a flat IndexIDMap2 file written by FAISS
+
+    Returns:
+        int: Number of rows, or None if the file holds any other index
+    """
+    with open(path, "rb") as f:
+        header = f.read(_FLAT_ROWS_OFFSET)
+    rows, rest = divmod(os.path.getsize(path) - _FLAT_ROWS_OFFSET - 8, 4 * dim + 8)
+    if rest or len(header) < _FLAT_ROWS_OFFSET or header[:4] != b"IxM2" or header[37:41] not in (b"IxFI", b"IxF2"):
+        return None
+    if np.frombuffer(header, np.int32, 1, 4)[0] != dim or np.frombuffer(header, np.uint64, 1, 74)[0] != rows * dim:
+        return None
+    return rows
+
+
+class VectorIndex:
+    """
+    FAISS index wrapper with stable IDs for every index type
+
+    IVF indexes need training data, so vectors are kept in an exact flat
+    index until enough have arrived; the IVF index is then trained on them
+    with about sqrt(N) coarse clusters (capped at nlist), so small indexes
+    such as one video's shard get an IVF index sized to them. It is
+    retrained on the current vectors whenever the corpus has grown by
+    ANN_RETRAIN_GROWTH since the last training, so coarse centroids (and
+    their number) keep up with the data at amortized constant cost per insert. Index types without
+    removal support (HNSW) are rebuilt from their stored vectors on delete.
+
+    Not thread-safe: callers hold their own lock around every call.
+    """
+
+    def __init__(self, dim, index_type="flat", metric="l2", nlist=ANN_NLIST, nprobe=ANN_NPROBE,
+                 pq_m=ANN_PQ_M, hnsw_m=ANN_HNSW_M, ef_search=ANN_EF_SEARCH):
+        """
+        Args:
+            dim: Vector dimension
+            index_type: "flat", "ivf_flat", "ivf_pq" or "hnsw"
+            metric: "l2" (distances, smaller is better) or "ip" (inner product, larger is better)
+            nlist: Maximum IVF coarse clusters (about sqrt(N) are used)
+            nprobe: IVF clusters visited per query (recall/latency knob)
+            pq_m: PQ sub-quantizers for ivf_pq (must divide dim)
+            hnsw_m: HNSW graph degree
+            ef_search: HNSW candidate list size per query (recall/latency knob)
+        """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}'. Use one of {', '.join(INDEX_TYPES)}")
+        self.dim = dim
+        self.index_type = index_type
+        self.metric = faiss.METRIC_INNER_PRODUCT if metric == "ip" else faiss.METRIC_L2
+        self.max_nlist = nlist
+        self.nprobe = nprobe
+        self.pq_m = pq_m
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.needs_training = index_type.startswith("ivf")
+        self.train_size = 0
+        if self.needs_training:
+            # Enough points for sqrt(N) clusters (or for the cap, if smaller)
+            self.train_size = max(min(nlist, ANN_TRAIN_POINTS_PER_LIST) * ANN_TRAIN_POINTS_PER_LIST,
+                                  _PQ_MIN_TRAIN if index_type == "ivf_pq" else 0)
+        self.trained_on = 0
+        self.reset()
+
+    def _factory_string(self, trained):
+        # IVF indexes store IDs themselves; flat and HNSW get an ID map
+        if not trained or self.index_type == "flat":
+            return "IDMap2,Flat"
+        if self.index_type == "hnsw":
+            return f"IDMap2,HNSW{self.hnsw_m}"
+        if self.index_type == "ivf_flat":
+            return f"IVF{self.nlist},Flat"
+        return f"IVF{self.nlist},PQ{self.pq_m}"
+
+    def _new_index(self, trained=True):
+        index = faiss.index_factory(self.dim, self._factory_string(trained), self.metric)
+        if isinstance(index, faiss.IndexIVF):
+            # Hashtable direct map supports both reconstruct (retraining) and remove_ids
+            index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        if isinstance(index, faiss.IndexIVFPQ):
+            # Polysemous codes are only used by Hamming-filtered search, which we never run
+            index.do_polysemous_training = False
+        self._apply_search_params(index)
+        return index
+
+    def _apply_search_params(self, index):
+        if isinstance(index, faiss.IndexIVF):
+            index.nprobe = self.nprobe
+            return
+        inner = faiss.downcast_index(index.index)
+        if isinstance(inner, faiss.IndexHNSW):
+            inner.hnsw.efSearch = self.ef_search
+
+    @property
+    def ntotal(self):
+        return self.index.ntotal
+
+    @property
+    def trained(self):
+        """Whether the configured index type is in use (IVF indexes start out flat)"""
+        return not self.needs_training or self.trained_on > 0
+
+    def reset(self):
+        """Drop every vector (IVF indexes go back to the untrained flat stage)"""
+        self.trained_on = 0
+        self.nlist = 0
+        self.index = self._new_index(trained=not self.needs_training)
+
+    def set_search_params(self, nprobe=None, ef_search=None):
+        """Change the recall/latency knobs of the live index"""
+        if nprobe is not None:
+            self.nprobe = nprobe
+        if ef_search is not None:
+            self.ef_search = ef_search
+        self._apply_search_params(self.index)
+
+    def add(self, vectors, ids):
+        """
+        Add vectors under the given IDs
+
+        Args:
+            vectors: (N, dim) float32 array
+            ids: N integer IDs
+        """
+        self.index.add_with_ids(np.ascontiguousarray(vectors, dtype=np.float32),
+                                np.asarray(ids, dtype=np.int64))
+        if self.needs_training:
+            if self.trained_on == 0 and self.ntotal >= self.train_size:
+                self._train()
+            elif self.trained_on and self.ntotal >= self.trained_on * ANN_RETRAIN_GROWTH:
+                self._train()
+
+    def ids(self):
+        """Return the IDs of every stored vector"""
+        return self._all_ids()
+
+    def _all_ids(self):
+        if isinstance(self.index, faiss.IndexIVF):
+            lists = self.index.invlists
+            return np.concatenate([
+                faiss.rev_swig_ptr(lists.get_ids(l), lists.list_size(l)).copy()
+                for l in range(self.index.nlist)
+            ]).astype(np.int64)
+        return faiss.vector_to_array(self.index.id_map).astype(np.int64)
+
+    def _train(self):
+        """(Re)train the IVF index on the current vectors and move them into it"""
+        ids = self._all_ids()
+        vectors = self.index.reconstruct_batch(ids)
+        self.nlist = max(1, min(self.max_nlist, int(np.sqrt(len(ids)))))
+        # Training cost is bounded by a sample; every vector is still re-added
+        sample_size = max(self.train_size, self.nlist * 256)
+        if len(vectors) > sample_size:
+            sample = vectors[np.random.default_rng(0).choice(len(vectors), sample_size, replace=False)]
+        else:
+            sample = vectors
+
+        index = self._new_index(trained=True)
+        index.train(sample)
+        index.add_with_ids(vectors, ids)
+        self.index = index
+        self.trained_on = len(ids)
+
+    def search(self, queries, k, ids=None):
+        """
+        Find the k nearest vectors
+
+        Args:
+            queries: (Q, dim) float32 array
+            k: Neighbours per query
+            ids: Only consider vectors with these IDs
+
+        Returns:
+            tuple: (scores, ids) arrays of shape (Q, k); missing results have ID -1
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        if ids is None:
+            return self.index.search(queries, k)
+        return self.index.search(queries, k, params=self._search_params(ids))
+
+    def _search_params(self, ids):
+        """Search parameters restricted to the given IDs (keeping the recall knobs)"""
+        selector = faiss.IDSelectorBatch(np.asarray(ids, dtype=np.int64))
+        if isinstance(self.index, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=self.nprobe)
+        if isinstance(faiss.downcast_index(self.index.index), faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=self.ef_search)
+        return faiss.SearchParameters(sel=selector)
+
+    def reconstruct_batch(self, ids):
+        """Return the stored vectors for the given IDs (approximate for PQ)"""
+        return self.index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
+
+    def remove_ids(self, ids):
+        """
+        Remove vectors by ID
+
+        Args:
+            ids: Integer IDs to remove
+
+        Returns:
+            int: Number of vectors removed
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return 0
+        try:
+            return self.index.remove_ids(ids)
+        except RuntimeError:
+            # Index type without removal support - rebuild from the stored vectors
+            before = self.ntotal
+            keep = np.setdiff1d(self._all_ids(), ids)
+            vectors = self.index.reconstruct_batch(keep) if len(keep) else None
+            self.index = self._new_index(trained=True)
+            if vectors is not None:
+                self.index.add_with_ids(vectors, keep)
+            return before - self.ntotal
+
+    def write(self, path):
+        """Save the index to a file (replaced atomically)"""
+        faiss.write_index(self.index, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    def read(self, path):
+        """
+        Replace the index with one saved by write()
+
+        Flat and HNSW indexes are memory-mapped, so loading is near-instant and
+        the pages are shared between processes until new vectors are added.
+        IVF indexes are read into memory because mapped inverted lists are read-only.
+        A file saved under a different index type is migrated to the configured one.
+        """
+        index = faiss.read_index(path, 0 if self.needs_training else faiss.IO_FLAG_MMAP)
+        if isinstance(index, faiss.IndexIVF):
+            index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        self._apply_search_params(index)
+        self.index = index
+        self.trained_on = index.ntotal if isinstance(index, faiss.IndexIVF) else 0
+        self.nlist = index.nlist if isinstance(index, faiss.IndexIVF) else 0
+
+        if not self._matches_config(index):
+            ids = self._all_ids()
+            vectors = self.index.reconstruct_batch(ids) if len(ids) else None
+            self.reset()
+            if vectors is not None:
+                self.add(vectors, ids)
+
+    def _matches_config(self, index):
+        if self.needs_training:
+            ivf_type = faiss.IndexIVFPQ if self.index_type == "ivf_pq" else faiss.IndexIVFFlat
+            # An untrained IVF index is still in its flat stage
+            return isinstance(index, ivf_type) or (
+                not isinstance(index, faiss.IndexIVF)
+                and isinstance(faiss.downcast_index(index.index), faiss.IndexFlat)
+            )
+        if isinstance(index, faiss.IndexIVF):
+            return False
+        inner = faiss.downcast_index(index.index)
+        if self.index_type == "hnsw":
+            return isinstance(inner, faiss.IndexHNSW)
+        return isinstance(inner, faiss.IndexFlat)
+
+    def _bytes_per_vector(self):
+        """Approximate memory per stored vector: code plus ID (plus graph links for HNSW)"""
+        if isinstance(self.index, faiss.IndexIVF):
+            return self.index.code_size + 8
+        inner = faiss.downcast_index(self.index.index)
+        if isinstance(inner, faiss.IndexHNSW):
+            # Level 0 holds 2*M neighbours; upper levels add little on average
+            return faiss.downcast_index(inner.storage).code_size + 2 * self.hnsw_m * 4 + 8
+        return inner.code_size + 8
+
+    def stats(self):
+        """Describe the index configuration and state"""
+        stats = {
+            "type": self.index_type,
+            "vectors": self.ntotal,
+            "trained": self.trained,
+            "bytes_per_vector": self._bytes_per_vector()
+        }
+        if self.needs_training:
+            stats.update(nlist=self.nlist, max_nlist=self.max_nlist, nprobe=self.nprobe, train_size=self.train_size)
+        elif self.index_type == "hnsw":
+            stats.update(hnsw_m=self.hnsw_m, ef_search=self.ef_search)
+        return stats
+
+
+class EmbeddingMatrix:
+    """
+    Inner-product search over one contiguous, growable matrix of (optionally compressed) rows
+
+    Used for the flat CLIP index: a query is a single matrix-vector product
+    followed by an argpartition top-k, with an optional row mask for
+    filtering. Rows are preallocated and the capacity doubles when full, so
+    appends are amortized O(1). Exposes the same interface as VectorIndex and
+    saves in the same format as a flat VectorIndex, so the two stay
+    interchangeable on disk.
+
+    Rows can be stored as float16 (half the memory), int8 with a per-row
+    scale (a quarter) or product-quantization codes (pq_m bytes), and are
+    decoded block by block while scoring. PQ codebooks need training data,
+    so rows stay float32 until enough have arrived. Like IVF clusters, the
+    codebooks are sized to the rows at hand: 2^nbits centroids per
+    sub-quantizer with nbits from 4 (624 rows) up to 8, retrained with more
+    bits whenever the matrix has grown by ANN_RETRAIN_GROWTH, so one video's
+    shard is compressed too. Float32 rows loaded from
+    a snapshot are memory-mapped from an aligned copy saved next to it (see
+    rows_path()), so they cost no private memory, are shared between
+    processes until the matrix is modified, and score at the same BLAS speed
+    as rows in memory. When exact_path is set,
+    the original float32 vectors are also appended to that file and the top
+    rerank candidates of each query are re-scored exactly from it, so memory
+    only holds the codes while the final ranking stays exact.
+
+    Not thread-safe: callers hold their own lock around every call.
+    """
+
+    index_type = "flat"
+
+    def __init__(self, dim, capacity=1024, storage="float32", pq_m=ANN_PQ_M, rerank=0, exact_path=None):
+        """
+        Args:
+            dim: Vector dimension
+            capacity: Rows preallocated up front
+            storage: "float32", "float16", "int8" or "pq"
+            pq_m: PQ sub-quantizers (bytes per row) for pq storage (must divide dim)
+            rerank: Candidates re-scored with exact vectors per query (needs exact_path)
+            exact_path: File keeping the original float32 vectors for re-ranking
+        """
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"Unknown storage '{storage}'. Use one of {', '.join(STORAGE_TYPES)}")
+        self.dim = dim
+        self.initial_capacity = capacity
+        self.storage = storage
+        self.pq_m = pq_m
+        self.rerank = rerank
+        # Float32 rows are exact already
+        self.exact_path = exact_path if storage != "float32" else None
+        self.train_size = 2 ** _PQ_MIN_NBITS * ANN_TRAIN_POINTS_PER_LIST if storage == "pq" else 0
+        self._allocate()
+
+    @property
+    def ntotal(self):
+        return self._size
+
+    @property
+    def trained(self):
+        """Whether rows are stored in the configured encoding (PQ starts out float32)"""
+        return self.storage != "pq" or self._pq is not None
+
+    @property
+    def _compressed(self):
+        return self.storage != "float32" and self.trained
+
+    def reset(self):
+        """Drop every vector and release the grown buffers"""
+        if self.exact_path and os.path.exists(self.exact_path):
+            os.remove(self.exact_path)
+        self._allocate()
+
+    def _allocate(self):
+        self._pq = None
+        self.trained_on = 0
+        self._size = 0
+        capacity = self.initial_capacity
+        if self.storage == "float16":
+            self.matrix = np.empty((capacity, self.dim), dtype=np.float16)
+        elif self.storage == "int8":
+            self.matrix = np.empty((capacity, self.dim), dtype=np.int8)
+        else:
+            self.matrix = np.empty((capacity, self.dim), dtype=np.float32)
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._scales = np.empty(capacity, dtype=np.float32) if self.storage == "int8" else None
+        self._exact_rows = np.empty(capacity, dtype=np.int64) if self.exact_path else None
+        self._open_exact()
+
+    def _open_exact(self):
+        """Continue an existing exact vector file after its last complete row"""
+        self._exact = None
+        self._exact_count = 0
+        if self.exact_path and os.path.exists(self.exact_path):
+            size = os.path.getsize(self.exact_path)
+            self._exact_count = size // (4 * self.dim)
+            if size % (4 * self.dim):
+                os.truncate(self.exact_path, self._exact_count * 4 * self.dim)
+
+    def set_search_params(self, nprobe=None, ef_search=None):
+        """Matrix search has no recall/latency knobs"""
+
+    def _row_arrays(self):
+        return [a for a in (self.matrix, self._ids, self._scales, self._exact_rows) if a is not None]
+
+    @property
+    def mapped(self):
+        """Whether the rows are still memory-mapped from a snapshot"""
+        return isinstance(self.matrix, np.memmap)
+
+    def _reserve(self, rows):
+        """Make room for the given number of rows (copying mapped rows into private memory)"""
+        if rows <= len(self.matrix):
+            if not self.mapped:
+                return
+            capacity = len(self.matrix)
+        else:
+            capacity = max(rows, 2 * len(self.matrix))
+        grown = []
+        for array in self._row_arrays():
+            new = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+            new[:self._size] = array[:self._size]
+            grown.append(new)
+        self.matrix, self._ids = grown[0], grown[1]
+        if self._scales is not None:
+            self._scales = grown[2]
+        if self._exact_rows is not None:
+            self._exact_rows = grown[-1]
+
+    def _encode(self, vectors):
+        """Convert float32 rows to the storage encoding; returns (codes, int8 scales or None)"""
+        if self.storage == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1.0
+            return np.rint(vectors / scales[:, np.newaxis]).astype(np.int8), scales
+        if self._pq is not None:
+            return self._pq.compute_codes(vectors), None
+        return vectors, None
+
+    def _decode(self, rows):
+        """Return float32 vectors for a slice or array of row positions"""
+        codes = self.matrix[rows]
+        if self.storage == "int8":
+            return codes.astype(np.float32) * self._scales[rows, np.newaxis]
+        if self._pq is not None:
+            return self._pq.decode(np.ascontiguousarray(codes))
+        return codes.astype(np.float32, copy=False)
+
+    def _train_pq(self):
+        """(Re)train the PQ codebooks with as many bits as the stored rows support and re-encode them"""
+        nbits = min(8, int(np.log2(self._size / ANN_TRAIN_POINTS_PER_LIST)))
+        if self._pq is None:
+            vectors = self.matrix[:self._size]
+        else:
+            # Retraining starts from the exact rows when kept, else from the decoded codes
+            vectors = self._vectors(np.arange(self._size))
+        # FAISS k-means uses at most 256 points per centroid anyway
+        sample_size = 256 * 2 ** nbits
+        if len(vectors) > sample_size:
+            sample = vectors[np.random.default_rng(0).choice(len(vectors), sample_size, replace=False)]
+        else:
+            sample = vectors
+        pq = faiss.ProductQuantizer(self.dim, self.pq_m, nbits)
+        pq.train(np.ascontiguousarray(sample))
+        codes = np.empty((len(self.matrix), pq.code_size), dtype=np.uint8)
+        codes[:self._size] = pq.compute_codes(np.ascontiguousarray(vectors))
+        self.matrix = codes
+        self._pq = pq
+        self.trained_on = self._size
+
+    def add(self, vectors, ids):
+        """
+        Append vectors under the given IDs
+
+        Args:
+            vectors: (N, dim) float32 array
+            ids: N integer IDs
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        end = self._size + len(vectors)
+        self._reserve(end)
+        if self._exact_rows is not None:
+            os.makedirs(os.path.dirname(self.exact_path) or ".", exist_ok=True)
+            with open(self.exact_path, "ab") as f:
+                f.write(vectors.tobytes())
+            self._exact_rows[self._size:end] = np.arange(self._exact_count, self._exact_count + len(vectors))
+            self._exact_count += len(vectors)
+        codes, scales = self._encode(vectors)
+        self.matrix[self._size:end] = codes
+        if scales is not None:
+            self._scales[self._size:end] = scales
+        self._ids[self._size:end] = ids
+        self._size = end
+        if not self.trained:
+            if self._size >= self.train_size:
+                self._train_pq()
+        elif self._pq is not None and self._pq.nbits < 8 and self._size >= self.trained_on * ANN_RETRAIN_GROWTH:
+            self._train_pq()
+
+    def ids(self):
+        """Return the IDs of every stored vector, in row order"""
+        return self._ids[:self._size].copy()
+
+    def row_mask(self, ids):
+        """Boolean mask selecting the rows of the given IDs"""
+        return np.isin(self._ids[:self._size], np.asarray(ids, dtype=np.int64))
+
+    def _scores(self, queries, rows):
+        """Inner products of the queries with the given rows (array of row positions, or None for all)"""
+        count = self._size if rows is None else len(rows)
+        if not self._compressed:
+            return queries @ (self.matrix[:self._size] if rows is None else self.matrix[rows]).T
+        scores = np.empty((len(queries), count), dtype=np.float32)
+        for start in range(0, count, _DECODE_BLOCK):
+            block = slice(start, min(start + _DECODE_BLOCK, count))
+            scores[:, block] = queries @ self._decode(block if rows is None else rows[block]).T
+        return scores
+
+    def _exact_vectors(self, rows):
+        """Read the original float32 vectors of the given row positions from disk"""
+        if self._exact is None or len(self._exact) < self._exact_count:
+            self._exact = np.memmap(self.exact_path, dtype=np.float32, mode="r",
+                                    shape=(self._exact_count, self.dim))
+        return np.asarray(self._exact[self._exact_rows[rows]])
+
+    @staticmethod
+    def _top(scores, n):
+        """Positions of the n highest scores per row, best first"""
+        if n < scores.shape[1]:
+            top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+        else:
+            top = np.broadcast_to(np.arange(n), (len(scores), n))
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+        return np.take_along_axis(top, order, axis=1)
+
+    def search(self, queries, k, ids=None, mask=None):
+        """
+        Find the k vectors with the highest inner product
+
+        Args:
+            queries: (Q, dim) float32 array
+            k: Neighbours per query
+            ids: Only consider vectors with these IDs
+            mask: Boolean array over rows; only rows set to True are considered
+
+        Returns:
+            tuple: (scores, ids) arrays of shape (Q, k); missing results have ID -1
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        out_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        out_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        if ids is not None:
+            mask = self.row_mask(ids) if mask is None else mask & self.row_mask(ids)
+
+        # Score only the selected rows instead of masking a full product
+        rows = None if mask is None else np.flatnonzero(mask)
+        candidates = self._size if rows is None else len(rows)
+        n = min(k, candidates)
+        if n == 0:
+            return out_scores, out_ids
+
+        scores = self._scores(queries, rows)
+        if self.rerank and self._compressed and self._exact_rows is not None:
+            top = self._top(scores, min(max(n, self.rerank), candidates))
+            positions = top if rows is None else rows[top]
+            exact = np.einsum("qnd,qd->qn", self._exact_vectors(positions), queries)
+            order = np.argsort(-exact, axis=1, kind="stable")[:, :n]
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(exact, order, axis=1)
+        else:
+            top = self._top(scores, n)
+            top_scores = np.take_along_axis(scores, top, axis=1)
+        out_scores[:, :n] = top_scores
+        out_ids[:, :n] = (self._ids[:self._size] if rows is None else self._ids[rows])[top]
+        return out_scores, out_ids
+
+    def _positions(self, ids):
+        """Row positions of the given IDs"""
+        ids = np.asarray(ids, dtype=np.int64)
+        stored = self._ids[:self._size]
+        sorter = np.argsort(stored, kind="stable")
+        positions = np.searchsorted(stored, ids, sorter=sorter)
+        found = positions < len(stored)
+        found[found] = stored[sorter[positions[found]]] == ids[found]
+        if not found.all():
+            raise KeyError(f"IDs not in the embedding matrix: {ids[~found][:5].tolist()}")
+        return sorter[positions]
+
+    def _vectors(self, rows):
+        """Best available float32 vectors for the given row positions"""
+        if self._exact_rows is not None:
+            return self._exact_vectors(rows)
+        return self._decode(rows)
+
+    def reconstruct_batch(self, ids):
+        """Return the stored vectors for the given IDs (approximate for compressed storage without exact_path)"""
+        return self._vectors(self._positions(ids))
+
+    def remove_ids(self, ids):
+        """
+        Remove vectors by ID, compacting the remaining rows in place
+
+        Args:
+            ids: Integer IDs to remove
+
+        Returns:
+            int: Number of vectors removed
+        """
+        keep = ~self.row_mask(ids)
+        kept = int(keep.sum())
+        removed = self._size - kept
+        if removed:
+            self._reserve(self._size)  # Mapped rows are read-only
+            for array in self._row_arrays():
+                array[:kept] = array[:self._size][keep]
+            self._size = kept
+            if self._exact_rows is not None and self._exact_count > 2 * max(kept, self.initial_capacity):
+                self._compact_exact()
+        return removed
+
+    def _compact_exact(self):
+        """Rewrite the exact vector file without the rows of removed vectors"""
+        tmp_path = self.exact_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for start in range(0, self._size, _DECODE_BLOCK):
+                f.write(self._exact_vectors(np.arange(start, min(start + _DECODE_BLOCK, self._size))).tobytes())
+        self._exact = None
+        os.replace(tmp_path, self.exact_path)
+        self._exact_rows[:self._size] = np.arange(self._size)
+        self._exact_count = self._size
+
+    def write(self, path):
+        """
+        Save the vectors as a flat FAISS index (same format as VectorIndex)
+
+        Compressed rows, their scales, PQ codebook and exact vector rows are
+        also saved next to it (see codes_path()), so read() restores them
+        without re-encoding, retraining or rewriting the exact vector file.
+        Float32 rows are saved as an .npy file after the snapshot instead (see
+        rows_path()): rows inside the FAISS file start at an offset that is not
+        a multiple of 4, and mapping them unaligned makes numpy skip BLAS.
+        """
+        codes_file, rows_file = codes_path(path), rows_path(path)
+        # Removed first, so an existing rows file is never older than the snapshot
+        if os.path.exists(rows_file):
+            os.remove(rows_file)
+        if self.storage == "float32":
+            if os.path.exists(codes_file):
+                os.remove(codes_file)
+        else:
+            arrays = {"ids": self._ids[:self._size], "codes": self.matrix[:self._size]}
+            if self._scales is not None:
+                arrays["scales"] = self._scales[:self._size]
+            if self._exact_rows is not None:
+                arrays["exact_rows"] = self._exact_rows[:self._size]
+            if self._pq is not None:
+                arrays["pq_centroids"] = faiss.vector_to_array(self._pq.centroids)
+            with open(codes_file + ".tmp", "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(codes_file + ".tmp", codes_file)
+
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+        for start in range(0, self._size, _DECODE_BLOCK):
+            block = np.arange(start, min(start + _DECODE_BLOCK, self._size))
+            index.add_with_ids(np.ascontiguousarray(self._vectors(block)), self._ids[block])
+        faiss.write_index(index, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+        if self.storage == "float32":
+            with open(rows_file + ".tmp", "wb") as f:
+                np.save(f, self.matrix[:self._size])
+            os.replace(rows_file + ".tmp", rows_file)
+
+    def read(self, path):
+        """
+        Replace the contents with an index saved by write() or VectorIndex.write()
+
+        Float32 rows are memory-mapped and compressed rows restored from the
+        files saved next to a flat snapshot. Other snapshots, or
+        codes saved under a different storage configuration, are decoded and
+        re-encoded row by row.
+        """
+        if self.storage == "float32":
+            if self._map_rows(path):
+                return
+        elif self._read_codes(path):
+            return
+        saved = VectorIndex(self.dim, "flat", metric="ip")
+        saved.read(path)
+        ids = saved.ids()
+        self.reset()
+        for start in range(0, len(ids), _DECODE_BLOCK):
+            block = ids[start:start + _DECODE_BLOCK]
+            self.add(saved.reconstruct_batch(block), block)
+
+    def _snapshot_ids(self, path, rows):
+        return np.fromfile(path, dtype=np.int64, count=rows, offset=_FLAT_ROWS_OFFSET + 4 * rows * self.dim + 8)
+
+    def _map_rows(self, path):
+        """Map the float32 rows saved next to a flat snapshot; returns whether they match it"""
+        rows = _flat_rows(path, self.dim)
+        rows_file = rows_path(path)
+        if not rows or not os.path.exists(rows_file):
+            return False
+        matrix = np.load(rows_file, mmap_mode="r")
+        if matrix.dtype != np.float32 or matrix.shape != (rows, self.dim):
+            return False
+        # The snapshot may have been rewritten by a VectorIndex since; its last row must match
+        offset = _FLAT_ROWS_OFFSET + 4 * (rows - 1) * self.dim
+        if not np.array_equal(matrix[-1], np.fromfile(path, dtype=np.float32, count=self.dim, offset=offset)):
+            return False
+        self._allocate()
+        self.matrix = matrix
+        self._ids = self._snapshot_ids(path, rows)
+        self._size = rows
+        return True
+
+    def _read_codes(self, path):
+        """Restore the rows saved next to a snapshot; returns whether they match it and the configuration"""
+        rows = _flat_rows(path, self.dim)
+        codes_file = codes_path(path)
+        if not rows or not os.path.exists(codes_file):
+            return False
+        with np.load(codes_file) as saved:
+            arrays = {name: saved[name] for name in saved.files}
+        # IDs are never reused, so matching IDs mean the codes belong to this snapshot
+        if not np.array_equal(arrays["ids"], self._snapshot_ids(path, rows)):
+            return False
+
+        codes = arrays["codes"]
+        trained = "pq_centroids" in arrays
+        if trained:
+            # 2^nbits centroids of dim / pq_m values for each of the pq_m sub-quantizers
+            nbits = int(np.log2(len(arrays["pq_centroids"]) // self.dim))
+        if self.storage == "pq":
+            expected = (np.uint8, (self.pq_m * nbits + 7) // 8) if trained else (np.float32, self.dim)
+        else:
+            expected = (np.dtype(self.storage), self.dim)
+        if (codes.dtype, codes.shape[1]) != expected or (self.storage == "int8") != ("scales" in arrays):
+            return False
+        self._allocate()
+        if self.exact_path and ("exact_rows" not in arrays or arrays["exact_rows"].max() >= self._exact_count):
+            return False
+
+        self.matrix = codes
+        self._ids = arrays["ids"]
+        self._scales = arrays.get("scales")
+        self._exact_rows = arrays["exact_rows"] if self.exact_path else None
+        if trained:
+            self._pq = faiss.ProductQuantizer(self.dim, self.pq_m, nbits)
+            faiss.copy_array_to_vector(arrays["pq_centroids"], self._pq.centroids)
+            self.trained_on = rows
+        self._size = rows
+        return True
+
+    def stats(self):
+        """Describe the matrix state, including its memory cost per vector"""
+        arrays = self._row_arrays()
+        return {
+            "type": self.index_type,
+            "storage": self.storage,
+            "vectors": self._size,
+            "trained": self.trained,
+            "capacity": len(self.matrix),
+            "bytes_per_vector": sum(a.nbytes // len(a) for a in arrays),
+            "memory_bytes": sum(a.nbytes for a in arrays if not isinstance(a, np.memmap)),
+            "mapped_bytes": sum(a.nbytes for a in arrays if isinstance(a, np.memmap)),
+            "rerank": self.rerank if self._exact_rows is not None else 0
+        }